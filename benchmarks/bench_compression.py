@@ -0,0 +1,155 @@
+"""
+Backup compression benchmark for odootools.
+
+Compares the size and the time to write and to read back a backup for each container:
+
+* ``zip``: Odoo's backup zip, deflated by ``zipfile`` in a single thread
+* ``tar``, ``lz4``, ``zstd``: the tar backups of ``otools dump --format tar|lz4|zstd``
+
+The input is either a real Odoo backup zip (``--backup``), whose ``dump.sql`` and filestore are extracted
+to a temporary directory first, or a generated one: SQL ``COPY`` rows plus a filestore made of
+incompressible blobs (images, PDFs) and text attachments.
+
+Usage::
+
+    python benchmarks/bench_compression.py [--backup backup.zip] [--sql-mb 100] [--filestore-mb 100] [--threads N]
+"""
+import os
+import sys
+import random
+import shutil
+import zipfile
+import argparse
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from odootools.backup import (  # noqa: E402
+    ARCHIVE_CODECS, _check_codec, _decompressed_reader, BackupError, write_archive,
+)
+
+MB = 1024 * 1024
+
+
+def generate_sql(path, size):
+    rnd = random.Random(42)
+    names = ['Azure Interior', 'Deco Addict', 'Gemini Furniture', 'Lumber Inc', 'Ready Mat', 'Wood Corner']
+    states = ['draft', 'posted', 'cancel']
+    with open(path, 'w') as f:
+        f.write("COPY public.account_move_line (id, move_id, name, partner_id, date, debit, credit, state) FROM stdin;\n")
+        row = 0
+        while f.tell() < size:
+            row += 1
+            f.write(
+                f"{row}\t{row // 3}\t{rnd.choice(names)} INV/2024/{row // 3:05d}\t{rnd.randint(1, 5000)}\t"
+                f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}\t{rnd.random() * 10000:.2f}\t0.00\t"
+                f"{rnd.choice(states)}\n"
+            )
+        f.write("\\.\n")
+
+
+def generate_filestore(root, size):
+    rnd = random.Random(42)
+    written = 0
+    while written < size:
+        blob_size = rnd.randint(8 * 1024, 2 * MB)
+        if rnd.random() < 0.7:
+            # Images and PDFs: already compressed
+            content = rnd.randbytes(blob_size)
+        else:
+            words = [rnd.choice(['<record', 'id=', '"product"', '<field', 'name=', '>', 'Invoice', '12.50']) for _ in range(64)]
+            content = (' '.join(words) * (blob_size // 400 + 1)).encode()[:blob_size]
+        name = f"{written:040x}"
+        os.makedirs(os.path.join(root, name[:2]), exist_ok=True)
+        with open(os.path.join(root, name[:2], name), 'wb') as f:
+            f.write(content)
+        written += blob_size
+
+
+def extract_backup(backup, workdir):
+    with zipfile.ZipFile(backup) as z:
+        z.extractall(workdir)
+    return os.path.join(workdir, 'dump.sql'), os.path.join(workdir, 'filestore')
+
+
+def write_zip(dest, filestore, sql_path):
+    # Same layout and compression as odoo.tools.osutil.zip_dir
+    with zipfile.ZipFile(dest, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as z:
+        z.write(sql_path, 'dump.sql')
+        for root, _, files in os.walk(filestore):
+            for name in files:
+                path = os.path.join(root, name)
+                z.write(path, 'filestore/' + os.path.relpath(path, filestore))
+
+
+def read_zip(path):
+    with zipfile.ZipFile(path) as z:
+        for info in z.infolist():
+            with z.open(info) as f:
+                while f.read(MB):
+                    pass
+
+
+def read_archive(path, codec):
+    with _decompressed_reader(path, codec) as reader:
+        while reader.read(MB):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--backup', help='Odoo backup zip to use as input instead of generated data')
+    parser.add_argument('--sql-mb', type=int, default=100, help='Size of the generated dump.sql')
+    parser.add_argument('--filestore-mb', type=int, default=100, help='Size of the generated filestore')
+    parser.add_argument('--threads', type=int, help='zstd compression threads (default: CPU count)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-compression-')
+    try:
+        if args.backup:
+            sql_path, filestore = extract_backup(args.backup, workdir)
+        else:
+            sql_path, filestore = os.path.join(workdir, 'dump.sql'), os.path.join(workdir, 'filestore')
+            generate_sql(sql_path, args.sql_mb * MB)
+            generate_filestore(filestore, args.filestore_mb * MB)
+        total = os.path.getsize(sql_path) + sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(filestore) for name in files
+        )
+        threads = args.threads or os.cpu_count() or 1
+        print(f"Input: {total / MB:.0f} MiB, {threads} zstd thread(s)\n")
+        print(f"{'Format':<8}{'Size':>12}{'Ratio':>8}{'Write':>10}{'MiB/s':>8}{'Read':>10}")
+
+        formats = [('zip', None)] + [(codec, codec) for codec in ARCHIVE_CODECS]
+        for label, codec in formats:
+            dest = os.path.join(workdir, f"backup{ARCHIVE_CODECS.get(codec, '.zip')}")
+            try:
+                start = time.perf_counter()
+                if codec is None:
+                    write_zip(dest, filestore, sql_path)
+                else:
+                    _check_codec(codec)
+                    write_archive(dest, filestore, sql_path, codec=codec, threads=threads)
+                write_time = time.perf_counter() - start
+                start = time.perf_counter()
+                if codec is None:
+                    read_zip(dest)
+                else:
+                    read_archive(dest, codec)
+                read_time = time.perf_counter() - start
+            except BackupError as e:
+                print(f"{label:<8}skipped ({e})")
+                continue
+            size = os.path.getsize(dest)
+            print(
+                f"{label:<8}{size / MB:>8.1f} MiB{total / size:>8.2f}{write_time:>9.2f}s"
+                f"{total / MB / write_time:>8.0f}{read_time:>9.2f}s"
+            )
+            os.unlink(dest)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Startup-time benchmark for odootools.
+
+Each scenario runs in a fresh interpreter and is repeated to report the median:
+
+* ``import odootools.utils``: what scripts and the CLI pay before any action (Odoo is loaded lazily)
+* ``+ load odoo``: the same import followed by loading Odoo, i.e. what every import paid before
+  Odoo loading became lazy, and what actions that need Odoo still pay on first use
+
+Usage::
+
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = [
+    ('import odootools.utils', "import odootools.utils"),
+    ('import odootools.main', "import odootools.main"),
+    ('import odootools.utils + load odoo', "import odootools.utils as u; u._load_odoo()"),
+]
+
+TIMER = "import time; _t = time.perf_counter(); {code}; print(time.perf_counter() - _t)"
+
+
+def run(code, runs):
+    timings = []
+    for _ in range(runs):
+        r = subprocess.run(
+            [sys.executable, '-c', TIMER.format(code=code)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if r.returncode != 0:
+            return None, r.stderr.strip().splitlines()[-1]
+        timings.append(float(r.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'Scenario':<40}{'Median':>12}")
+    for label, code in SCENARIOS:
+        median, error = run(code, args.runs)
+        result = f"{median * 1000:.0f} ms" if median is not None else f"failed ({error})"
+        print(f"{label:<40}{result:>12}")
+
+
+if __name__ == '__main__':
+    main()
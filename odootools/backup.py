@@ -0,0 +1,611 @@
+import io
+import os
+import json
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: pip install odootools[zstd]
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # optional dependency: pip install odootools[lz4]
+    lz4 = None
+
+from .filestore import CopyStats, default_workers
+
+if TYPE_CHECKING:
+    from .slim import SlimProfile
+
+
+FILESTORE_PREFIX = 'filestore/'
+COPY_BUFSIZE = 1024 * 1024
+# Tar blobs up to this size are read into memory and written by a thread pool; larger ones are streamed
+INLINE_BLOB_SIZE = 256 * 1024
+
+
+class BackupError(Exception):
+    """Raised when a PostgreSQL dump or restore command fails."""
+
+
+def _member_target(dest: str, name: str) -> str:
+    """Return the absolute destination of a ``filestore/`` zip member, refusing paths that escape *dest*."""
+    rel = os.path.normpath(name[len(FILESTORE_PREFIX):])
+    target = os.path.join(dest, rel)
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep) or os.path.isabs(rel):
+        raise ValueError(f"Unsafe path in backup: {name}")
+    return target
+
+
+def extract_filestore(
+    zip_path: str,
+    dest: str,
+    members: Optional[List[zipfile.ZipInfo]] = None,
+    workers: Optional[int] = None,
+    incremental: bool = True,
+) -> CopyStats:
+    """
+    Extract the ``filestore/`` members of a backup zip straight into *dest* using a thread pool.
+
+    Each thread opens its own handle on the archive so members are decompressed in parallel.
+
+    :param members: Zip entries to extract (default: every ``filestore/`` member of the archive)
+    :param incremental: Skip blobs already present in *dest* with the same size
+    """
+    workers = workers or default_workers()
+    if members is None:
+        with zipfile.ZipFile(zip_path) as z:
+            members = [i for i in z.infolist() if i.filename.startswith(FILESTORE_PREFIX)]
+
+    stats = CopyStats()
+    lock = threading.Lock()
+    local = threading.local()
+    handles = []
+    start = time.monotonic()
+
+    def archive() -> zipfile.ZipFile:
+        if not hasattr(local, 'zip'):
+            local.zip = zipfile.ZipFile(zip_path)
+            with lock:
+                handles.append(local.zip)
+        return local.zip
+
+    def extract(info: zipfile.ZipInfo) -> None:
+        target = _member_target(dest, info.filename)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            return
+        if incremental:
+            try:
+                if os.stat(target).st_size == info.file_size:
+                    with lock:
+                        stats.skipped += 1
+                        stats.skipped_bytes += info.file_size
+                    return
+            except FileNotFoundError:
+                pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with archive().open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFSIZE)
+        with lock:
+            stats.files += 1
+            stats.bytes += info.file_size
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() re-raises the first extraction error
+            list(pool.map(extract, members))
+    finally:
+        for handle in handles:
+            handle.close()
+    stats.elapsed = time.monotonic() - start
+    return stats
+
+
+def _feed_psql(
+    source: BinaryIO, db_name: str, psql: str, env: Optional[Dict[str, str]],
+) -> Tuple[int, Optional[Exception]]:
+    """Copy *source* into the stdin of ``psql``; return its exit code and the error raised reading *source*."""
+    feed_error = None
+    p = subprocess.Popen(
+        [psql, f'--dbname={db_name}', '-q'],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT, env=env,
+    )
+    try:
+        shutil.copyfileobj(source, p.stdin, COPY_BUFSIZE)
+    except BrokenPipeError:
+        # psql exited early; its return code tells what happened
+        pass
+    except Exception as e:
+        feed_error = e
+        p.kill()
+    finally:
+        try:
+            p.stdin.close()
+        except BrokenPipeError:
+            pass
+    return p.wait(), feed_error
+
+
+def stream_zip_restore(
+    zip_path: str,
+    db_name: str,
+    filestore_dest: Optional[str],
+    psql: str = 'psql',
+    env: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None,
+    slim: Optional['SlimProfile'] = None,
+) -> Tuple[Optional[CopyStats], float]:
+    """
+    Restore an Odoo backup zip without extracting it to a temporary directory.
+
+    ``dump.sql`` is decompressed straight into the stdin of ``psql`` while the filestore members are
+    extracted concurrently to *filestore_dest*, so the wall time is bounded by the slower of the two.
+
+    :param filestore_dest: Final filestore directory of the database (``<data_dir>/filestore/<db>``)
+    :param psql: Path to the ``psql`` binary
+    :param env: Environment for the ``psql`` subprocess (connection settings)
+    :param slim: Leave the data of its excluded tables out of ``dump.sql``
+    :return: ``(filestore_stats, sql_seconds)``; ``filestore_stats`` is ``None`` when the zip has no filestore
+    :raises BackupError: If ``psql`` or the filestore extraction fails. Blobs extracted into a new filestore
+        directory are removed.
+    """
+    with zipfile.ZipFile(zip_path) as z:
+        members = [i for i in z.infolist() if i.filename.startswith(FILESTORE_PREFIX)]
+    fresh_filestore = bool(members) and filestore_dest is not None and not os.path.exists(filestore_dest)
+
+    extraction = None
+    pool = ThreadPoolExecutor(max_workers=1)
+    if members and filestore_dest:
+        extraction = pool.submit(extract_filestore, zip_path, filestore_dest, members, workers)
+
+    start = time.monotonic()
+    try:
+        with zipfile.ZipFile(zip_path) as z, z.open('dump.sql') as dump:
+            returncode, feed_error = _feed_psql(slim.filter_sql(dump) if slim else dump, db_name, psql, env)
+    except Exception as e:
+        returncode, feed_error = None, e
+    sql_seconds = time.monotonic() - start
+
+    stats, extraction_error = None, None
+    try:
+        stats = extraction.result() if extraction else None
+    except Exception as e:
+        extraction_error = e
+    finally:
+        pool.shutdown()
+
+    if feed_error or extraction_error or returncode != 0:
+        if fresh_filestore:
+            shutil.rmtree(filestore_dest, ignore_errors=True)
+        if feed_error:
+            raise BackupError(f"Couldn't read dump.sql from {zip_path}: {feed_error}") from feed_error
+        if returncode != 0:
+            raise BackupError(f"psql exited with code {returncode}")
+        raise BackupError(f"Couldn't extract the filestore of {zip_path}: {extraction_error}") from extraction_error
+    return stats, sql_seconds
+
+
+# Tar backups by codec, with their file suffix
+ARCHIVE_CODECS = {'zstd': '.tar.zst', 'lz4': '.tar.lz4', 'tar': '.tar'}
+# 'repository' backups are written by odootools.repository
+BACKUP_FORMATS = ('zip', 'directory') + tuple(ARCHIVE_CODECS) + ('repository',)
+DIRECTORY_SUFFIX = '.dir'
+
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_LZ4_MAGIC = b'\x04\x22\x4d\x18'
+
+
+def is_directory_backup(path: str) -> bool:
+    """Return ``True`` if *path* is a backup produced by :func:`dump_directory`."""
+    return os.path.isfile(os.path.join(path, 'dump', 'toc.dat'))
+
+
+def archive_filestore(filestore_dir: str, archive_path: str, slim: Optional['SlimProfile'] = None) -> int:
+    """
+    Store *filestore_dir* in an uncompressed zip using the ``filestore/`` layout of Odoo backups.
+
+    Attachments are mostly compressed formats already, so deflating them costs time for little gain.
+    Return the number of archived files. With *slim*, the files it does not include are left out.
+    """
+    count = 0
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as z:
+        if os.path.isdir(filestore_dir):
+            for root, _, files in os.walk(filestore_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    rel = os.path.relpath(path, filestore_dir)
+                    if slim and not slim.includes_file(rel, path):
+                        continue
+                    z.write(path, FILESTORE_PREFIX + rel)
+                    count += 1
+    return count
+
+
+def _run_pg(cmd: List[str], env: Optional[Dict[str, str]]) -> None:
+    r = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if r.returncode != 0:
+        raise BackupError(f"{os.path.basename(cmd[0])} exited with code {r.returncode}: {r.stderr.strip()}")
+
+
+def dump_directory(
+    db_name: str,
+    dest: str,
+    filestore_dir: Optional[str],
+    manifest: Optional[dict] = None,
+    jobs: Optional[int] = None,
+    pg_dump: str = 'pg_dump',
+    env: Optional[Dict[str, str]] = None,
+    slim: Optional['SlimProfile'] = None,
+) -> float:
+    """
+    Dump *db_name* as a directory backup: ``dump/`` (``pg_dump -Fd -j``), ``filestore.zip`` and ``manifest.json``.
+
+    The filestore is archived while ``pg_dump`` runs.
+
+    :param dest: Backup directory to create; it must not exist yet
+    :param manifest: Odoo backup manifest (see ``odoo.service.db.dump_db_manifest``)
+    :param jobs: Number of parallel ``pg_dump`` jobs (default: CPU count)
+    :param slim: Leave out the data of its excluded tables and the filestore files it does not include;
+        recorded in the manifest so that restores apply it too
+    :return: Elapsed seconds
+    :raises BackupError: If ``pg_dump`` fails; *dest* is removed.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    start = time.monotonic()
+    os.makedirs(dest)
+    try:
+        if slim:
+            manifest = {**(manifest or {}), 'slim': slim.manifest_entry()}
+        if manifest is not None:
+            with open(os.path.join(dest, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f, indent=4)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            archive = pool.submit(archive_filestore, filestore_dir or '', os.path.join(dest, 'filestore.zip'), slim)
+            _run_pg([
+                pg_dump, '--no-owner', '--format=directory', f'--jobs={jobs}',
+                f"--file={os.path.join(dest, 'dump')}", *(slim.pg_dump_args() if slim else ()), db_name,
+            ], env)
+            archive.result()
+    except BaseException:
+        shutil.rmtree(dest, ignore_errors=True)
+        raise
+    return time.monotonic() - start
+
+
+def restore_directory(
+    backup_dir: str,
+    db_name: str,
+    filestore_dest: Optional[str],
+    jobs: Optional[int] = None,
+    pg_restore: str = 'pg_restore',
+    env: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None,
+    slim: Optional['SlimProfile'] = None,
+    psql: str = 'psql',
+) -> Tuple[Optional[CopyStats], float]:
+    """
+    Restore a backup produced by :func:`dump_directory` into the existing empty database *db_name*.
+
+    ``pg_restore -j`` loads the dump while the filestore archive is extracted to *filestore_dest*.
+
+    :param slim: Leave the data of its excluded tables out (default: the profile of a slim dump)
+    :param psql: Path to the ``psql`` binary, used to create the foreign keys *slim* relaxes
+    :return: ``(filestore_stats, sql_seconds)`` like :func:`stream_zip_restore`
+    :raises BackupError: If ``pg_restore`` or the filestore extraction fails. Blobs extracted into a new
+        filestore directory are removed.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    slim = slim or _manifest_slim(os.path.join(backup_dir, 'manifest.json'))
+    archive = os.path.join(backup_dir, 'filestore.zip')
+    extract = bool(filestore_dest) and os.path.isfile(archive)
+    fresh_filestore = extract and not os.path.exists(filestore_dest)
+    try:
+        # Leaving the pool waits for the extraction, also when pg_restore failed
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            extraction = pool.submit(extract_filestore, archive, filestore_dest, None, workers) if extract else None
+            start = time.monotonic()
+            pg_restore_slim(os.path.join(backup_dir, 'dump'), db_name, jobs, slim, pg_restore, psql, env)
+            sql_seconds = time.monotonic() - start
+            try:
+                stats = extraction.result() if extraction else None
+            except Exception as e:
+                raise BackupError(f"Couldn't extract {archive}: {e}") from e
+    except BaseException:
+        if fresh_filestore:
+            shutil.rmtree(filestore_dest, ignore_errors=True)
+        raise
+    return stats, sql_seconds
+
+
+def _manifest_slim(manifest_path: str) -> Optional['SlimProfile']:
+    """Return the slim profile recorded in the manifest of a slim dump, or ``None``."""
+    if not os.path.isfile(manifest_path):
+        return None
+    from .slim import SlimProfile
+    with open(manifest_path) as f:
+        return SlimProfile.from_manifest(json.load(f))
+
+
+def pg_restore_slim(
+    dump_path: str,
+    db_name: str,
+    jobs: int,
+    slim: Optional['SlimProfile'] = None,
+    pg_restore: str = 'pg_restore',
+    psql: str = 'psql',
+    env: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    ``pg_restore -j`` a custom or directory format dump into *db_name*.
+
+    With *slim*, the restore follows a ``--use-list`` without the excluded table data and the foreign keys
+    to those tables; the foreign keys are then created ``NOT VALID``, and the attachments of the excluded
+    tables dropped (see :meth:`~odootools.slim.SlimProfile.attachment_cleanup_sql`).
+    """
+    cmd = [pg_restore, '--no-owner', f'--jobs={jobs}', f'--dbname={db_name}']
+    if not slim:
+        _run_pg(cmd + [dump_path], env)
+        return
+    from .slim import apply_sql
+    with tempfile.TemporaryDirectory(prefix='odootools-slim-') as tmp:
+        list_path = os.path.join(tmp, 'restore.list')
+        foreign_keys = slim.restore_list(dump_path, list_path, pg_restore, env)
+        _run_pg(cmd + [f'--use-list={list_path}', dump_path], env)
+    apply_sql((foreign_keys + '\n' + slim.attachment_cleanup_sql()).strip(), db_name, psql, env)
+
+
+def archive_codec(path: str) -> Optional[str]:
+    """Return the codec of a tar backup (``zstd``, ``lz4`` or ``tar``) from its first bytes, or ``None``."""
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        head = f.read(512)
+    if head.startswith(_ZSTD_MAGIC):
+        return 'zstd'
+    if head.startswith(_LZ4_MAGIC):
+        return 'lz4'
+    if head[257:262] == b'ustar':
+        return 'tar'
+    return None
+
+
+def _check_codec(codec: str) -> None:
+    if codec not in ARCHIVE_CODECS:
+        raise ValueError(f"Invalid codec '{codec}'. Use one of: {', '.join(ARCHIVE_CODECS)}")
+    if (codec == 'zstd' and zstandard is None) or (codec == 'lz4' and lz4 is None):
+        raise BackupError(f"The {codec} codec needs an optional dependency: pip install odootools[{codec}]")
+
+
+@contextmanager
+def _compressed_writer(path: str, codec: str, level: Optional[int], threads: int) -> Iterator[BinaryIO]:
+    with open(path, 'wb') as raw:
+        if codec == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level, threads=threads)
+            with compressor.stream_writer(raw, closefd=False) as writer:
+                yield writer
+        elif codec == 'lz4':
+            with lz4.frame.open(raw, 'wb', compression_level=level or 0) as writer:
+                yield writer
+        else:
+            yield raw
+
+
+@contextmanager
+def _decompressed_reader(path: str, codec: str) -> Iterator[BinaryIO]:
+    with ExitStack() as stack:
+        raw = stack.enter_context(open(path, 'rb'))
+        if codec == 'zstd':
+            yield stack.enter_context(zstandard.ZstdDecompressor().stream_reader(raw, read_size=COPY_BUFSIZE))
+        elif codec == 'lz4':
+            yield stack.enter_context(lz4.frame.open(raw, 'rb'))
+        else:
+            yield raw
+
+
+def write_archive(
+    dest: str,
+    filestore_dir: Optional[str],
+    sql_path,
+    manifest: Optional[dict] = None,
+    codec: str = 'zstd',
+    level: Optional[int] = None,
+    threads: Optional[int] = None,
+    slim: Optional['SlimProfile'] = None,
+) -> None:
+    """
+    Write the tar backup *dest*: ``manifest.json``, the ``filestore/`` of *filestore_dir* and ``dump.sql``.
+
+    :param sql_path: Path of the plain SQL dump, or a callable returning it, called once the filestore is
+        archived (lets :func:`dump_archive` run ``pg_dump`` meanwhile)
+    :param slim: Leave out the filestore files it does not include, and record it in the manifest
+    """
+    _check_codec(codec)
+    threads = threads or os.cpu_count() or 1
+    if slim:
+        manifest = {**(manifest or {}), 'slim': slim.manifest_entry()}
+    with _compressed_writer(dest, codec, level, threads) as writer, \
+            tarfile.open(fileobj=writer, mode='w|', bufsize=COPY_BUFSIZE) as tar:
+        if manifest is not None:
+            data = json.dumps(manifest, indent=4).encode()
+            info = tarfile.TarInfo('manifest.json')
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+        if filestore_dir and os.path.isdir(filestore_dir):
+            for root, _, files in os.walk(filestore_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    rel = os.path.relpath(path, filestore_dir)
+                    if slim and not slim.includes_file(rel, path):
+                        continue
+                    tar.add(path, FILESTORE_PREFIX + rel, recursive=False)
+        tar.add(sql_path() if callable(sql_path) else sql_path, 'dump.sql')
+
+
+def dump_archive(
+    db_name: str,
+    dest: str,
+    filestore_dir: Optional[str],
+    manifest: Optional[dict] = None,
+    codec: str = 'zstd',
+    level: Optional[int] = None,
+    threads: Optional[int] = None,
+    pg_dump: str = 'pg_dump',
+    env: Optional[Dict[str, str]] = None,
+    slim: Optional['SlimProfile'] = None,
+) -> float:
+    """
+    Dump *db_name* as a single tar file (``manifest.json``, ``filestore/``, ``dump.sql``) compressed with *codec*.
+
+    The content is that of an Odoo backup zip. ``pg_dump`` writes ``dump.sql`` to a temporary file next to
+    *dest* while the filestore is archived, and the dump is appended last. zstd compresses with one thread
+    per CPU; lz4 is single-threaded but several times faster than deflate; ``tar`` is not compressed.
+
+    :param codec: ``zstd``, ``lz4`` or ``tar``
+    :param level: Compression level (zstd: 1-22, default 3; lz4: 0-16, default 0)
+    :param threads: zstd compression threads (default: CPU count)
+    :param slim: Leave out the data of its excluded tables and the filestore files it does not include
+    :return: Elapsed seconds
+    :raises BackupError: If ``pg_dump`` fails or the codec's library is not installed; *dest* is removed.
+    """
+    _check_codec(codec)
+    start = time.monotonic()
+    sql_path = f"{dest}.sql.tmp"
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            dump = pool.submit(_run_pg, [
+                pg_dump, '--no-owner', f'--file={sql_path}', *(slim.pg_dump_args() if slim else ()), db_name,
+            ], env)
+
+            def dumped() -> str:
+                dump.result()
+                return sql_path
+
+            write_archive(dest, filestore_dir, dumped, manifest, codec=codec, level=level, threads=threads, slim=slim)
+    except BaseException:
+        if os.path.exists(dest):
+            os.unlink(dest)
+        raise
+    finally:
+        if os.path.exists(sql_path):
+            os.unlink(sql_path)
+    return time.monotonic() - start
+
+
+def stream_archive_restore(
+    path: str,
+    db_name: str,
+    filestore_dest: Optional[str],
+    psql: str = 'psql',
+    env: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None,
+    incremental: bool = True,
+    slim: Optional['SlimProfile'] = None,
+) -> Tuple[Optional[CopyStats], float]:
+    """
+    Restore a backup produced by :func:`dump_archive`, detecting its codec, in a single pass over the file.
+
+    Filestore blobs are decompressed in order and written by a thread pool, at most a few per thread in
+    memory; blobs over :data:`INLINE_BLOB_SIZE` are streamed to their target instead. ``dump.sql`` is then
+    piped into ``psql`` as it is decompressed. Nothing is extracted to a temporary directory.
+
+    :param incremental: Skip blobs already present in *filestore_dest* with the same size
+    :param slim: Leave the data of its excluded tables out of ``dump.sql`` (default: the profile of a slim dump)
+    :return: ``(filestore_stats, sql_seconds)`` like :func:`stream_zip_restore`
+    :raises BackupError: If the file is not a tar backup or ``psql`` fails. Blobs extracted into a new
+        filestore directory are removed.
+    """
+    codec = archive_codec(path)
+    if codec is None:
+        raise BackupError(f"{path} is not a tar backup")
+    _check_codec(codec)
+    workers = workers or default_workers()
+    fresh_filestore = filestore_dest is not None and not os.path.exists(filestore_dest)
+    stats = None
+    returncode, feed_error = None, None
+    sql_seconds = 0.0
+    lock = threading.Lock()
+    # Bound the blobs held in memory while the pool writes them
+    slots = threading.BoundedSemaphore(workers * 4)
+    # Failures of the pool, collected instead of keeping one future per blob
+    errors = []
+    start = time.monotonic()
+
+    def write(target: str, content: bytes) -> None:
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+            with lock:
+                stats.files += 1
+                stats.bytes += len(content)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    try:
+        with _decompressed_reader(path, codec) as reader, \
+                tarfile.open(fileobj=reader, mode='r|', bufsize=COPY_BUFSIZE) as tar, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            for member in tar:
+                if errors:
+                    break
+                if member.name == 'manifest.json' and slim is None:
+                    from .slim import SlimProfile
+                    slim = SlimProfile.from_manifest(json.load(tar.extractfile(member)))
+                elif member.name == 'dump.sql':
+                    sql_start = time.monotonic()
+                    dump = tar.extractfile(member)
+                    returncode, feed_error = _feed_psql(slim.filter_sql(dump) if slim else dump, db_name, psql, env)
+                    sql_seconds = time.monotonic() - sql_start
+                elif member.isfile() and member.name.startswith(FILESTORE_PREFIX) and filestore_dest:
+                    stats = stats or CopyStats()
+                    target = _member_target(filestore_dest, member.name)
+                    if incremental:
+                        try:
+                            if os.stat(target).st_size == member.size:
+                                stats.skipped += 1
+                                stats.skipped_bytes += member.size
+                                continue
+                        except FileNotFoundError:
+                            pass
+                    if member.size > INLINE_BLOB_SIZE:
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        with open(target, 'wb') as f:
+                            shutil.copyfileobj(tar.extractfile(member), f, COPY_BUFSIZE)
+                        with lock:
+                            stats.files += 1
+                            stats.bytes += member.size
+                        continue
+                    content = tar.extractfile(member).read()
+                    slots.acquire()
+                    pool.submit(write, target, content)
+        if errors:
+            raise errors[0]
+    except Exception as e:
+        feed_error = feed_error or e
+    if stats:
+        stats.elapsed = time.monotonic() - start - sql_seconds
+
+    if feed_error or returncode != 0:
+        if fresh_filestore and filestore_dest:
+            shutil.rmtree(filestore_dest, ignore_errors=True)
+        if feed_error:
+            raise BackupError(f"Couldn't read {path}: {feed_error}") from feed_error
+        if returncode is None:
+            raise BackupError(f"No dump.sql in {path}")
+        raise BackupError(f"psql exited with code {returncode}")
+    return stats, sql_seconds
@@ -0,0 +1,43 @@
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import Any
+
+
+def cache_enabled() -> bool:
+    """Return ``False`` when the ``ODOOTOOLS_NO_CACHE`` environment variable is set."""
+    return not os.getenv('ODOOTOOLS_NO_CACHE')
+
+
+def cache_dir() -> Path:
+    """Return the odootools cache directory (``$XDG_CACHE_HOME/odootools``, default ``~/.cache/odootools``)."""
+    base = os.getenv('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    path = Path(base) / 'odootools'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_json(name: str, default: Any = None) -> Any:
+    """Return the content of the cache file *name*, or *default* if it is missing or unreadable."""
+    try:
+        with open(cache_dir() / name) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def dump_json(name: str, data: Any) -> None:
+    """Atomically write *data* to the cache file *name*. Caches are best effort: write errors are ignored."""
+    try:
+        directory = cache_dir()
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{name}.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, directory / name)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
@@ -0,0 +1,43 @@
+import os
+import configparser
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+# Odoo writes unset options as "False" (or "None") in generated conf files
+_UNSET = {'', 'false', 'none'}
+
+
+def read_conf(conf_path: Optional[str]) -> Dict[str, str]:
+    """Return the ``[options]`` section of an Odoo conf file without importing Odoo, dropping unset values."""
+    config = configparser.ConfigParser(interpolation=None)
+    if conf_path:
+        config.read(conf_path)
+    if not config.has_section('options'):
+        return {}
+    return {k: v for k, v in config.items('options') if v.strip().lower() not in _UNSET}
+
+
+def pg_environ(options: Dict[str, str]) -> Dict[str, str]:
+    """Return an environment for PostgreSQL client tools using the connection settings in *options*."""
+    env = {**os.environ}
+    for key, var in (('db_host', 'PGHOST'), ('db_port', 'PGPORT'), ('db_user', 'PGUSER'), ('db_password', 'PGPASSWORD')):
+        if options.get(key):
+            env[var] = options[key]
+    return env
+
+
+def data_dir(options: Dict[str, str]) -> str:
+    """Return the Odoo data directory configured in *options* (Odoo's default is ``~/.local/share/Odoo``)."""
+    return os.path.expanduser(options.get('data_dir') or str(Path.home() / '.local' / 'share' / 'Odoo'))
+
+
+def filestore_path(options: Dict[str, str], db_name: str) -> str:
+    return os.path.join(data_dir(options), 'filestore', db_name)
+
+
+def same_cluster(options: Dict[str, str], other: Dict[str, str]) -> bool:
+    """Whether two Odoo confs point to the same PostgreSQL server (no ``db_host`` is the local socket)."""
+    def server(o: Dict[str, str]) -> Tuple[str, str]:
+        return o.get('db_host') or '', str(o.get('db_port') or '5432')
+    return server(options) == server(other)
@@ -1,9 +1,15 @@
 import os
+import re
 import glob
 import shutil
 import importlib.util
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from .cache import cache_enabled, dump_json, load_json
+
+
+DISCOVERY_CACHE = 'discovery.json'
 
 
 def find_conf_file(odoo_path: Optional[str] = None) -> Optional[str]:
@@ -24,10 +30,75 @@ def find_conf_file(odoo_path: Optional[str] = None) -> Optional[str]:
     return next((str(c) for c in candidates if c.is_file()), None)
 
 
-def discover_all_installations() -> List[str]:
+def _glob_patterns() -> List[str]:
+    return [
+        '/opt/*/odoo-bin',
+        '/opt/*/odoo/odoo-bin',
+        '/usr/local/*/odoo-bin',
+        str(Path.home() / '*/odoo-bin'),
+        str(Path.home() / '*/odoo/odoo-bin'),
+    ]
+
+
+def _search_roots() -> List[str]:
+    return ['/opt', '/usr/local', str(Path.home())]
+
+
+def _mtimes(paths: List[str]) -> Dict[str, Optional[float]]:
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def _cache_key(installations: List[str]) -> Dict:
+    """
+    Describe everything the scan depends on; the cached result is reused only while this stays identical.
+
+    Computing it costs a few ``stat`` calls: the searched roots, and the cached *installations* so that a
+    checkout that moves or loses its ``odoo-bin`` is noticed. Installs that appear deeper in a root (e.g.
+    ``~/src/odoo/odoo-bin``) are only found by an explicit refresh.
+    """
+    return {
+        'roots': _mtimes(_search_roots()),
+        'installations': _mtimes(installations),
+        'odoo_path': os.getenv('ODOO_PATH'),
+        'env_path': os.getenv('PATH'),
+        'module': __file__,
+    }
+
+
+def discover_all_installations(refresh: bool = False) -> List[str]:
     """
     Return a deduplicated list of Odoo installation paths (directories containing odoo-bin).
 
+    The result is cached in ``~/.cache/odootools/discovery.json`` and reused as long as the mtimes of the
+    searched roots and of the cached installations, ``ODOO_PATH`` and ``PATH`` are unchanged, so repeated
+    launches skip the filesystem scan. Set ``ODOOTOOLS_NO_CACHE`` to bypass the cache.
+
+    :param refresh: Ignore the cached result, scan again and update the cache
+    """
+    use_cache = cache_enabled()
+    if use_cache and not refresh:
+        cached = load_json(DISCOVERY_CACHE)
+        if isinstance(cached, dict) and isinstance(cached.get('installations'), list):
+            installations = cached['installations']
+            if cached.get('key') == _cache_key(installations):
+                return [p for p in installations if os.path.exists(os.path.join(p, 'odoo-bin'))]
+
+    found = _scan_installations()
+    if use_cache:
+        dump_json(DISCOVERY_CACHE, {'key': _cache_key(found), 'installations': found})
+    return found
+
+
+def _scan_installations() -> List[str]:
+    """
+    Search the filesystem for Odoo installations.
+
     Search order:
     1. ``ODOO_PATH`` environment variable.
     2. Odoo already importable in the current Python environment (pip install / venv).
@@ -72,20 +143,23 @@ def discover_all_installations() -> List[str]:
         register(str(Path(bin_path).resolve().parent))
 
     # 5. Glob search in common roots
-    patterns = [
-        '/opt/*/odoo-bin',
-        '/opt/*/odoo/odoo-bin',
-        '/usr/local/*/odoo-bin',
-        str(Path.home() / '*/odoo-bin'),
-        str(Path.home() / '*/odoo/odoo-bin'),
-    ]
-    for pattern in patterns:
+    for pattern in _glob_patterns():
         for match in sorted(glob.glob(pattern)):
             register(str(Path(match).parent))
 
     return found
 
 
+def installation_version(odoo_path: str) -> Optional[Tuple[int, int]]:
+    """Return the ``(major, minor)`` version of the installation at *odoo_path*, read from ``odoo/release.py``."""
+    try:
+        with open(os.path.join(odoo_path, 'odoo', 'release.py')) as f:
+            match = re.search(r'^version_info\s*=\s*\(\s*(\d+)\s*,\s*(\d+)', f.read(), re.M)
+    except OSError:
+        return None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
 def discover_odoo() -> Tuple[Optional[str], Optional[str]]:
     """
     Return ``(odoo_path, conf_path)`` for the best available Odoo installation.
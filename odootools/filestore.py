@@ -0,0 +1,208 @@
+import os
+import errno
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Tuple
+
+
+COPY_MODES = ('copy', 'hardlink', 'reflink')
+# 'move' consumes the source tree, so it is only offered for throwaway sources such as extracted backups
+TRANSFER_MODES = COPY_MODES + ('move',)
+
+# ioctl request number from linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Errors meaning "this filesystem pair cannot share blocks", so a plain copy is used instead
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOTTY, errno.EPERM}
+
+
+def default_workers() -> int:
+    """Thread count for filestore operations, which are I/O bound rather than CPU bound."""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+class CopyStats:
+    """Counters collected while copying a filestore."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+        self.fallbacks = 0
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (
+            f"CopyStats(files={self.files}, bytes={self.bytes}, skipped={self.skipped}, "
+            f"skipped_bytes={self.skipped_bytes}, fallbacks={self.fallbacks}, elapsed={self.elapsed:.2f}s)"
+        )
+
+
+def _reflink(src: str, dst: str) -> None:
+    """
+    Clone *src* into a temporary file next to *dst*, then move it over *dst*.
+
+    Opening *dst* itself would truncate *src* when both are hardlinks of the same blob.
+    """
+    import fcntl
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=f".{os.path.basename(dst)}.")
+    try:
+        with open(src, 'rb') as fsrc, os.fdopen(fd, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+def _plain_copy(src: str, dst: str) -> None:
+    # Unlink first: copying onto a hardlink of src would write through to src
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    shutil.copy2(src, dst)
+
+
+def _copy_one(src: str, dst: str, mode: str) -> bool:
+    """Copy a single file with *mode*. Return ``True`` if it had to fall back to a plain copy."""
+    if mode == 'copy':
+        _plain_copy(src, dst)
+        return False
+    if mode == 'move':
+        try:
+            os.replace(src, dst)
+            return False
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        shutil.move(src, dst)
+        return True
+    try:
+        if mode == 'hardlink':
+            if os.path.lexists(dst):
+                os.unlink(dst)
+            os.link(src, dst)
+        else:
+            _reflink(src, dst)
+        return False
+    except OSError as e:
+        if e.errno not in _FALLBACK_ERRNOS:
+            raise
+    _plain_copy(src, dst)
+    return True
+
+
+def iter_files(root: str, dst_root: Optional[str] = None) -> Iterator[Tuple[str, str, int]]:
+    """
+    Yield ``(relative_path, absolute_path, size)`` for every file under *root* in a single ``os.scandir`` pass.
+
+    When *dst_root* is given, the matching destination directories are created as the walk reaches them.
+    """
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        if dst_root is not None:
+            os.makedirs(os.path.join(dst_root, rel_dir), exist_ok=True)
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for entry in it:
+                rel = os.path.join(rel_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel)
+                else:
+                    yield rel, entry.path, entry.stat().st_size
+
+
+def _already_present(dst: str, size: int) -> bool:
+    try:
+        return os.stat(dst).st_size == size
+    except FileNotFoundError:
+        return False
+
+
+def copy_filestore(
+    src: str,
+    dst: str,
+    mode: str = 'copy',
+    workers: Optional[int] = None,
+    progress=None,
+    incremental: bool = False,
+) -> CopyStats:
+    """
+    Copy the filestore directory *src* into *dst* using a thread pool.
+
+    The tree is walked once; each file is handed to the pool as soon as it is found.
+
+    :param mode: ``copy`` (``shutil.copy2``), ``hardlink`` (``os.link``), ``reflink`` (``FICLONE`` ioctl)
+        or ``move`` (``os.replace``, consumes *src*).
+        Hardlinks and reflinks require *src* and *dst* on the same filesystem; files that cannot be
+        linked fall back to a plain copy and are counted in :attr:`CopyStats.fallbacks`.
+    :param workers: Number of copy threads (default: :func:`default_workers`)
+    :param progress: Optional ``tqdm``-like object. Its ``total`` grows as files are discovered and
+        ``update()`` is called with the size of every processed file.
+    :param incremental: Skip files that already exist in *dst* with the same size. Odoo names
+        filestore blobs after their sha1, so an existing path already holds the same content.
+        Skipped files are counted in :attr:`CopyStats.skipped` and :attr:`CopyStats.skipped_bytes`.
+    """
+    if mode not in TRANSFER_MODES:
+        raise ValueError(f"Invalid copy mode '{mode}'. Use one of: {', '.join(TRANSFER_MODES)}")
+    if not os.path.isdir(src):
+        raise FileNotFoundError(f"Filestore not found: {src}")
+
+    workers = workers or default_workers()
+    stats = CopyStats()
+    lock = threading.Lock()
+    # Bound the number of queued files so millions of attachments don't pile up as pending futures
+    slots = threading.BoundedSemaphore(workers * 64)
+    errors = []
+    start = time.monotonic()
+
+    def task(src_file: str, dst_file: str, size: int) -> None:
+        try:
+            if incremental and _already_present(dst_file, size):
+                with lock:
+                    stats.skipped += 1
+                    stats.skipped_bytes += size
+                    if progress is not None:
+                        progress.update(size)
+                return
+            fallback = _copy_one(src_file, dst_file, mode)
+            with lock:
+                stats.files += 1
+                stats.bytes += size
+                stats.fallbacks += fallback
+                if progress is not None:
+                    progress.update(size)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for rel, src_file, size in iter_files(src, dst):
+            if errors:
+                break
+            if progress is not None:
+                # No refresh(): the next update() redraws, throttled by tqdm
+                with lock:
+                    progress.total = (progress.total or 0) + size
+            slots.acquire()
+            pool.submit(task, src_file, os.path.join(dst, rel), size)
+
+    stats.elapsed = time.monotonic() - start
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def format_size(num: float) -> str:
+    """Return *num* bytes as a human readable string (``1.5 GiB``)."""
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if abs(num) < 1024 or unit == 'TiB':
+            return f"{num:.1f} {unit}" if unit != 'B' else f"{int(num)} B"
+        num /= 1024
@@ -1,24 +1,44 @@
 import sys
 import os
 import re
+import json
+import time
 import inspect
+import argparse
 import readline
 import traceback
-import zipfile
 import shutil
+import zipfile
 import subprocess
-import tempfile
-import configparser
 from contextlib import closing
+from functools import partial
 from pathlib import Path
-from bullet import Bullet, YesNo
+from bullet import Bullet, Check, YesNo
 from datetime import datetime
 import logging
 import psycopg2
 from tqdm import tqdm
 from psycopg2 import sql as psql_sql
 import base64
-from .discovery import discover_all_installations, find_conf_file
+from .backup import (
+    ARCHIVE_CODECS, BACKUP_FORMATS, DIRECTORY_SUFFIX, BackupError, archive_codec, dump_archive, dump_directory,
+    is_directory_backup, pg_restore_slim, restore_directory, stream_archive_restore, stream_zip_restore,
+)
+from .conf import filestore_path, pg_environ, read_conf, same_cluster
+from .discovery import discover_all_installations, find_conf_file, installation_version
+from .filestore import COPY_MODES, copy_filestore, format_size
+from .migration import (
+    MigrationLogParser, checkpoint_name, major_version, plan_hops, print_hops, print_migration_summary,
+)
+from .modules import MODULE_BUTTONS, refresh_module_list, run_module_action
+from .multidb import default_db_workers, print_summary, run_for_databases, stream_command
+from .orphans import DEFAULT_MIN_AGE, STORE_FNAME_QUERY, find_orphans, locked_references
+from .pgadmin import PgAdmin, PgAdminError
+from .repository import backup_to_repository, is_repository_backup, prune_repository, restore_from_repository
+from .slim import DEFAULT_EXCLUDED_TABLES, TABLE_SIZES_QUERY, SlimProfile, summary_line
+from .template_cache import DEFAULT_MAX_COUNT, DEFAULT_MAX_SIZE, TemplateCache
+from .transfer import send_database
+from .translations import DEFAULT_FILE_PATTERN, export_translations
 
 _logger = logging.getLogger(__name__)
 
@@ -31,10 +51,9 @@ ODOO_PATH = None
 ODOO_CONF = None
 ODOO_PATHS = []
 
-
-def _pg_quote_ident(name):
-    """Quote a PostgreSQL identifier to prevent SQL injection."""
-    return '"' + name.replace('"', '""') + '"'
+# Set by main() on first use of an action that needs Odoo
+odoo = None
+SUPERUSER_ID = 1
 
 
 def _validate_db_name(name):
@@ -46,31 +65,239 @@ def _validate_db_name(name):
         )
 
 
+def colorize(line):
+    if "ERROR" in line or "CRITICAL" in line:
+        return f"\033[91m{line}\033[0m"
+    elif "WARNING" in line:
+        return f"\033[93m{line}\033[0m"
+    elif "DEBUG" in line:
+        return f"\033[94m{line}\033[0m"
+    return line
+
+
+class CommandError(Exception):
+    """Raised when a subcommand cannot run, e.g. because a value that the menu would prompt for is missing."""
+
+
+def add_slim_arguments(p):
+    p.add_argument(
+        '--slim', action='store_true',
+        help=f"Leave out the data of log tables ({', '.join(DEFAULT_EXCLUDED_TABLES)})",
+    )
+    p.add_argument(
+        '--exclude-table-data', action='append', default=[], metavar='PATTERN',
+        help='Also leave out the data of the tables matching this pattern (repeatable, implies --slim)',
+    )
+    p.add_argument(
+        '--referenced-filestore', action='store_true',
+        help='With --slim, also drop the attachments of the excluded tables and keep only the filestore files '
+             'the remaining attachments reference',
+    )
+
+
+def slim_profile(args):
+    """Return the :class:`~odootools.slim.SlimProfile` asked for on the command line, or None."""
+    if not (args.slim or args.exclude_table_data):
+        return None
+    return SlimProfile(DEFAULT_EXCLUDED_TABLES + tuple(args.exclude_table_data), args.referenced_filestore)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='otools',
+        description='Odoo database and module management tools. Without a command, an interactive menu is shown. '
+                    'Commands print their result as JSON on stdout and their log on stderr.',
+    )
+    parser.add_argument(
+        '--refresh-discovery', action='store_true',
+        help='Scan the filesystem for Odoo installations again and update the discovery cache',
+    )
+    parser.add_argument('--odoo-path', help='Directory containing odoo-bin (default: first installation found)')
+    parser.add_argument('--odoo-conf', help='Odoo conf file (default: found next to odoo-bin)')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    p = commands.add_parser('restore', help='Restore a backup into a new database')
+    p.add_argument(
+        'dump',
+        help='Backup zip, tar backup (.tar.zst, .tar.lz4, .tar), directory backup, backup of a repository '
+             '(<repo>/backups/<db>/<timestamp>) or pg_dump custom-format file',
+    )
+    p.add_argument('db', help='Name of the database to create')
+    p.add_argument('--jobs', type=int, help='Parallel pg_restore jobs (default: CPU count)')
+    p.add_argument(
+        '--no-copy', dest='copy', action='store_false',
+        help='The database was moved, not copied: keep its UUID and secret',
+    )
+    p.add_argument('--neutralize', action='store_true', help='Neutralize the database (Odoo 15+)')
+    p.add_argument(
+        '--copy-mode', choices=COPY_MODES, default='copy',
+        help='How the filestore is rebuilt from the blobs of a backup repository',
+    )
+    add_slim_arguments(p)
+    p.add_argument(
+        '--cached', action='store_true',
+        help='Restore through the template cache: the first restore of a backup creates a neutralized template '
+             'database, the next ones clone it with a hardlinked filestore',
+    )
+    p.add_argument(
+        '--cache-max-count', type=int, default=DEFAULT_MAX_COUNT,
+        help=f'Keep at most this many templates (default: {DEFAULT_MAX_COUNT})',
+    )
+    p.add_argument(
+        '--cache-max-size', type=float, default=DEFAULT_MAX_SIZE / 1024 ** 3,
+        help=f'Keep at most this many GiB of templates, database and filestore included '
+             f'(default: {DEFAULT_MAX_SIZE // 1024 ** 3})',
+    )
+
+    p = commands.add_parser('dump', help='Back up a database')
+    p.add_argument('db')
+    p.add_argument('--format', choices=BACKUP_FORMATS, default='zip')
+    p.add_argument(
+        '--output',
+        help=f'Backup path (default: <db>.zip, <db>{DIRECTORY_SUFFIX} or <db>.tar[.zst|.lz4]); '
+             'repository directory for the repository format',
+    )
+    p.add_argument(
+        '--jobs', type=int,
+        help='Parallel pg_dump jobs for the directory format, compression threads for zstd (default: CPU count)',
+    )
+    p.add_argument('--level', type=int, help='Compression level for zstd (1-22, default 3) and lz4 (0-16, default 0)')
+    p.add_argument(
+        '--copy-mode', choices=COPY_MODES, default='copy', help='How new blobs are stored in a backup repository',
+    )
+    add_slim_arguments(p)
+
+    p = commands.add_parser('templates', help='List the template databases of the restore cache')
+    p.add_argument('--clear', action='store_true', help='Drop every template and its filestore')
+
+    p = commands.add_parser('prune', help='Remove the blobs of a backup repository that no backup references')
+    p.add_argument('repository')
+    p.add_argument('--keep-last', type=int, help='First remove all but the newest N backups of each database')
+
+    p = commands.add_parser('duplicate', help='Duplicate a database with Odoo, filestore included')
+    p.add_argument('db')
+    p.add_argument('new_db')
+    p.add_argument('--neutralize', action='store_true', help='Neutralize the copy (Odoo 15+)')
+    p.add_argument(
+        '--fast', action='store_true',
+        help='Clone with CREATE DATABASE ... TEMPLATE, closing and refusing connections to the source meanwhile',
+    )
+    p.add_argument(
+        '--timeout', type=float, default=30.0,
+        help='With --fast, give up if the source is still in use after this many seconds (default: 30)',
+    )
+    p.add_argument(
+        '--copy-mode', choices=COPY_MODES, default='copy', help='With --fast, how the filestore is copied',
+    )
+
+    p = commands.add_parser('send', help='Copy a database to another Odoo installation')
+    p.add_argument('db')
+    p.add_argument('new_db')
+    p.add_argument('--to', required=True, help='Destination Odoo path (directory containing odoo-bin)')
+    p.add_argument('--to-conf', help='Destination conf file (default: odoo.conf next to the destination)')
+    p.add_argument('--copy-mode', choices=COPY_MODES, default='copy', help='How the filestore is copied')
+    p.add_argument('--incremental', action='store_true', help='Only copy filestore files missing at the destination')
+    p.add_argument(
+        '--jobs', type=int,
+        help='With a destination on another PostgreSQL server, parallel dump streams (default: CPU count)',
+    )
+
+    p = commands.add_parser('orphans', help='Find filestore files no attachment references')
+    p.add_argument('db')
+    p.add_argument(
+        '--quarantine', nargs='?', const='',
+        help='Move the orphans to this directory (default: <data_dir>/filestore-quarantine/<db>/<timestamp>)',
+    )
+    p.add_argument('--report', help='Write the path and size of every orphan to this file')
+    p.add_argument(
+        '--min-age', type=float, default=DEFAULT_MIN_AGE / 3600,
+        help='Never treat files modified less than this many hours ago as orphans (default: 24)',
+    )
+
+    p = commands.add_parser('migrate', help='Migrate a database with OpenUpgrade')
+    p.add_argument('db')
+    p.add_argument('--openupgrade-path', help='OpenUpgrade scripts directory')
+    p.add_argument('--report', help='JSON timing report path (default: <db>-migration-<timestamp>.json)')
+    p.add_argument(
+        '--target-version', type=int,
+        help='Migrate one major version at a time up to this version, using the discovered installations',
+    )
+    p.add_argument(
+        '--keep-checkpoints', action='store_true',
+        help='Keep the <db>_ckpt_<version> snapshot of every hop instead of only the last one',
+    )
+
+    p = commands.add_parser('module', help='Install, update or uninstall modules')
+    p.add_argument('action', choices=list(MODULE_BUTTONS))
+    p.add_argument('db')
+    p.add_argument('modules', nargs='+')
+    p.add_argument(
+        '--one-by-one', dest='batch', action='store_false',
+        help='Rebuild the registry after each module instead of once for all of them',
+    )
+    p.add_argument(
+        '--refresh-list', action='store_true',
+        help='Update the module list even if no manifest changed since the last update',
+    )
+
+    p = commands.add_parser('translate', help='Export module translations')
+    p.add_argument('action', choices=['export'])
+    p.add_argument('db')
+    p.add_argument('modules', nargs='+')
+    p.add_argument('--lang', nargs='+', default=['es_ES'], help='One or more language codes')
+    p.add_argument('--output', default='es.po', help='Destination .po file for a single language')
+    p.add_argument(
+        '--output-dir',
+        help='Write one file per module and language under this directory (default with several languages: .)',
+    )
+    p.add_argument(
+        '--file-pattern', default=DEFAULT_FILE_PATTERN,
+        help='Path of each file relative to --output-dir, formatted with {module} and {lang}',
+    )
+
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    interactive = args.command is None
+    json_stdout = sys.stdout
+    if not interactive:
+        # Human readable output goes to stderr so that stdout only carries the JSON result
+        sys.stdout = sys.stderr
 
     def clear():
-        os.system('clear')
+        if interactive:
+            os.system('clear')
+
+    def ask(prompt, flag):
+        """input() in the interactive menu; in command mode the value must come from *flag*."""
+        if not interactive:
+            raise CommandError(f"Missing required option {flag}")
+        return input(prompt)
 
     def get_odoo_path():
         global ODOO_PATH, ODOO_CONF, ODOO_PATHS
 
-        ODOO_PATHS = discover_all_installations()
+        ODOO_PATHS = discover_all_installations(refresh=args.refresh_discovery)
 
-        if len(ODOO_PATHS) == 1:
+        if args.odoo_path:
+            ODOO_PATH = args.odoo_path
+        elif len(ODOO_PATHS) == 1 or (ODOO_PATHS and not interactive):
             ODOO_PATH = ODOO_PATHS[0]
         elif len(ODOO_PATHS) > 1:
             ODOO_PATH = Bullet("Select Odoo path:", choices=ODOO_PATHS).launch()
-        else:
+        elif interactive:
             ODOO_PATH = input(
                 'No Odoo installation found automatically.\n'
                 'Specify the path to the directory containing odoo-bin: '
             ).strip()
-            # Accept both /opt/odoo18 and /opt/odoo18/odoo
-            if os.path.exists(os.path.join(ODOO_PATH, 'odoo', 'odoo-bin')):
-                ODOO_PATH = os.path.join(ODOO_PATH, 'odoo')
+        # Accept both /opt/odoo18 and /opt/odoo18/odoo
+        if ODOO_PATH and os.path.exists(os.path.join(ODOO_PATH, 'odoo', 'odoo-bin')):
+            ODOO_PATH = os.path.join(ODOO_PATH, 'odoo')
 
-        ODOO_CONF = find_conf_file(ODOO_PATH)
-        if not ODOO_CONF:
+        ODOO_CONF = args.odoo_conf or find_conf_file(ODOO_PATH)
+        if not ODOO_CONF and interactive:
             ODOO_CONF = input("Specify the path to the Odoo conf file: ").strip()
 
         clear()
@@ -79,49 +306,52 @@ def main():
 
     get_odoo_path()
 
-    # Fallbacks in case the try block below fails or the symbols are absent
+    # Fallbacks in case loading Odoo fails or the symbols are absent
     # in an older Odoo version — must be defined before they are used as
     # decorators/closures further down the function.
     def check_db_management_enabled(fn):
         return fn
 
-    SUBPROCESS_ENV = {**os.environ}
+    # Connection settings are read straight from the conf file so that pure
+    # PostgreSQL actions (List DBs, Change DB user, Send DB) never import Odoo.
+    CONF_OPTIONS = read_conf(ODOO_CONF)
+    SUBPROCESS_ENV = pg_environ(CONF_OPTIONS)
+    # One maintenance connection reused by every administrative query; psql is only used for bulk loads
+    PG = PgAdmin(CONF_OPTIONS)
 
     def find_pg_tool(tool):
         return tool
 
-    try:
-        sys.path.append(ODOO_PATH)
-        import odoo
-        # Odoo 19 is a namespace package (no __init__.py), so submodules are
-        # not auto-imported — we must import odoo.tools explicitly.
-        import odoo.tools
-        odoo.tools.config.parse_config(['-c', ODOO_CONF, '--logfile='])
-        from odoo import SUPERUSER_ID
-        import odoo.api
-        import odoo.modules.registry
-        import odoo.service.db
-        import odoo.sql_db
+    odoo_loaded = False
 
+    def load_odoo():
+        """Import Odoo and parse its config on first use."""
+        global odoo, SUPERUSER_ID
+        nonlocal odoo_loaded, SUBPROCESS_ENV, find_pg_tool
+        if odoo_loaded:
+            return
+        odoo_loaded = True
         try:
-            from odoo.tools.misc import exec_pg_environ, find_pg_tool
-            SUBPROCESS_ENV = exec_pg_environ()
-        except (ImportError, Exception):
-            SUBPROCESS_ENV = {**os.environ}
-            if odoo.tools.config.get('db_password'):
-                SUBPROCESS_ENV['PGPASSWORD'] = odoo.tools.config['db_password']
-            if odoo.tools.config.get('db_host'):
-                SUBPROCESS_ENV['PGHOST'] = odoo.tools.config['db_host']
-            if odoo.tools.config.get('db_port'):
-                SUBPROCESS_ENV['PGPORT'] = str(odoo.tools.config['db_port'])
-            if odoo.tools.config.get('db_user'):
-                SUBPROCESS_ENV['PGUSER'] = odoo.tools.config['db_user']
-
-            def find_pg_tool(tool):
-                return tool
-
-    except Exception as e:
-        print(e)
+            sys.path.append(ODOO_PATH)
+            import odoo
+            # Odoo 19 is a namespace package (no __init__.py), so submodules are
+            # not auto-imported — we must import odoo.tools explicitly.
+            import odoo.tools
+            odoo.tools.config.parse_config(['-c', ODOO_CONF, '--logfile='])
+            from odoo import SUPERUSER_ID
+            import odoo.api
+            import odoo.modules.registry
+            import odoo.service.db
+            import odoo.sql_db
+
+            try:
+                from odoo.tools.misc import exec_pg_environ, find_pg_tool
+                SUBPROCESS_ENV = exec_pg_environ()
+            except (ImportError, Exception):
+                pass
+
+        except Exception as e:
+            print(e)
 
     def path_completer(text, state):
         """Complete absolute or relative paths."""
@@ -160,14 +390,11 @@ def main():
         readline.parse_and_bind("tab: complete")
         readline.set_completer(func)
 
-    def pg_terminate_backend(db_name):
-        # Single-quote escaping for string literals in SQL (doubling single quotes is the SQL standard)
-        escaped = db_name.replace("'", "''")
-        cmd = [
-            'psql', '-d', 'postgres', '-c',
-            f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '{escaped}';"
-        ]
-        subprocess.run(cmd, check=True, env=SUBPROCESS_ENV)
+    def list_dbs():
+        return PG.list_dbs()
+
+    def db_exists(db_name):
+        return PG.db_exists(db_name)
 
     def _check_faketime_mode(db_name):
         if os.getenv('ODOO_FAKETIME_TEST_MODE') and db_name in odoo.tools.config['db_name'].split(','):
@@ -231,72 +458,110 @@ def main():
             _logger.warning("Unable to make public schema public-accessible: %s", e)
 
     @check_db_management_enabled
-    def restore_db(db, dump_file):
-        """Override of odoo.service.db.restore_db to ensure the filestore is restored."""
+    def restore_db(db, dump_file, jobs=None, copy=None, neutralize=None, copy_mode='copy', slim=None):
+        """
+        Override of odoo.service.db.restore_db to ensure the filestore is restored.
+
+        With *slim* (a :class:`~odootools.slim.SlimProfile`), the data of its excluded tables is left out, and
+        the filestore files no attachment references are removed once the SQL is loaded.
+        """
+        load_odoo()
         try:
             assert isinstance(db, str)
-            if exp_db_exist(db):
+            if db_exists(db):
                 _logger.warning('RESTORE DB: %s already exists', db)
                 return False
 
             _logger.info('RESTORING DB: %s', db)
             _create_empty_database(db)
 
-            filestore_path = None
-            with tempfile.TemporaryDirectory() as dump_dir:
-                if zipfile.is_zipfile(dump_file):
-                    with zipfile.ZipFile(dump_file, 'r') as z:
-                        filestore = [m for m in z.namelist() if m.startswith('filestore/')]
-                        z.extractall(dump_dir, ['dump.sql'] + filestore)
-                        if filestore:
-                            filestore_path = os.path.join(dump_dir, 'filestore')
-                    pg_cmd = 'psql'
-                    pg_args = ['-q', '-f', os.path.join(dump_dir, 'dump.sql')]
-                else:
-                    pg_cmd = 'pg_restore'
-                    pg_args = ['--no-owner', dump_file]
-
-                r = subprocess.run(
-                    [find_pg_tool(pg_cmd), f'--dbname={db}', *pg_args],
-                    env=SUBPROCESS_ENV,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.STDOUT,
-                )
-                if r.returncode != 0:
-                    _logger.error("Couldn't restore database")
+            data_dir = odoo.tools.config.get('data_dir')
+            filestore_dest = os.path.join(data_dir, 'filestore', db)
+            codec = archive_codec(dump_file)
+            repository_backup = is_repository_backup(dump_file)
+            if zipfile.is_zipfile(dump_file) or is_directory_backup(dump_file) or codec or repository_backup:
+                try:
+                    if repository_backup:
+                        stats, sql_seconds = restore_from_repository(
+                            dump_file, db, filestore_dest, jobs=jobs, mode=copy_mode,
+                            pg_restore=find_pg_tool('pg_restore'), env=SUBPROCESS_ENV, slim=slim,
+                            psql=find_pg_tool('psql'),
+                        )
+                    elif codec:
+                        # Compressed stream decompressed once: blobs first, then dump.sql into psql
+                        stats, sql_seconds = stream_archive_restore(
+                            dump_file, db, filestore_dest, psql=find_pg_tool('psql'), env=SUBPROCESS_ENV, slim=slim,
+                        )
+                    elif is_directory_backup(dump_file):
+                        stats, sql_seconds = restore_directory(
+                            dump_file, db, filestore_dest, jobs=jobs,
+                            pg_restore=find_pg_tool('pg_restore'), env=SUBPROCESS_ENV, slim=slim,
+                            psql=find_pg_tool('psql'),
+                        )
+                    else:
+                        # dump.sql is piped into psql while the filestore is extracted to its final location
+                        stats, sql_seconds = stream_zip_restore(
+                            dump_file, db, filestore_dest, psql=find_pg_tool('psql'), env=SUBPROCESS_ENV, slim=slim,
+                        )
+                except BackupError as e:
+                    _logger.error("Couldn't restore database: %s", e)
                     return False
-
-                # Determine whether neutralization is supported in this Odoo version
-                neutralize_database = False
-                sig = inspect.signature(odoo.service.db.restore_db)
+                _logger.info('RESTORE DB: %s SQL loaded in %.1fs', db, sql_seconds)
+                if slim:
+                    slim.sql_seconds = sql_seconds
+                if stats:
+                    _logger.info(
+                        'RESTORE DB: %s filestore restored, %s blobs extracted in %.1fs, %s already present (%s saved)',
+                        db, stats.files, stats.elapsed, stats.skipped, format_size(stats.skipped_bytes),
+                    )
+            else:
+                start = time.monotonic()
+                try:
+                    pg_restore_slim(
+                        dump_file, db, jobs or os.cpu_count() or 1, slim,
+                        find_pg_tool('pg_restore'), find_pg_tool('psql'), SUBPROCESS_ENV,
+                    )
+                except BackupError as e:
+                    _logger.error("Couldn't restore database: %s", e)
+                    return False
+                sql_seconds = time.monotonic() - start
+                _logger.info('RESTORE DB: %s SQL loaded in %.1fs', db, sql_seconds)
+                if slim:
+                    slim.sql_seconds = sql_seconds
+
+            if slim:
+                if slim.referenced_filestore:
+                    slim.prune_filestore(filestore_dest, (row[0] for row in PG.stream(STORE_FNAME_QUERY, db_name=db)))
+                _logger.info('RESTORE DB: %s %s', db, summary_line(slim))
+
+            # Determine whether neutralization is supported in this Odoo version
+            neutralize_database = False
+            sig = inspect.signature(odoo.service.db.restore_db)
+            if copy is None:
                 copy = YesNo('Is it a copy?', 'y').launch()
-                if len(sig.parameters) >= 4:
-                    neutralize_database = YesNo('Neutralize DB?:', 'n').launch()
-
-                if filestore_path:
-                    data_dir = odoo.tools.config.get('data_dir')
-                    filestore_dest = os.path.join(data_dir, 'filestore', db)
-                    shutil.move(filestore_path, filestore_dest)
-                    _logger.info('RESTORE DB: %s filestore restored', db)
+            if len(sig.parameters) >= 4:
+                if neutralize is None:
+                    neutralize = YesNo('Neutralize DB?:', 'n').launch()
+                neutralize_database = neutralize
 
-                try:
-                    registry = odoo.modules.registry.Registry.new(db)
-                    with registry.cursor() as cr:
-                        if neutralize_database:
-                            try:
-                                odoo.modules.neutralize.neutralize_database(cr)
-                            except (AttributeError, ImportError):
-                                _logger.warning(
-                                    "Database neutralization not available in this Odoo version"
-                                )
-                        env = odoo.api.Environment(cr, 1, {})
-                        if copy:
-                            try:
-                                env['ir.config_parameter'].init(force=True)
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
+            try:
+                registry = odoo.modules.registry.Registry.new(db)
+                with registry.cursor() as cr:
+                    if neutralize_database:
+                        try:
+                            odoo.modules.neutralize.neutralize_database(cr)
+                        except (AttributeError, ImportError):
+                            _logger.warning(
+                                "Database neutralization not available in this Odoo version"
+                            )
+                    env = odoo.api.Environment(cr, 1, {})
+                    if copy:
+                        try:
+                            env['ir.config_parameter'].init(force=True)
+                        except Exception:
+                            pass
+            except Exception:
+                pass
 
             _logger.info('RESTORE DB: %s done', db)
             return True
@@ -305,7 +570,64 @@ def main():
             _logger.error(traceback.format_exc())
             return False
 
+    def restore_cached_db(db, dump_file, jobs=None, slim=None, max_count=DEFAULT_MAX_COUNT, max_size=DEFAULT_MAX_SIZE):
+        """
+        Restore through the template cache: a miss restores *dump_file* once into a neutralized template
+        database, every restore then clones the template. Return True on success.
+        """
+        try:
+            _validate_db_name(db)
+        except ValueError as e:
+            print(RED_TEXT.format(str(e)))
+            return False
+        if db_exists(db):
+            print(RED_TEXT.format(f'The DB {db} already exists'))
+            return False
+        cache = TemplateCache(PG, CONF_OPTIONS, max_count=max_count, max_size=max_size)
+        start = time.monotonic()
+        try:
+            key = cache.key(dump_file, neutralize=True, slim=slim.manifest_entry() if slim else None)
+            with cache.lock(key):
+                template = cache.get(key)
+                if template is None:
+                    template = cache.template_name(key)
+                    print(BLUE_TEXT.format(f"No template for {dump_file} yet, restoring it as {template}..."))
+                    # Leftovers of an interrupted restore
+                    cache.drop(template)
+                    if not restore_db(template, dump_file, jobs=jobs, copy=True, neutralize=True, slim=slim):
+                        cache.drop(template)
+                        return False
+                    cache.add(key, dump_file)
+                    print(f"Template {template} created in {time.monotonic() - start:.1f}s.")
+                stats, fs_stats = cache.clone(template, db)
+            evicted = cache.evict(keep=(template,))
+        except Exception:
+            print(traceback.format_exc())
+            return False
+        files = f", {fs_stats.files} filestore file(s) linked" if fs_stats else ''
+        print(GREEN_TEXT.format(
+            f"Database {db} cloned from {template} in {stats.elapsed:.1f}s{files} "
+            f"({time.monotonic() - start:.1f}s in total)."
+        ))
+        if evicted:
+            print(f"Evicted from the template cache: {', '.join(evicted)}.")
+        return True
+
+    def list_templates(clear=False):
+        """Print the templates of the restore cache, after dropping them all with *clear*; return them."""
+        cache = TemplateCache(PG, CONF_OPTIONS)
+        if clear:
+            for name in cache.clear():
+                print(f"Template {name} dropped.")
+        entries = cache.entries()
+        for entry in entries:
+            print(f"{entry['template']}  {format_size(entry['size']):>10}  last used {entry['used']}  {entry['backup']}")
+        if not entries:
+            print("The template cache is empty.")
+        return entries
+
     def drop_db(db_name):
+        load_odoo()
         if YesNo(RED_TEXT.format(f"Are you sure you want to drop database {db_name}?")).launch():
             print(RED_TEXT.format("Dropping database..."))
             try:
@@ -314,8 +636,24 @@ def main():
             except Exception:
                 print(traceback.format_exc())
 
-    def dump_db(db_name):
-        backup_file = input(f'Specify the path to the backup (default: {db_name}.zip): ') or f"{db_name}.zip"
+    def dump_db(db_name, backup_format=None, backup_file=None, jobs=None, level=None, copy_mode='copy', slim=None):
+        """Back up *db_name* and return the backup path, or None on failure."""
+        load_odoo()
+        if backup_format is None:
+            backup_format = Bullet("Backup format:", choices=list(BACKUP_FORMATS)).launch()
+        if slim:
+            if backup_format == 'zip':
+                print(RED_TEXT.format("Slim dumps use the directory, tar (zstd, lz4, tar) or repository format."))
+                return None
+            prepare_slim_dump(db_name, slim)
+        if backup_format == 'directory':
+            return dump_directory_db(db_name, backup_file, jobs, slim)
+        if backup_format in ARCHIVE_CODECS:
+            return dump_archive_db(db_name, backup_format, backup_file, jobs, level, slim)
+        if backup_format == 'repository':
+            return dump_repository_db(db_name, backup_file, jobs, copy_mode, slim)
+        if backup_file is None:
+            backup_file = input(f'Specify the path to the backup (default: {db_name}.zip): ') or f"{db_name}.zip"
         if not backup_file.endswith('.zip'):
             backup_file += '.zip'
         try:
@@ -324,164 +662,579 @@ def main():
                 odoo.service.db.dump_db(db_name, destiny, "zip")
         except Exception:
             print(traceback.format_exc())
+            return None
         print(f"Database {db_name} dumped to {backup_file}.")
+        return backup_file
+
+    def prepare_slim_dump(db_name, slim):
+        """Load the sizes of the tables and, when the filestore is restricted, the referenced files."""
+        slim.load_table_sizes(PG.execute(TABLE_SIZES_QUERY, db_name=db_name))
+        if slim.referenced_filestore:
+            slim.load_referenced(row[0] for row in PG.stream(*slim.kept_store_fnames_query(), db_name=db_name))
+
+    def dump_directory_db(db_name, backup_dir=None, jobs=None, slim=None):
+        """Dump with ``pg_dump -Fd -j`` next to an uncompressed filestore archive."""
+        default = f"{db_name}{DIRECTORY_SUFFIX}"
+        if backup_dir is None:
+            backup_dir = input(f'Specify the path to the backup directory (default: {default}): ') or default
+        if jobs is None:
+            jobs = ask_jobs()
+        try:
+            print(BLUE_TEXT.format(f"Starting database dump with {jobs} jobs..."))
+            with closing(odoo.sql_db.db_connect(db_name).cursor()) as cr:
+                manifest = odoo.service.db.dump_db_manifest(cr)
+            data_dir = odoo.tools.config.get('data_dir')
+            elapsed = dump_directory(
+                db_name, backup_dir, os.path.join(data_dir, 'filestore', db_name), manifest,
+                jobs=jobs, pg_dump=find_pg_tool('pg_dump'), env=SUBPROCESS_ENV, slim=slim,
+            )
+            print(f"Database {db_name} dumped to {backup_dir} in {elapsed:.1f}s.")
+            if slim:
+                print(summary_line(slim))
+            return backup_dir
+        except Exception:
+            print(traceback.format_exc())
+            return None
+
+    def dump_archive_db(db_name, codec, backup_file=None, threads=None, level=None, slim=None):
+        """Dump to a single tar file compressed with *codec* (zstd, lz4 or tar for none)."""
+        default = f"{db_name}{ARCHIVE_CODECS[codec]}"
+        if backup_file is None:
+            backup_file = input(f'Specify the path to the backup (default: {default}): ') or default
+        try:
+            print(BLUE_TEXT.format(f"Starting database dump ({codec})..."))
+            with closing(odoo.sql_db.db_connect(db_name).cursor()) as cr:
+                manifest = odoo.service.db.dump_db_manifest(cr)
+            elapsed = dump_archive(
+                db_name, backup_file, filestore_path(CONF_OPTIONS, db_name), manifest, codec=codec, level=level,
+                threads=threads, pg_dump=find_pg_tool('pg_dump'), env=SUBPROCESS_ENV, slim=slim,
+            )
+            size = format_size(os.path.getsize(backup_file))
+            print(f"Database {db_name} dumped to {backup_file} ({size}) in {elapsed:.1f}s.")
+            if slim:
+                print(summary_line(slim))
+            return backup_file
+        except Exception:
+            print(traceback.format_exc())
+            return None
+
+    def dump_repository_db(db_name, repo=None, jobs=None, copy_mode='copy', slim=None):
+        """Back up into a deduplicating repository; return the backup directory, or None on failure."""
+        if repo is None:
+            repo = ask('Specify the path to the backup repository: ', '--output').strip()
+        if jobs is None:
+            jobs = ask_jobs()
+        try:
+            print(BLUE_TEXT.format(f"Starting database dump into {repo}..."))
+            with closing(odoo.sql_db.db_connect(db_name).cursor()) as cr:
+                manifest = odoo.service.db.dump_db_manifest(cr)
+            backup_dir, stats = backup_to_repository(
+                db_name, repo, filestore_path(CONF_OPTIONS, db_name), manifest, jobs=jobs, mode=copy_mode,
+                pg_dump=find_pg_tool('pg_dump'), env=SUBPROCESS_ENV, slim=slim,
+            )
+            print(
+                f"Database {db_name} dumped to {backup_dir}: {stats.files} new blob(s) ({format_size(stats.bytes)}), "
+                f"{stats.skipped} already stored ({format_size(stats.skipped_bytes)} saved)."
+            )
+            if slim:
+                print(summary_line(slim))
+            return backup_dir
+        except CommandError:
+            raise
+        except Exception:
+            print(traceback.format_exc())
+            return None
 
-    def duplicate_db(db_name):
-        new_db_name = input('Enter the name of the new DB: ')
+    def prune_backups(repo, keep_last=None):
+        """Prune a backup repository and return its counters, or None on failure."""
+        try:
+            result = prune_repository(repo, keep_last=keep_last)
+        except Exception:
+            print(traceback.format_exc())
+            return None
+        print(
+            f"{result['backups_removed']} backup(s) and {result['blobs_removed']} blob(s) removed, "
+            f"{format_size(result['bytes_freed'])} freed, {result['blobs_kept']} blob(s) kept."
+        )
+        return result
+
+    def scan_orphans(db_name, quarantine=None, report=None, min_age_hours=DEFAULT_MIN_AGE / 3600):
+        """
+        Report the filestore files of *db_name* that no attachment references, and move them to *quarantine*
+        when given ('' for a timestamped directory next to the filestores). Return the counters, or None.
+        """
+        filestore = filestore_path(CONF_OPTIONS, db_name)
+        if not os.path.isdir(filestore):
+            print(RED_TEXT.format(f"Filestore not found: {filestore}"))
+            return None
+        if quarantine == '':
+            quarantine = os.path.join(
+                os.path.dirname(os.path.dirname(filestore)), 'filestore-quarantine', db_name,
+                datetime.now().strftime('%Y%m%dT%H%M%S'),
+            )
+        try:
+            names = (row[0] for row in PG.stream(STORE_FNAME_QUERY, db_name=db_name))
+            # Moving files races with Odoo: re-check each batch under a lock on ir_attachment first
+            recheck = partial(locked_references, PG, db_name) if quarantine else None
+            stats = find_orphans(
+                names, filestore, min_age=min_age_hours * 3600, quarantine=quarantine, report=report, recheck=recheck,
+            )
+        except Exception:
+            print(traceback.format_exc())
+            return None
+        print(
+            f"{stats.referenced} attachment file(s) referenced, {stats.files} file(s) in the filestore "
+            f"({format_size(stats.bytes)}), scanned in {stats.load_time + stats.scan_time:.1f}s."
+        )
+        color = YELLOW_TEXT if stats.orphans else GREEN_TEXT
+        print(color.format(f"{stats.orphans} orphan(s), {format_size(stats.orphan_bytes)}."))
+        if stats.recent:
+            print(f"{stats.recent} unreferenced file(s) younger than {min_age_hours:g}h were left alone.")
+        if stats.revived:
+            print(f"{stats.revived} file(s) referenced again during the scan were left alone.")
+        if quarantine and stats.quarantined:
+            print(f"{stats.quarantined} file(s) moved to {quarantine}.")
+        result = stats.as_dict()
+        if quarantine:
+            result['quarantine'] = quarantine
+        return result
+
+    def ask_jobs():
+        """Parallel jobs from the menu; in command mode ``--jobs`` defaults to the CPU count instead."""
+        default = os.cpu_count() or 1
+        if not interactive:
+            return default
+        jobs = input(f'Number of parallel jobs (default: {default}): ').strip()
+        return int(jobs) if jobs.isdigit() and int(jobs) > 0 else default
+
+    def duplicate_db(db_name, new_db_name=None, neutralize=None):
+        load_odoo()
+        if new_db_name is None:
+            new_db_name = input('Enter the name of the new DB: ')
         try:
             sig = inspect.signature(odoo.service.db.exp_duplicate_database)
             if len(sig.parameters) >= 3:
-                neutralize_database = YesNo('Neutralize DB?:', 'n').launch()
-                odoo.service.db.exp_duplicate_database(db_name, new_db_name, neutralize_database)
+                if neutralize is None:
+                    neutralize = YesNo('Neutralize DB?:', 'n').launch()
+                odoo.service.db.exp_duplicate_database(db_name, new_db_name, neutralize)
             else:
                 odoo.service.db.exp_duplicate_database(db_name, new_db_name)
             print(GREEN_TEXT.format(f"Database {db_name} duplicated to {new_db_name}."))
+            return True
         except Exception:
             print(traceback.format_exc())
+            return False
 
-    def send_db(db_name):
+    def clone_from_template(db_name, new_db_name, owner=None, timeout=30.0):
+        """PG.clone with timing output; returns False when the source could not be cloned."""
+        print(BLUE_TEXT.format(f"Creating {new_db_name} from template {db_name}..."))
         try:
-            if len(ODOO_PATHS) < 2:
-                print(RED_TEXT.format("No other Odoo installation found to send the DB to."))
-                return
+            stats = PG.clone(new_db_name, db_name, owner=owner, timeout=timeout)
+        except PgAdminError as e:
+            print(RED_TEXT.format(str(e)))
+            return False
+        print(
+            f"Cloned in {stats.elapsed:.1f}s: {stats.attempts} attempt(s), "
+            f"{stats.terminated} connection(s) closed, {stats.drain_time:.1f}s waiting for the source to be free."
+        )
+        return True
+
+    def fast_duplicate_db(db_name, new_db_name, timeout=30.0, copy_mode='copy', neutralize=False):
+        """
+        Duplicate with CREATE DATABASE ... TEMPLATE instead of exp_duplicate_database: same result (new UUID
+        and secret, filestore copied), without Odoo's single attempt failing on a busy source.
+        """
+        try:
+            _validate_db_name(new_db_name)
+        except ValueError as e:
+            print(RED_TEXT.format(str(e)))
+            return False
+        if db_exists(new_db_name):
+            print(RED_TEXT.format(f'The DB {new_db_name} already exists'))
+            return False
+        if not clone_from_template(db_name, new_db_name, timeout=timeout):
+            return False
+        try:
+            PG.reset_identity(new_db_name)
+            src_filestore = filestore_path(CONF_OPTIONS, db_name)
+            if os.path.isdir(src_filestore):
+                stats = copy_filestore(src_filestore, filestore_path(CONF_OPTIONS, new_db_name), mode=copy_mode)
+                print(f"Filestore copied ({stats.files} files in {stats.elapsed:.1f}s).")
+            if neutralize:
+                load_odoo()
+                try:
+                    from odoo.modules.neutralize import neutralize_database
+                except ImportError:
+                    print(YELLOW_TEXT.format("Database neutralization not available in this Odoo version"))
+                else:
+                    with closing(odoo.sql_db.db_connect(new_db_name).cursor()) as cr:
+                        neutralize_database(cr)
+                        cr.commit()
+                    odoo.sql_db.close_db(new_db_name)
+        except Exception:
+            print(traceback.format_exc())
+            return False
+        print(GREEN_TEXT.format(f"Database {db_name} duplicated to {new_db_name}."))
+        return True
+
+    def send_to_cluster(db_name, new_db_name, dest_pg, dest_options, jobs=None, filestore_copy=None):
+        """send_database with timing output; returns ``(ok, filestore_stats)``."""
+        server = dest_options.get('db_host') or 'local socket'
+        print(BLUE_TEXT.format(
+            f"Streaming {db_name} to {new_db_name} on {server}:{dest_options.get('db_port') or 5432}..."
+        ))
+        try:
+            stats = send_database(
+                PG, dest_pg, db_name, new_db_name, owner=dest_options.get('db_user'), jobs=jobs,
+                pg_dump=find_pg_tool('pg_dump'), pg_restore=find_pg_tool('pg_restore'),
+                source_env=SUBPROCESS_ENV, destination_env=pg_environ(dest_options), filestore_copy=filestore_copy,
+            )
+        except (BackupError, PgAdminError) as e:
+            print(RED_TEXT.format(str(e)))
+            return False, None
+        print(
+            f"Streamed {stats.relations} tables and sequences ({format_size(stats.bytes)}) over {stats.streams} "
+            f"pipe(s) in {stats.elapsed:.1f}s: schema {stats.schema_time:.1f}s, data {stats.data_time:.1f}s, "
+            f"indexes and constraints {stats.index_time:.1f}s."
+        )
+        return True, stats.filestore
 
-            to = Bullet("Select destination Odoo path:", choices=ODOO_PATHS).launch()
-            odoo_conf_dest = os.path.join(os.path.dirname(to), 'odoo.conf')
+    def send_db(
+        db_name, to=None, odoo_conf_dest=None, next_db_name=None, copy_mode=None, incremental=None, jobs=None,
+    ):
+        try:
+            if to is None:
+                if len(ODOO_PATHS) < 2:
+                    print(RED_TEXT.format("No other Odoo installation found to send the DB to."))
+                    return False
+                to = Bullet("Select destination Odoo path:", choices=ODOO_PATHS).launch()
 
-            if not os.path.isfile(odoo_conf_dest):
-                odoo_conf_dest = input("Specify the path to destination Odoo conf file: ")
+            if odoo_conf_dest is None:
+                odoo_conf_dest = os.path.join(os.path.dirname(to), 'odoo.conf')
+                if not os.path.isfile(odoo_conf_dest):
+                    odoo_conf_dest = ask("Specify the path to destination Odoo conf file: ", '--to-conf')
 
-            config = configparser.ConfigParser()
-            config.read(odoo_conf_dest)
-            db_user = config.get('options', 'db_user', fallback=None)
-            next_db_name = input('Enter the name of the new DB: ')
+            dest_options = read_conf(odoo_conf_dest)
+            # CREATE DATABASE ... TEMPLATE only reaches the source cluster: other ones get a streamed dump
+            remote = not same_cluster(CONF_OPTIONS, dest_options)
+            dest_pg = PgAdmin(dest_options) if remote else PG
+            if next_db_name is None:
+                next_db_name = input('Enter the name of the new DB: ')
 
-            if exp_db_exist(next_db_name):
+            if dest_pg.db_exists(next_db_name):
                 print(RED_TEXT.format(f'The DB {next_db_name} already exists'))
-                return
+                return False
 
             try:
                 _validate_db_name(next_db_name)
                 _validate_db_name(db_name)
             except ValueError as e:
                 print(RED_TEXT.format(str(e)))
-                return
-
-            pg_terminate_backend(db_name)
-
-            # Quoted identifiers prevent SQL injection
-            sql_query = "CREATE DATABASE {} WITH TEMPLATE {} OWNER {};".format(
-                _pg_quote_ident(next_db_name),
-                _pg_quote_ident(db_name),
-                _pg_quote_ident(db_user) if db_user else 'CURRENT_USER',
-            )
-            print(sql_query)
-            cmd = ["psql", "-d", "postgres", "-c", sql_query]
-
-            with subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                text=True, bufsize=1, env=SUBPROCESS_ENV
-            ) as p:
-                for line in p.stdout:
-                    print(line, end="")
-                p.wait()
-                if p.returncode != 0:
-                    return
-
-            data_dir = odoo.tools.config.get('data_dir')
-            src_filestore = os.path.join(data_dir, 'filestore', db_name)
-            dst_filestore = os.path.join(data_dir, 'filestore', next_db_name)
+                return False
 
-            total_size = sum(
-                os.path.getsize(os.path.join(root, f))
-                for root, _, files in os.walk(src_filestore)
-                for f in files
-            )
+            src_filestore = filestore_path(CONF_OPTIONS, db_name)
+            dst_filestore = filestore_path(dest_options if remote else CONF_OPTIONS, next_db_name)
+
+            # Hardlinks and reflinks only work when both filestores live on the same filesystem;
+            # files that cannot be linked are copied instead.
+            if copy_mode is None:
+                copy_mode = Bullet("Filestore copy mode:", choices=list(COPY_MODES)).launch()
+            if incremental is None:
+                incremental = False
+                if os.path.isdir(dst_filestore):
+                    incremental = YesNo('Destination filestore exists. Only copy missing files?', 'y').launch()
+
+            def ship_filestore():
+                with tqdm(total=0, unit='B', unit_scale=True, unit_divisor=1024) as pbar:
+                    return copy_filestore(
+                        src_filestore, dst_filestore, mode=copy_mode, progress=pbar, incremental=incremental,
+                    )
 
-            def copy_with_progress(src, dst):
-                shutil.copy2(src, dst)
-                pbar.update(os.path.getsize(src))
+            if remote:
+                # The filestore is copied while the database streams
+                dst_existed = os.path.isdir(dst_filestore)
+                with dest_pg:
+                    ok, stats = send_to_cluster(db_name, next_db_name, dest_pg, dest_options, jobs, ship_filestore)
+                if not ok:
+                    if not dst_existed:
+                        shutil.rmtree(dst_filestore, ignore_errors=True)
+                    return False
+            else:
+                if not clone_from_template(db_name, next_db_name, owner=dest_options.get('db_user')):
+                    return False
+                print(GREEN_TEXT.format("Copying filestore..."))
+                stats = ship_filestore()
 
-            print(GREEN_TEXT.format("Copying filestore..."))
-            with tqdm(total=total_size, unit='B', unit_scale=True, unit_divisor=1024) as pbar:
-                shutil.copytree(
-                    src_filestore, dst_filestore,
-                    copy_function=copy_with_progress,
-                    dirs_exist_ok=True,
-                )
+            if stats.fallbacks:
+                print(YELLOW_TEXT.format(f"{stats.fallbacks} file(s) could not be linked and were copied."))
+            if incremental:
+                print(GREEN_TEXT.format(
+                    f"{stats.skipped} file(s) already present, {format_size(stats.skipped_bytes)} saved."
+                ))
 
-            print(GREEN_TEXT.format("DB copied."))
+            print(GREEN_TEXT.format(f"DB copied ({stats.files} files in {stats.elapsed:.1f}s)."))
+            return True
 
+        except CommandError:
+            raise
         except Exception:
             print(traceback.format_exc())
+            return False
 
-    def migrate_db(db_name):
-
-        def colorize(line):
-            if "ERROR" in line or "CRITICAL" in line:
-                return f"\033[91m{line}\033[0m"
-            elif "WARNING" in line:
-                return f"\033[93m{line}\033[0m"
-            elif "DEBUG" in line:
-                return f"\033[94m{line}\033[0m"
-            return line
-
-        print(RED_TEXT.format("Migrating database..."))
-        openupgrade_path = os.path.join(
-            os.path.dirname(ODOO_PATH), 'custom_addons', 'oca', 'OpenUpgrade',
-            'openupgrade_scripts', 'scripts'
-        )
-        odoobin_path = os.path.join(ODOO_PATH, 'odoo-bin')
+    def upgrade_paths(openupgrade_path=None, odoo_path=None):
+        """Return ``(odoo_bin, openupgrade_scripts)`` for an installation (default: the selected one), or None."""
+        odoo_path = odoo_path or ODOO_PATH
+        if openupgrade_path is None:
+            openupgrade_path = os.path.join(
+                os.path.dirname(odoo_path), 'custom_addons', 'oca', 'OpenUpgrade',
+                'openupgrade_scripts', 'scripts'
+            )
+        odoobin_path = os.path.join(odoo_path, 'odoo-bin')
 
         if not os.path.exists(openupgrade_path):
             print(RED_TEXT.format(f"OpenUpgrade path not found: {openupgrade_path}"))
-            openupgrade_path = input("Specify the path to OpenUpgrade scripts: ")
+            openupgrade_path = ask("Specify the path to OpenUpgrade scripts: ", '--openupgrade-path')
         if not os.path.exists(odoobin_path):
             print(RED_TEXT.format(f"odoo-bin not found at: {odoobin_path}"))
-            return
+            return None
+        return odoobin_path, openupgrade_path
+
+    def migrate_command(db_name, odoobin_path, openupgrade_path, odoo_conf=None):
+        return [
+            odoobin_path,
+            "-c", odoo_conf or ODOO_CONF,
+            "-d", db_name,
+            f"--upgrade-path={openupgrade_path}",
+            "--update", "all",
+            "--stop-after-init",
+            "--load=base,web,openupgrade_framework",
+        ]
 
+    def migration_report_path(db_name):
+        return f"{db_name}-migration-{datetime.now():%Y%m%d-%H%M%S}.json"
+
+    def migrate_db(db_name, openupgrade_path=None, report_path=None, odoo_path=None, odoo_conf=None):
+        """Run OpenUpgrade on *db_name* with a module progress bar, then print and save its timings."""
+        print(RED_TEXT.format("Migrating database..."))
+        paths = upgrade_paths(openupgrade_path, odoo_path)
+        if not paths:
+            return False
+
+        parser = MigrationLogParser()
+        returncode = None
         try:
-            cmd = [
-                odoobin_path,
-                "-c", ODOO_CONF,
-                "-d", db_name,
-                f"--upgrade-path={openupgrade_path}",
-                "--update", "all",
-                "--stop-after-init",
-                "--load=base,web,openupgrade_framework",
-            ]
+            cmd = migrate_command(db_name, *paths, odoo_conf=odoo_conf)
             print(BLUE_TEXT.format(str(cmd)))
             with subprocess.Popen(
                 cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
-            ) as p:
+            ) as p, tqdm(desc="Modules", unit="module", total=0) as progress:
                 for line in p.stdout:
-                    print(colorize(line), end="")
-                p.wait()
-                if p.returncode != 0:
-                    print(RED_TEXT.format("Migration ended with errors."))
-                    return
-
-            print(GREEN_TEXT.format(f"Database {db_name} migrated."))
-
+                    tqdm.write(colorize(line), end="")
+                    parser.feed(line)
+                    if parser.total != progress.total:
+                        progress.total = parser.total
+                        progress.refresh()
+                    if len(parser.done) != progress.n:
+                        progress.set_postfix_str(parser.current or '', refresh=False)
+                        progress.update(len(parser.done) - progress.n)
+                returncode = p.wait()
         except Exception:
             print(traceback.format_exc())
+        finally:
+            parser.finish()
+            if parser.modules:
+                print_migration_summary(parser)
+                report_path = report_path or migration_report_path(db_name)
+                parser.write_report(report_path, database=db_name, returncode=returncode)
+                print(f"Migration report written to {report_path}")
+
+        if returncode != 0:
+            print(RED_TEXT.format("Migration ended with errors."))
+            return False
+        print(GREEN_TEXT.format(f"Database {db_name} migrated."))
+        return True
+
+    def clone_db(src, dst):
+        """Copy database *src* to *dst* with CREATE DATABASE ... TEMPLATE, replacing *dst* if it exists."""
+        PG.drop(dst)
+        PG.clone(dst, src)
+
+    def db_odoo_version(db_name):
+        """Return the major Odoo version a database is on, from the version of its base module."""
+        rows = PG.column("SELECT latest_version FROM ir_module_module WHERE name = 'base'", db_name=db_name)
+        return major_version(rows[0] if rows else None)
+
+    def installations_by_version():
+        found = {}
+        for path in ODOO_PATHS:
+            version = installation_version(path)
+            # saas~X.Y releases cannot be migrated with OpenUpgrade
+            if version and version[1] == 0:
+                found.setdefault(version[0], path)
+        return found
+
+    def migrate_pipeline(db_name, target=None, keep_checkpoints=False):
+        """
+        Migrate *db_name* one major version at a time with the discovered installations (e.g. 14 -> 15 -> 16).
+
+        Before the first hop and after each successful one, the database and its filestore are snapshotted
+        to a ``<db>_ckpt_<version>`` checkpoint. When a hop fails, the database is restored from the last
+        checkpoint, so running the pipeline again resumes from the last version that migrated cleanly.
+        Return the list of hops with their durations.
+        """
+        installations = installations_by_version()
+        current = db_odoo_version(db_name)
+        if current is None:
+            raise CommandError(f"Cannot read the Odoo version of database {db_name}")
+        if target is None:
+            newer = [str(v) for v in sorted(installations) if v > current]
+            if not newer:
+                print(RED_TEXT.format(f"No installation newer than Odoo {current} found."))
+                return []
+            target = int(Bullet(f"Database on Odoo {current}. Migrate up to:", choices=newer).launch())
+        hops = plan_hops(current, target, installations)
+        print(BLUE_TEXT.format(" -> ".join([str(current)] + [str(v) for v, _ in hops])))
+
+        def options_for(path):
+            return read_conf(find_conf_file(path))
+
+        def snapshot(version, options):
+            name = checkpoint_name(db_name, version)
+            print(BLUE_TEXT.format(f"Creating checkpoint {name}..."))
+            clone_db(db_name, name)
+            # Filestore blobs are never modified in place, so hardlinks make the snapshot nearly free
+            copy_filestore(
+                filestore_path(options, db_name), filestore_path(options, name), mode='hardlink', incremental=True,
+            )
+
+        def drop_checkpoint(version, options):
+            name = checkpoint_name(db_name, version)
+            PG.drop(name)
+            shutil.rmtree(filestore_path(options, name), ignore_errors=True)
+
+        prev_version = current
+        prev_options = CONF_OPTIONS if current not in installations else options_for(installations[current])
+        snapshot(current, prev_options)
+        results = []
+        for version, odoo_path in hops:
+            start = time.monotonic()
+            odoo_conf = find_conf_file(odoo_path)
+            options = read_conf(odoo_conf)
+            hop = {'from': prev_version, 'to': version, 'odoo_path': odoo_path, 'ok': False,
+                   'migration': 0.0, 'checkpoint': 0.0, 'elapsed': 0.0}
+            results.append(hop)
+            print(BLUE_TEXT.format(f"Migrating {db_name} from {prev_version} to {version} with {odoo_path}..."))
+
+            src_filestore = filestore_path(prev_options, db_name)
+            dst_filestore = filestore_path(options, db_name)
+            if os.path.realpath(src_filestore) != os.path.realpath(dst_filestore) and os.path.isdir(src_filestore):
+                copy_filestore(src_filestore, dst_filestore, mode='hardlink', incremental=True)
+
+            hop['ok'] = migrate_db(
+                db_name, odoo_path=odoo_path, odoo_conf=odoo_conf,
+                report_path=f"{db_name}-migration-{version}-{datetime.now():%Y%m%d-%H%M%S}.json",
+            )
+            hop['migration'] = time.monotonic() - start
+            if not hop['ok']:
+                print(RED_TEXT.format(
+                    f"Hop to {version} failed, restoring {db_name} from {checkpoint_name(db_name, prev_version)}..."
+                ))
+                clone_db(checkpoint_name(db_name, prev_version), db_name)
+                copy_filestore(
+                    filestore_path(prev_options, checkpoint_name(db_name, prev_version)),
+                    filestore_path(prev_options, db_name), mode='hardlink', incremental=True,
+                )
+                hop['elapsed'] = time.monotonic() - start
+                break
+
+            checkpoint_start = time.monotonic()
+            snapshot(version, options)
+            if not keep_checkpoints:
+                drop_checkpoint(prev_version, prev_options)
+            hop['checkpoint'] = time.monotonic() - checkpoint_start
+            hop['elapsed'] = time.monotonic() - start
+            prev_version, prev_options = version, options
+
+        for hop in results:
+            for key in ('migration', 'checkpoint', 'elapsed'):
+                hop[key] = round(hop[key], 3)
+        print_hops(results)
+        if results and results[-1]['ok']:
+            print(GREEN_TEXT.format(f"Database {db_name} migrated to Odoo {prev_version}."))
+        return results
+
+    def multi_db_action():
+        """Run a backup, migration or module install/update on several databases concurrently."""
+        actions = ['Backup DB', 'Migrate DB', 'Install Module', 'Update Module', 'Cancel']
+        action = Bullet("Action to run on several databases:", choices=actions).launch()
+        if action == 'Cancel':
+            return
+        db_names = select_dbs()
+        if not db_names:
+            return
+        default_workers = default_db_workers()
+        workers = input(f'Number of databases processed at once (default: {default_workers}): ').strip()
+        workers = int(workers) if workers.isdigit() and int(workers) > 0 else default_workers
+
+        if action == 'Backup DB':
+            load_odoo()
+            set_completer(path_completer)
+            backup_dir = input('Specify the backup directory (default: .): ') or '.'
+            os.makedirs(backup_dir, exist_ok=True)
+
+            def run(db_name, log):
+                backup_file = os.path.join(backup_dir, f"{db_name}.zip")
+                log(f"Dumping to {backup_file}...")
+                with open(backup_file, "wb") as destiny:
+                    odoo.service.db.dump_db(db_name, destiny, "zip")
+                log(f"Dumped ({format_size(os.path.getsize(backup_file))})")
+
+        elif action == 'Migrate DB':
+            paths = upgrade_paths()
+            if not paths:
+                return
+
+            def run(db_name, log):
+                parser = MigrationLogParser()
+
+                def log_line(line):
+                    parser.feed(line)
+                    log(colorize(line))
+
+                returncode = stream_command(migrate_command(db_name, *paths), log_line)
+                parser.finish()
+                report_path = migration_report_path(db_name)
+                parser.write_report(report_path, database=db_name, returncode=returncode)
+                slowest = ', '.join(f"{t.name} {t.elapsed:.0f}s" for t in parser.slowest_modules(3))
+                log(f"Slowest modules: {slowest or '-'}; report written to {report_path}")
+                return returncode == 0
+
+        else:
+            modules = input('Specify the module(s) (space-separated, c to cancel): ').split()
+            if not modules or modules == ['c']:
+                return
+            flag = '--init' if action == 'Install Module' else '--update'
+            odoobin_path = os.path.join(ODOO_PATH, 'odoo-bin')
+
+            def run(db_name, log):
+                cmd = [odoobin_path, "-c", ODOO_CONF, "-d", db_name, flag, ','.join(modules), "--stop-after-init"]
+                return stream_command(cmd, lambda line: log(colorize(line))) == 0
+
+        print(BLUE_TEXT.format(f"{action} on {len(db_names)} database(s), {workers} at a time..."))
+        results = run_for_databases(db_names, run, workers=workers)
+        print_summary(results)
 
     def change_db_user(db_name):
-        cmd = [
-            'psql',
-            '-d', 'postgres',
-            "-t", "-A", "--no-psqlrc",
-            '-c',
-            'SELECT rolname FROM pg_roles WHERE rolcanlogin = true ORDER BY rolname;',
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=SUBPROCESS_ENV)
-        users = [u for u in result.stdout.strip().split("\n") if u]
+        users = PG.login_roles()
         users.append('Cancel')
         user = Bullet("Select the new DB user:", choices=users).launch()
         if user == 'Cancel':
             return
-        cmd = ['psql', '-d', 'postgres', '-c', f"ALTER DATABASE {_pg_quote_ident(db_name)} OWNER TO {_pg_quote_ident(user)};"]
-        subprocess.run(cmd, capture_output=True, check=True, env=SUBPROCESS_ENV)
+        try:
+            PG.set_owner(db_name, user)
+        except PgAdminError as e:
+            print(RED_TEXT.format(str(e)))
+            return
         print(GREEN_TEXT.format(f"DB {db_name} owner changed to {user}."))
 
     def print_modules(modules):
@@ -493,19 +1246,27 @@ def main():
             row = indexed_names[i:i + columns]
             print("".join(cell.ljust(max_cell_length) for cell in row))
 
-    def select_module(env, state, selection_text):
+    def update_module_list(env, force=False):
         print(YELLOW_TEXT.format('Updating modules list...'))
         try:
-            env['base.module.update'].create({}).update_module()
+            if not refresh_module_list(env, force=force):
+                print(YELLOW_TEXT.format("No addons changed since the last update, skipped (r to force it)."))
         except Exception:
-            pass
-        print("******************************")
-        modules = env['ir.module.module'].search_read([('state', 'in', state)], ['name'])
-        print_modules(modules)
-        set_completer(make_modules_completer([m['name'] for m in modules]))
-        user_input = input(selection_text)
-        if user_input == 'c':
-            return None
+            env.cr.rollback()
+
+    def select_module(env, state, selection_text):
+        update_module_list(env)
+        while True:
+            print("******************************")
+            modules = env['ir.module.module'].search_read([('state', 'in', state)], ['name'])
+            print_modules(modules)
+            set_completer(make_modules_completer([m['name'] for m in modules]))
+            user_input = input(selection_text)
+            if user_input == 'c':
+                return None
+            if user_input != 'r':
+                break
+            update_module_list(env, force=True)
 
         modules_list = user_input.split()
         module_ids = env['ir.module.module'].search(
@@ -517,11 +1278,67 @@ def main():
 
         return module_ids
 
-    def select_db():
+    def open_env(db_name):
+        load_odoo()
+        registry = odoo.modules.registry.Registry(db_name)
+        cursor = registry.cursor()
+        # Odoo <15 requires manage() context to initialize thread-local environments storage
+        if hasattr(odoo.api.Environment, 'manage'):
+            odoo.api.Environment.manage().__enter__()
+        return odoo.api.Environment(cursor, SUPERUSER_ID, {'lang': 'es_ES'})
+
+    def module_action(module_ids, action, batch=True):
+        """Install, update or uninstall *module_ids* with one registry rebuild, module by module if that fails."""
+        color, doing = {
+            'install': (GREEN_TEXT, 'Installing'),
+            'update': (BLUE_TEXT, 'Updating'),
+            'uninstall': (RED_TEXT, 'Uninstalling'),
+        }[action]
+        print(color.format(f"{doing} module(s) {', '.join(module_ids.mapped('name'))}..."))
+        outcome = run_module_action(module_ids, action, batch=batch)
+        failed = [name for name, result in outcome.items() if not result['ok']]
+        if failed:
+            print(RED_TEXT.format(f"Failed: {', '.join(failed)}"))
+        else:
+            print(color.format(f"Done: {', '.join(outcome)}"))
+        return outcome
+
+    def export_translation(env, module_ids, lang, export_path):
+        if not export_path.endswith('.po'):
+            export_path += '.po'
         try:
-            dbs = odoo.service.db.list_dbs(force=True)
-        except TypeError:
-            dbs = odoo.service.db.list_dbs()
+            print(BLUE_TEXT.format(f"Exporting translation for {[m.name for m in module_ids]}..."))
+            export = env["base.language.export"].create(
+                {"lang": lang, "format": "po", "modules": [(6, 0, module_ids.ids)]}
+            )
+            export.act_getfile()
+            data = base64.b64decode(export.data)
+            with open(export_path, 'wb') as f:
+                f.write(data)
+            print(f"Translation exported to {export_path}.")
+            return export_path
+        except Exception:
+            print(traceback.format_exc())
+            return None
+
+    def export_translations_bulk(env, module_ids, langs, output_dir, file_pattern=DEFAULT_FILE_PATTERN):
+        """Export one .po file per (module, lang); return the file paths, or None on failure."""
+        try:
+            print(BLUE_TEXT.format(
+                f"Exporting {len(langs)} language(s) for {len(module_ids)} module(s) to {output_dir}..."
+            ))
+            stats = export_translations(env, module_ids.mapped('name'), langs, output_dir, file_pattern)
+            print(
+                f"{len(stats.files)} translation file(s) exported in {stats.elapsed:.1f}s "
+                f"(term extraction {stats.extract_time:.1f}s)."
+            )
+            return stats.files
+        except Exception:
+            print(traceback.format_exc())
+            return None
+
+    def select_db():
+        dbs = list_dbs()
         dbs.append('Cancel')
         option = Bullet(choices=dbs).launch()
         clear()
@@ -529,6 +1346,134 @@ def main():
             return None
         return option
 
+    def select_dbs():
+        dbs = list_dbs()
+        selected = Check("Select databases (space to toggle, enter to confirm):", choices=dbs).launch()
+        clear()
+        return selected
+
+    MODULE_STATES = {
+        'install': ['uninstalled'],
+        'update': ['installed'],
+        'uninstall': ['installed', 'to upgrade'],
+    }
+
+    def find_modules(env, names, states):
+        module_ids = env['ir.module.module'].search([('name', 'in', names), ('state', 'in', states)])
+        missing = sorted(set(names) - set(module_ids.mapped('name')))
+        if missing:
+            raise CommandError(f"Module(s) not found or not in state {'/'.join(states)}: {', '.join(missing)}")
+        return module_ids
+
+    def run_command():
+        """Run the subcommand given on the command line and print its result as JSON on stdout."""
+        start = time.monotonic()
+        command = args.command
+        if command in ('module', 'translate'):
+            command = f"{command} {args.action}"
+        result = {'command': command}
+        if hasattr(args, 'db'):
+            result['database'] = args.db
+        ok = False
+        env = None
+        try:
+            if args.command == 'restore':
+                slim = slim_profile(args)
+                if args.cached:
+                    ok = restore_cached_db(
+                        args.db, args.dump, jobs=args.jobs, slim=slim, max_count=args.cache_max_count,
+                        max_size=int(args.cache_max_size * 1024 ** 3),
+                    )
+                else:
+                    ok = restore_db(
+                        args.db, args.dump, jobs=args.jobs, copy=args.copy, neutralize=args.neutralize,
+                        copy_mode=args.copy_mode, slim=slim,
+                    )
+                if slim:
+                    result['slim'] = slim.summary()
+            elif args.command == 'dump':
+                if args.format in ARCHIVE_CODECS:
+                    default = f"{args.db}{ARCHIVE_CODECS[args.format]}"
+                else:
+                    default = f"{args.db}.zip" if args.format == 'zip' else f"{args.db}{DIRECTORY_SUFFIX}"
+                if args.format == 'repository':
+                    default = None
+                slim = slim_profile(args)
+                result['output'] = dump_db(
+                    args.db, args.format, args.output or default, jobs=args.jobs, level=args.level,
+                    copy_mode=args.copy_mode, slim=slim,
+                )
+                ok = result['output'] is not None
+                if slim and ok:
+                    result['slim'] = slim.summary()
+            elif args.command == 'duplicate':
+                result['new_database'] = args.new_db
+                if args.fast:
+                    ok = fast_duplicate_db(
+                        args.db, args.new_db, timeout=args.timeout, copy_mode=args.copy_mode,
+                        neutralize=args.neutralize,
+                    )
+                else:
+                    ok = duplicate_db(args.db, args.new_db, neutralize=args.neutralize)
+            elif args.command == 'send':
+                result['new_database'] = args.new_db
+                ok = send_db(
+                    args.db, to=args.to, odoo_conf_dest=args.to_conf, next_db_name=args.new_db,
+                    copy_mode=args.copy_mode, incremental=args.incremental, jobs=args.jobs,
+                )
+            elif args.command == 'prune':
+                result['repository'] = args.repository
+                result.update(prune_backups(args.repository, args.keep_last) or {})
+                ok = 'blobs_kept' in result
+            elif args.command == 'templates':
+                result['templates'] = list_templates(clear=args.clear)
+                ok = True
+            elif args.command == 'orphans':
+                result['orphans'] = scan_orphans(args.db, args.quarantine, args.report, args.min_age)
+                ok = result['orphans'] is not None
+            elif args.command == 'migrate':
+                if args.target_version:
+                    result['hops'] = migrate_pipeline(args.db, args.target_version, args.keep_checkpoints)
+                    ok = bool(result['hops']) and result['hops'][-1]['ok']
+                else:
+                    result['report'] = args.report or migration_report_path(args.db)
+                    ok = migrate_db(args.db, openupgrade_path=args.openupgrade_path, report_path=result['report'])
+            elif args.command == 'module':
+                env = open_env(args.db)
+                if args.action == 'install' or args.refresh_list:
+                    refresh_module_list(env, force=args.refresh_list)
+                module_ids = find_modules(env, args.modules, MODULE_STATES[args.action])
+                result['modules'] = module_action(module_ids, args.action, batch=args.batch)
+                ok = all(m['ok'] for m in result['modules'].values())
+            elif args.command == 'translate':
+                env = open_env(args.db)
+                module_ids = find_modules(env, args.modules, ['installed'])
+                if args.output_dir or len(args.lang) > 1:
+                    result['files'] = export_translations_bulk(
+                        env, module_ids, args.lang, args.output_dir or '.', args.file_pattern,
+                    )
+                    ok = result['files'] is not None
+                else:
+                    result['output'] = export_translation(env, module_ids, args.lang[0], args.output)
+                    ok = result['output'] is not None
+        except Exception as e:
+            traceback.print_exc()
+            result['error'] = str(e)
+        finally:
+            if env is not None:
+                env.cr.close()
+        result['ok'] = bool(ok)
+        result['elapsed'] = round(time.monotonic() - start, 3)
+        print(json.dumps(result), file=json_stdout)
+        return 0 if ok else 1
+
+    if not interactive:
+        try:
+            return run_command()
+        finally:
+            PG.close()
+            sys.stdout = json_stdout
+
     set_completer(path_completer)
     env = None
 
@@ -538,10 +1483,13 @@ def main():
                 'Restore DB',
                 'Drop DB',
                 'Backup DB',
+                'Prune backups',
                 'Duplicate DB',
                 'Send DB',
                 'Change DB user',
+                'Filestore orphans',
                 'Migrate DB',
+                'Multiple DBs',
                 'List DBs',
                 'Get Environment',
             ]
@@ -559,14 +1507,22 @@ def main():
 
             if option == 'Restore DB':
                 set_completer(path_completer)
-                dump_path = input('Specify the file path: ')
-                if not dump_path.endswith('.zip'):
-                    print('The dump must be a .zip file')
+                dump_path = input('Specify the file path: ').rstrip('/')
+                directory_backup = is_directory_backup(dump_path) or is_repository_backup(dump_path)
+                if not dump_path.endswith('.zip') and not directory_backup and not archive_codec(dump_path):
+                    print('The dump must be a .zip file, a tar backup, a directory backup or a repository backup')
                     continue
                 db_name = input('Enter the name of the database (c to cancel): ')
                 if db_name == 'c':
                     continue
-                restore_db(db_name, dump_path)
+                slim = None
+                if YesNo('Slim restore (without mail messages, tracking values, bus and logs)?', 'n').launch():
+                    slim = SlimProfile(referenced_filestore=YesNo('Keep only referenced filestore files?', 'n').launch())
+                jobs = ask_jobs() if directory_backup else None
+                if YesNo('Restore through the template cache (neutralized, cloned in seconds next time)?', 'n').launch():
+                    restore_cached_db(db_name, dump_path, jobs=jobs, slim=slim)
+                else:
+                    restore_db(db_name, dump_path, jobs=jobs, slim=slim)
 
             elif option == 'Drop DB':
                 print(RED_TEXT.format("Drop DB"))
@@ -582,12 +1538,24 @@ def main():
                     continue
                 dump_db(db_name)
 
+            elif option == 'Prune backups':
+                print(BLUE_TEXT.format("Prune backups"))
+                repo = input('Specify the path to the backup repository: ').strip()
+                keep_last = input('Keep only the newest N backups of each database (default: all): ').strip()
+                prune_backups(repo, int(keep_last) if keep_last.isdigit() else None)
+
             elif option == 'Duplicate DB':
                 print(BLUE_TEXT.format("Duplicate DB"))
                 db_name = select_db()
                 if not db_name:
                     continue
-                duplicate_db(db_name)
+                if YesNo('Fast clone (CREATE DATABASE ... TEMPLATE, closes connections to the source)?', 'y').launch():
+                    new_db_name = input('Enter the name of the new DB: ')
+                    fast_duplicate_db(
+                        db_name, new_db_name, copy_mode=Bullet("Filestore copy mode:", choices=list(COPY_MODES)).launch(),
+                    )
+                else:
+                    duplicate_db(db_name)
 
             elif option == 'Send DB':
                 print(BLUE_TEXT.format("Send DB"))
@@ -596,6 +1564,16 @@ def main():
                     continue
                 send_db(db_name)
 
+            elif option == 'Filestore orphans':
+                print(BLUE_TEXT.format("Filestore orphans"))
+                db_name = select_db()
+                if not db_name:
+                    continue
+                quarantine = None
+                if YesNo('Move the orphans to a quarantine directory?', 'n').launch():
+                    quarantine = input('Quarantine directory (default: next to the filestores): ').strip()
+                scan_orphans(db_name, quarantine)
+
             elif option == 'Change DB user':
                 print(BLUE_TEXT.format("Change DB user"))
                 db_name = select_db()
@@ -608,35 +1586,39 @@ def main():
                 db_name = select_db()
                 if not db_name:
                     continue
-                migrate_db(db_name)
+                if len(installations_by_version()) > 1 and YesNo(
+                    'Migrate across several versions with the discovered installations?', 'n'
+                ).launch():
+                    try:
+                        migrate_pipeline(db_name)
+                    except Exception:
+                        print(traceback.format_exc())
+                else:
+                    migrate_db(db_name)
+
+            elif option == 'Multiple DBs':
+                print(BLUE_TEXT.format("Multiple DBs"))
+                multi_db_action()
 
             elif option == 'List DBs':
-                try:
-                    dbs = odoo.service.db.list_dbs(force=True)
-                except TypeError:
-                    dbs = odoo.service.db.list_dbs()
-                for i, db in enumerate(dbs, 1):
+                for i, db in enumerate(list_dbs(), 1):
                     print(i, db)
 
             elif option == 'Get Environment':
                 if env:
                     env.cr.close()
+                load_odoo()
                 print(GREEN_TEXT.format("Get Environment"))
                 db_name = select_db()
                 if not db_name:
                     continue
-                registry = odoo.modules.registry.Registry(db_name)
-                cursor = registry.cursor()
-                # Odoo <15 requires manage() context to initialize thread-local environments storage
-                if hasattr(odoo.api.Environment, 'manage'):
-                    odoo.api.Environment.manage().__enter__()
-                env = odoo.api.Environment(cursor, SUPERUSER_ID, {'lang': 'es_ES'})
+                env = open_env(db_name)
 
             elif option == 'Uninstall Module':
                 module_ids = select_module(
                     env,
                     ['installed', 'to upgrade'],
-                    RED_TEXT.format('Specify the module(s) to uninstall (space-separated, c to cancel): '),
+                    RED_TEXT.format('Specify the module(s) to uninstall (space-separated, c to cancel, r to refresh the list): '),
                 )
                 if module_ids is None:
                     continue
@@ -645,77 +1627,57 @@ def main():
                 )).launch():
                     continue
                 clear()
-                try:
-                    for module in module_ids:
-                        print(RED_TEXT.format(f"Uninstalling module {module.name}..."))
-                        module.button_immediate_uninstall()
-                        print(RED_TEXT.format(f"Module {module.name} uninstalled."))
-                except Exception:
-                    print(traceback.format_exc())
+                module_action(module_ids, 'uninstall')
 
             elif option == 'Install Module':
                 module_ids = select_module(
                     env,
                     ['uninstalled'],
-                    GREEN_TEXT.format('Specify the module(s) to install (space-separated, c to cancel): '),
+                    GREEN_TEXT.format('Specify the module(s) to install (space-separated, c to cancel, r to refresh the list): '),
                 )
                 if module_ids is None:
                     continue
                 clear()
-                for module in module_ids:
-                    try:
-                        print(GREEN_TEXT.format(f"Installing module {module.name}..."))
-                        module.button_immediate_install()
-                        print(f"Module {module.name} installed.")
-                    except Exception:
-                        print(traceback.format_exc())
+                module_action(module_ids, 'install')
 
             elif option == 'Update Module':
                 module_ids = select_module(
                     env,
                     ['installed'],
-                    BLUE_TEXT.format('Specify the module(s) to update (space-separated, c to cancel): '),
+                    BLUE_TEXT.format('Specify the module(s) to update (space-separated, c to cancel, r to refresh the list): '),
                 )
                 if module_ids is None:
                     continue
                 clear()
-                for module in module_ids:
-                    try:
-                        print(BLUE_TEXT.format(f"Updating module {module.name}..."))
-                        module.button_immediate_upgrade()
-                        print(BLUE_TEXT.format(f"Module {module.name} updated."))
-                    except Exception:
-                        print(traceback.format_exc())
+                module_action(module_ids, 'update')
 
             elif option == 'Export translation':
                 module_ids = select_module(
                     env,
                     ['installed'],
-                    BLUE_TEXT.format('Specify the module to export translation (c to cancel): '),
+                    BLUE_TEXT.format(
+                        'Specify the module(s) to export translation (space-separated, c to cancel, '
+                        'r to refresh the list): '
+                    ),
                 )
                 if module_ids is None:
                     continue
                 clear()
-                lang = input('Indicate the language (default: es_ES): ') or 'es_ES'
+                langs = input('Indicate the language(s) (space-separated, default: es_ES): ').split() or ['es_ES']
                 set_completer(path_completer)
-                export_path = input('Specify the destination path (default: es.po, c to cancel): ') or "es.po"
-                if export_path == 'c':
-                    continue
-                if not export_path.endswith('.po'):
-                    export_path += '.po'
-
-                try:
-                    print(BLUE_TEXT.format(f"Exporting translation for {[m.name for m in module_ids]}..."))
-                    export = env["base.language.export"].create(
-                        {"lang": lang, "format": "po", "modules": [(6, 0, module_ids.ids)]}
-                    )
-                    export.act_getfile()
-                    data = base64.b64decode(export.data)
-                    with open(export_path, 'wb') as f:
-                        f.write(data)
-                    print(f"Translation exported to {export_path}.")
-                except Exception:
-                    print(traceback.format_exc())
+                if len(langs) == 1 and len(module_ids) == 1:
+                    export_path = input('Specify the destination path (default: es.po, c to cancel): ') or "es.po"
+                    if export_path == 'c':
+                        continue
+                    export_translation(env, module_ids, langs[0], export_path)
+                else:
+                    output_dir = input(
+                        f'Specify the destination directory, one {DEFAULT_FILE_PATTERN} per module and language '
+                        '(default: ., c to cancel): '
+                    ) or '.'
+                    if output_dir == 'c':
+                        continue
+                    export_translations_bulk(env, module_ids, langs, output_dir)
 
             elif option == 'Exit':
                 break
@@ -724,6 +1686,7 @@ def main():
         print(traceback.format_exc())
 
     finally:
+        PG.close()
         if env:
             try:
                 env.cr.close()
@@ -733,4 +1696,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import re
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+# 2024-05-02 10:00:00,123 4242 INFO mydb odoo.modules.loading: loading 42 modules...
+_LOG_LINE = re.compile(
+    r'^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) \d+ (?P<level>[A-Z]+) (?P<db>\S+) (?P<logger>[\w.]+): (?P<msg>.*)$'
+)
+_LOADING_COUNT = re.compile(r'^loading (\d+) modules\.\.\.')
+_LOADING_MODULE = re.compile(r'^Loading module (\w+) \(\d+/\d+\)')
+_MODULE_LOADED = re.compile(r'^Module (\w+) loaded in ([\d.]+)s')
+_MIGRATION = re.compile(r'^module (\w+): Running migration (\[\S+\]) (.+)$')
+_TABLES = re.compile(r'^module (\w+): creating or updating database tables')
+_DATA_FILE = re.compile(r'^loading (\w+)/(\S+)$')
+_ALL_LOADED = re.compile(r'^\d+ modules loaded in ')
+_SERIES = re.compile(r'(\d+)\.')
+
+
+class ModuleTiming:
+    """Time spent on one module during a migration, with its migration scripts and log problems."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.elapsed = 0.0
+        self.scripts: List[dict] = []
+        self.warnings = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'module': self.name,
+            'elapsed': round(self.elapsed, 3),
+            'warnings': self.warnings,
+            'errors': self.errors,
+            'scripts': self.scripts,
+        }
+
+
+class MigrationLogParser:
+    """
+    Turn the log of ``odoo-bin --update all`` (OpenUpgrade) into per-module and per-script timings.
+
+    Feed it the output line by line. A module's time runs from its first log line (data file loading,
+    table creation, migration script, ...) to the first line of the next module; migration scripts end at
+    the next structural line. Time is taken from the log timestamps, so an existing log file can be parsed
+    after the fact as well as a live process. Warnings and errors are collected, ``odoo.sql_db`` ones flagged
+    as SQL problems.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.modules: Dict[str, ModuleTiming] = {}
+        self.done: set = set()
+        self.current: Optional[str] = None
+        self.problems: List[dict] = []
+        self._module_start = None
+        self._script = None
+        self._now = None
+        self._first = None
+
+    def _time(self, ts: Optional[str]) -> float:
+        if ts:
+            self._now = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S,%f').timestamp()
+        elif self._now is None:
+            self._now = time.time()
+        if self._first is None:
+            self._first = self._now
+        return self._now
+
+    def _end_script(self, now: float) -> None:
+        if self._script:
+            self._script['elapsed'] = round(now - self._script.pop('_start'), 3)
+            self._script = None
+
+    def _switch(self, module: Optional[str], now: float) -> None:
+        if module == self.current:
+            return
+        self._end_script(now)
+        if self.current is not None:
+            self.modules[self.current].elapsed += now - self._module_start
+            self.done.add(self.current)
+        self.current = module
+        self._module_start = now
+        if module is not None and module not in self.modules:
+            self.modules[module] = ModuleTiming(module)
+
+    def feed(self, line: str) -> None:
+        match = _LOG_LINE.match(line.rstrip('\n'))
+        if not match:
+            # Tracebacks and output of migration scripts: no timestamp, keeps the current module
+            self._time(None)
+            return
+        now = self._time(match['ts'])
+        level, logger, msg = match['level'], match['logger'], match['msg']
+
+        if level in ('WARNING', 'ERROR', 'CRITICAL'):
+            kind = 'error' if level != 'WARNING' else 'warning'
+            self.problems.append({
+                'kind': kind,
+                'sql': logger.startswith('odoo.sql_db'),
+                'module': self.current,
+                'logger': logger,
+                'message': msg,
+                'time': match['ts'],
+            })
+            if self.current:
+                timing = self.modules[self.current]
+                if kind == 'error':
+                    timing.errors += 1
+                else:
+                    timing.warnings += 1
+
+        m = _LOADING_COUNT.match(msg)
+        if m:
+            self.total = max(self.total, int(m.group(1)))
+            return
+        if _ALL_LOADED.match(msg):
+            self._switch(None, now)
+            return
+        m = _MODULE_LOADED.match(msg)
+        if m:
+            self._switch(m.group(1), now)
+            self._switch(None, now)
+            return
+        m = _MIGRATION.match(msg)
+        if m:
+            self._switch(m.group(1), now)
+            self._end_script(now)
+            self._script = {'stage': m.group(2), 'script': m.group(3), '_start': now}
+            self.modules[m.group(1)].scripts.append(self._script)
+            return
+        m = _LOADING_MODULE.match(msg) or _TABLES.match(msg) or _DATA_FILE.match(msg)
+        if m:
+            self._switch(m.group(1), now)
+            self._end_script(now)
+
+    def finish(self) -> None:
+        """Close the module and script still running when the log ends."""
+        if self._now is not None:
+            self._switch(None, self._now)
+
+    @property
+    def elapsed(self) -> float:
+        return (self._now - self._first) if self._first is not None else 0.0
+
+    def slowest_modules(self, limit: int = 10) -> List[ModuleTiming]:
+        return sorted(self.modules.values(), key=lambda t: t.elapsed, reverse=True)[:limit]
+
+    def slowest_scripts(self, limit: int = 10) -> List[dict]:
+        scripts = [
+            {'module': t.name, **script} for t in self.modules.values() for script in t.scripts if 'elapsed' in script
+        ]
+        return sorted(scripts, key=lambda s: s['elapsed'], reverse=True)[:limit]
+
+    def report(self, **extra) -> dict:
+        return {
+            **extra,
+            'elapsed': round(self.elapsed, 3),
+            'modules_total': self.total,
+            'modules_done': len(self.done),
+            'warnings': sum(p['kind'] == 'warning' for p in self.problems),
+            'errors': sum(p['kind'] == 'error' for p in self.problems),
+            'sql_problems': sum(p['sql'] for p in self.problems),
+            'modules': [t.as_dict() for t in self.slowest_modules(len(self.modules))],
+            'problems': self.problems,
+        }
+
+    def write_report(self, path: str, **extra) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.report(**extra), f, indent=2)
+
+
+def print_migration_summary(parser: MigrationLogParser, limit: int = 10) -> None:
+    """Print the slowest modules and migration scripts and the warning/error counts."""
+    report = parser.report()
+    width = max([len(t.name) for t in parser.slowest_modules(limit)] + [6])
+    print(f"{'Module'.ljust(width)}  {'Time':>9}  Scripts  Warnings  Errors")
+    for t in parser.slowest_modules(limit):
+        print(f"{t.name.ljust(width)}  {t.elapsed:>8.1f}s  {len(t.scripts):>7}  {t.warnings:>8}  {t.errors:>6}")
+    scripts = parser.slowest_scripts(limit)
+    if scripts:
+        labels = [f"{s['module']} {s['stage']} {s['script']}" for s in scripts]
+        width = max(len(label) for label in labels)
+        print(f"\n{'Script'.ljust(width)}  {'Time':>9}")
+        for label, s in zip(labels, scripts):
+            print(f"{label.ljust(width)}  {s['elapsed']:>8.1f}s")
+    print(
+        f"\n{report['modules_done']}/{report['modules_total']} modules in {report['elapsed']:.1f}s, "
+        f"{report['warnings']} warning(s), {report['errors']} error(s), {report['sql_problems']} SQL problem(s)"
+    )
+
+
+def major_version(version: Optional[str]) -> Optional[int]:
+    """Return the major Odoo version of a module version such as ``16.0.1.3``."""
+    match = _SERIES.match(version or '')
+    return int(match.group(1)) if match else None
+
+
+def checkpoint_name(db_name: str, version: int) -> str:
+    return f"{db_name}_ckpt_{version}"
+
+
+def plan_hops(current: int, target: int, installations: Dict[int, str]) -> List[Tuple[int, str]]:
+    """
+    Return the ``(version, odoo_path)`` hops that migrate a database from *current* to *target*, one major
+    version at a time, as OpenUpgrade requires.
+
+    :param installations: Odoo installation path by major version
+    :raise ValueError: if *target* is not newer than *current* or an intermediate version is not installed
+    """
+    if target <= current:
+        raise ValueError(f"The database is already on Odoo {current}, nothing to migrate to {target}")
+    missing = [v for v in range(current + 1, target + 1) if v not in installations]
+    if missing:
+        raise ValueError(f"No Odoo installation found for version(s) {', '.join(map(str, missing))}")
+    return [(v, installations[v]) for v in range(current + 1, target + 1)]
+
+
+def print_hops(hops: List[dict]) -> None:
+    """Print one line per migration hop with its status and durations."""
+    print(f"{'Hop':<9}  Status  {'Migration':>10}  {'Checkpoint':>10}  {'Total':>9}")
+    for hop in hops:
+        status = 'ok    ' if hop['ok'] else 'failed'
+        print(
+            f"{hop['from']:>3} -> {hop['to']:<3}  {status}  {hop['migration']:>9.1f}s  "
+            f"{hop['checkpoint']:>9.1f}s  {hop['elapsed']:>8.1f}s"
+        )
@@ -0,0 +1,218 @@
+import os
+import time
+import hashlib
+import logging
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from .cache import cache_enabled, dump_json, load_json
+
+
+MODULE_LIST_CACHE = 'module_list.json'
+MANIFEST_NAMES = ('__manifest__.py', '__openerp__.py')
+
+MODULE_BUTTONS = {
+    'install': 'button_immediate_install',
+    'update': 'button_immediate_upgrade',
+    'uninstall': 'button_immediate_uninstall',
+}
+
+# Module states a failed batch leaves committed, and the button that cancels each of them
+_PENDING_STATES = {
+    'to install': 'button_install_cancel',
+    'to upgrade': 'button_upgrade_cancel',
+    'to remove': 'button_uninstall_cancel',
+}
+
+
+class ModuleLoadTimer(logging.Filter):
+    """
+    Collect per-module load times while Odoo rebuilds a registry.
+
+    Odoo 14+ logs ``Module <name> loaded in <t>s`` on ``odoo.modules.loading`` for every module, at DEBUG level
+    unless the module is slow. The logger level is lowered while the timer is active so those records are seen;
+    the filter then drops the records the original level would have hidden, so the console output is unchanged.
+    """
+    logger_name = 'odoo.modules.loading'
+
+    def __init__(self):
+        super().__init__()
+        self.times: Dict[str, float] = {}
+        self._logger = logging.getLogger(self.logger_name)
+        self._level = logging.NOTSET
+        self._saved_level = logging.NOTSET
+
+    def filter(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith('Module %s loaded in'):
+            self.times[record.args[0]] = float(record.args[1])
+        return record.levelno >= self._level
+
+    def __enter__(self):
+        self._level = self._logger.getEffectiveLevel()
+        self._saved_level = self._logger.level
+        self._logger.setLevel(logging.DEBUG)
+        self._logger.addFilter(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._logger.removeFilter(self)
+        self._logger.setLevel(self._saved_level)
+
+
+def pending_marks(env) -> Dict[int, str]:
+    """Return ``{module_id: state}`` for the modules marked to install, upgrade or remove."""
+    modules = env['ir.module.module'].search([('state', 'in', list(_PENDING_STATES))])
+    return {module.id: module.state for module in modules}
+
+
+def reset_pending(module_ids, previous: Dict[int, str]):
+    """
+    Roll back a failed batch and cancel the install/upgrade/removal marks it committed before reloading:
+    those of *module_ids* and of the dependencies it pulled in. Marks already in *previous* (see
+    :func:`pending_marks`, taken before the batch) are left as they were.
+    """
+    env = module_ids.env
+    env.cr.rollback()
+    if hasattr(env, 'invalidate_all'):
+        env.invalidate_all()
+    else:
+        env.cache.invalidate()
+    modules = env['ir.module.module']
+    for state, button in _PENDING_STATES.items():
+        marked = modules.search([('state', '=', state)]).filtered(lambda module: previous.get(module.id) != state)
+        if marked:
+            getattr(marked, button)()
+    env.cr.commit()
+    return modules.browse(module_ids.ids)
+
+
+def run_batch(module_ids, action: str) -> Dict[str, dict]:
+    """
+    Mark all *module_ids* for *action* and apply them with a single registry rebuild.
+
+    Returns ``{name: {'ok': True, 'elapsed': seconds}}`` where ``elapsed`` is the module's share of the
+    rebuild as logged by Odoo, or ``None`` when Odoo does not log it (Odoo 12-13, uninstalled modules).
+    """
+    names = module_ids.mapped('name')
+    with ModuleLoadTimer() as timer:
+        getattr(module_ids, MODULE_BUTTONS[action])()
+    return {name: {'ok': True, 'elapsed': timer.times.get(name)} for name in names}
+
+
+def run_one_by_one(module_ids, action: str, log: Callable[[str], None] = print) -> Dict[str, dict]:
+    """Apply *action* to each module with its own registry rebuild; a failing module does not stop the others."""
+    outcome = {}
+    for module in module_ids:
+        name = module.name
+        start = time.monotonic()
+        try:
+            getattr(module, MODULE_BUTTONS[action])()
+            ok = True
+        except Exception:
+            log(traceback.format_exc())
+            ok = False
+        outcome[name] = {'ok': ok, 'elapsed': round(time.monotonic() - start, 3)}
+        log(f"{name}: {'done' if ok else 'failed'} in {outcome[name]['elapsed']:.1f}s")
+    return outcome
+
+
+def run_module_action(
+    module_ids, action: str, batch: bool = True, log: Optional[Callable[[str], None]] = print,
+) -> Dict[str, dict]:
+    """
+    Install, update or uninstall *module_ids* and return ``{name: {'ok': bool, 'elapsed': seconds}}``.
+
+    By default all modules are applied together with one registry rebuild instead of one rebuild per
+    module. If the batch fails, the pending changes it made are cancelled (marks set before are kept) and
+    the modules are retried one by one.
+    """
+    if action not in MODULE_BUTTONS:
+        raise ValueError(f"Unknown module action {action!r}, expected one of {', '.join(MODULE_BUTTONS)}")
+    log = log or (lambda line: None)
+    if batch and len(module_ids) > 1:
+        previous = pending_marks(module_ids.env)
+        start = time.monotonic()
+        try:
+            outcome = run_batch(module_ids, action)
+            log(f"{len(outcome)} modules processed in one registry rebuild in {time.monotonic() - start:.1f}s")
+            for name, result in outcome.items():
+                if result['elapsed'] is not None:
+                    log(f"{name}: loaded in {result['elapsed']:.2f}s")
+            return outcome
+        except Exception:
+            log(traceback.format_exc())
+            log("Batch failed, retrying module by module")
+            module_ids = reset_pending(module_ids, previous)
+    return run_one_by_one(module_ids, action, log)
+
+
+def addons_paths() -> List[str]:
+    """Return the addons paths of the loaded Odoo, as initialized from the config."""
+    import odoo.addons
+    return list(odoo.addons.__path__)
+
+
+def manifest_fingerprint(paths: List[str]) -> str:
+    """
+    Return a digest of the addons found in *paths*: module names, manifest mtimes and sizes.
+
+    Only the top level of every addons path is listed and one ``stat`` is made per module, so this stays
+    in the milliseconds even with thousands of addons, unlike parsing every manifest.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(f"{path}\0".encode())
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            for manifest in MANIFEST_NAMES:
+                try:
+                    st = os.stat(os.path.join(entry.path, manifest))
+                except OSError:
+                    continue
+                digest.update(f"{entry.name}/{manifest}:{st.st_mtime_ns}:{st.st_size}\0".encode())
+                break
+    return digest.hexdigest()
+
+
+def _module_list_key(env, paths: List[str]) -> Dict:
+    """Describe the addons on disk and the module list stored in the database."""
+    env.cr.execute("SELECT count(*), max(write_date) FROM ir_module_module")
+    count, last_write = env.cr.fetchone()
+    return {
+        'manifests': manifest_fingerprint(paths),
+        'database_uuid': env['ir.config_parameter'].sudo().get_param('database.uuid'),
+        'modules': count,
+        'last_write': str(last_write),
+    }
+
+
+def refresh_module_list(env, force: bool = False) -> bool:
+    """
+    Update the module list of *env*'s database (``base.module.update``) unless nothing changed since the last time.
+
+    The list is refreshed only when the manifests on disk (see :func:`manifest_fingerprint`) or the module
+    table of the database differ from what was recorded in ``~/.cache/odootools/module_list.json`` after the
+    previous refresh. Set ``ODOOTOOLS_NO_CACHE`` to refresh every time.
+
+    :param force: Refresh even if nothing seems to have changed
+    :return: True if the list was refreshed
+    """
+    use_cache = cache_enabled()
+    db_name = env.cr.dbname
+    paths = addons_paths()
+    cached = load_json(MODULE_LIST_CACHE, {}) if use_cache else {}
+    if not isinstance(cached, dict):
+        cached = {}
+    if use_cache and not force and cached.get(db_name) == _module_list_key(env, paths):
+        return False
+
+    env['base.module.update'].create({}).update_module()
+    if use_cache:
+        cached[db_name] = _module_list_key(env, paths)
+        dump_json(MODULE_LIST_CACHE, cached)
+    return True
@@ -0,0 +1,88 @@
+import os
+import time
+import threading
+import subprocess
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+
+_print_lock = threading.Lock()
+
+
+class DbResult:
+    """Outcome of an action run on one database by :func:`run_for_databases`."""
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self.ok = False
+        self.elapsed = 0.0
+        self.error = None
+
+    def __repr__(self):
+        return f"DbResult({self.db_name!r}, ok={self.ok}, elapsed={self.elapsed:.1f}s)"
+
+
+def default_db_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+def prefixed_logger(prefix: str) -> Callable[[str], None]:
+    """Return a thread-safe ``log(line)`` that prints every line with *prefix*."""
+    def log(line: str) -> None:
+        with _print_lock:
+            print(f"{prefix}{line.rstrip()}", flush=True)
+    return log
+
+
+def stream_command(cmd: List[str], log: Callable[[str], None], env: Optional[Dict[str, str]] = None) -> int:
+    """Run *cmd*, pass every output line to *log* and return the exit code."""
+    with subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, env=env,
+    ) as p:
+        for line in p.stdout:
+            log(line)
+        return p.wait()
+
+
+def run_for_databases(
+    db_names: List[str],
+    action: Callable[[str, Callable[[str], None]], Optional[bool]],
+    workers: Optional[int] = None,
+) -> List[DbResult]:
+    """
+    Run ``action(db_name, log)`` for every database on a bounded thread pool.
+
+    ``log`` prints lines prefixed with the database name. The action fails if it raises or returns ``False``.
+    Results are returned in the order of *db_names*.
+    """
+    width = max((len(db) for db in db_names), default=0)
+
+    def run(db_name: str) -> DbResult:
+        result = DbResult(db_name)
+        log = prefixed_logger(f"[{db_name.ljust(width)}] ")
+        start = time.monotonic()
+        try:
+            result.ok = action(db_name, log) is not False
+        except Exception as e:
+            result.error = str(e) or e.__class__.__name__
+            for line in traceback.format_exc().splitlines():
+                log(line)
+        result.elapsed = time.monotonic() - start
+        log(f"done in {result.elapsed:.1f}s" if result.ok else "failed")
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers or default_db_workers()) as pool:
+        return list(pool.map(run, db_names))
+
+
+def print_summary(results: List[DbResult]) -> None:
+    """Print one line per database with its status and duration, then the totals."""
+    width = max([len(r.db_name) for r in results] + [8])
+    print(f"{'Database'.ljust(width)}  Status  Time")
+    for r in results:
+        status = 'ok    ' if r.ok else 'failed'
+        error = f"  {r.error}" if r.error else ''
+        print(f"{r.db_name.ljust(width)}  {status}  {r.elapsed:.1f}s{error}")
+    failed = sum(not r.ok for r in results)
+    print(f"{len(results) - failed}/{len(results)} succeeded, {failed} failed")
@@ -0,0 +1,308 @@
+import os
+import queue
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .filestore import default_workers
+from .pgadmin import PgAdmin
+from .repository import _SHA1_PATH
+
+
+STORE_FNAME_QUERY = "SELECT store_fname FROM ir_attachment WHERE store_fname IS NOT NULL"
+RECHECK_QUERY = "SELECT store_fname FROM ir_attachment WHERE store_fname = ANY(%s)"
+# Files younger than this may belong to an attachment whose transaction is not committed yet
+DEFAULT_MIN_AGE = 24 * 3600
+# Odoo's own list of files to garbage collect (see ir.attachment._gc_file_store)
+_SKIPPED_DIRS = {'checklist'}
+# Files per chunk handed over by the scanning threads
+_SCAN_CHUNK = 1000
+# Orphans re-checked against ir_attachment under one lock before they are quarantined
+RECHECK_BATCH = 1000
+
+
+class ReferencedFiles:
+    """
+    Compact set of ``store_fname`` values.
+
+    Odoo names blobs ``<xx>/<sha1>``: for each of the 256 ``xx`` directories the next 64 bits of the sha1 are
+    kept in a sorted ``array('Q')``, 8 bytes per attachment instead of ~100 for a Python string in a set.
+    Two files sharing 72 sha1 bits are practically impossible, and would only keep an orphan, never report a
+    referenced file. Names in another layout are kept as is.
+    """
+
+    def __init__(self):
+        self._buckets: List[array] = [array('Q') for _ in range(256)]
+        self._others: Set[str] = set()
+        self._sorted = True
+
+    @staticmethod
+    def _split(name: str) -> Optional[Tuple[int, int]]:
+        match = _SHA1_PATH.match(name)
+        if not match:
+            return None
+        sha1 = match.group(2)
+        return int(sha1[:2], 16), int(sha1[2:18], 16)
+
+    def add(self, name: str) -> None:
+        name = name.replace(os.sep, '/')
+        key = self._split(name)
+        if key is None:
+            self._others.add(name)
+            return
+        self._buckets[key[0]].append(key[1])
+        self._sorted = False
+
+    def freeze(self) -> 'ReferencedFiles':
+        """Sort and deduplicate, one bucket at a time to keep the peak memory low. Called by ``in`` if needed."""
+        for i, bucket in enumerate(self._buckets):
+            self._buckets[i] = array('Q', sorted(set(bucket)))
+        self._sorted = True
+        return self
+
+    def __contains__(self, name: str) -> bool:
+        if not self._sorted:
+            self.freeze()
+        name = name.replace(os.sep, '/')
+        key = self._split(name)
+        if key is None:
+            return name in self._others
+        bucket = self._buckets[key[0]]
+        i = bisect_left(bucket, key[1])
+        return i < len(bucket) and bucket[i] == key[1]
+
+    def __len__(self) -> int:
+        if not self._sorted:
+            self.freeze()
+        return sum(len(bucket) for bucket in self._buckets) + len(self._others)
+
+    @property
+    def memory(self) -> int:
+        """Approximate bytes used by the compact part of the set."""
+        return sum(bucket.itemsize * len(bucket) for bucket in self._buckets)
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> 'ReferencedFiles':
+        referenced = cls()
+        for name in names:
+            referenced.add(name)
+        return referenced.freeze()
+
+
+class OrphanStats:
+    """Result of :func:`find_orphans`."""
+
+    def __init__(self):
+        self.referenced = 0
+        self.files = 0
+        self.bytes = 0
+        self.orphans = 0
+        self.orphan_bytes = 0
+        self.recent = 0
+        self.revived = 0
+        self.quarantined = 0
+        self.load_time = 0.0
+        self.scan_time = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'referenced': self.referenced,
+            'files': self.files,
+            'bytes': self.bytes,
+            'orphans': self.orphans,
+            'orphan_bytes': self.orphan_bytes,
+            'recent': self.recent,
+            'revived': self.revived,
+            'quarantined': self.quarantined,
+            'load_time': round(self.load_time, 3),
+            'scan_time': round(self.scan_time, 3),
+        }
+
+    def __repr__(self):
+        return (
+            f"OrphanStats(files={self.files}, orphans={self.orphans}, orphan_bytes={self.orphan_bytes}, "
+            f"recent={self.recent}, quarantined={self.quarantined})"
+        )
+
+
+def _iter_dir(root: str, rel_dir: str) -> Iterator[Tuple[str, int, float]]:
+    stack = [rel_dir]
+    while stack:
+        current = stack.pop()
+        with os.scandir(os.path.join(root, current)) as it:
+            for entry in it:
+                rel = f"{current}/{entry.name}" if current else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel)
+                else:
+                    st = entry.stat(follow_symlinks=False)
+                    yield rel, st.st_size, st.st_mtime
+
+
+def scan_filestore(filestore_dir: str, workers: Optional[int] = None) -> Iterator[Tuple[str, int, float]]:
+    """
+    Yield ``(relative_path, size, mtime)`` for every file of a filestore, skipping Odoo's ``checklist``.
+
+    Top-level directories are listed with ``os.scandir`` by *workers* threads, one directory each at a time.
+    Entries are handed over in chunks through a bounded queue, so a consumer slower than the scan (e.g. one
+    moving every file) holds back the threads instead of letting the listing pile up in memory.
+    """
+    top_files, dirs = [], []
+    with os.scandir(filestore_dir) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in _SKIPPED_DIRS:
+                    dirs.append(entry.name)
+            else:
+                st = entry.stat(follow_symlinks=False)
+                top_files.append((entry.name, st.st_size, st.st_mtime))
+    yield from top_files
+    if not dirs:
+        return
+
+    workers = min(workers or default_workers(), len(dirs))
+    chunks: queue.Queue = queue.Queue(maxsize=workers * 2)
+    pending = iter(dirs)
+    pending_lock = threading.Lock()
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker() -> None:
+        try:
+            while not stop.is_set():
+                with pending_lock:
+                    rel_dir = next(pending, None)
+                if rel_dir is None:
+                    return
+                chunk = []
+                for file in _iter_dir(filestore_dir, rel_dir):
+                    chunk.append(file)
+                    if len(chunk) >= _SCAN_CHUNK:
+                        if not put(chunk):
+                            return
+                        chunk = []
+                if chunk and not put(chunk):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(workers):
+            pool.submit(worker)
+        running = workers
+        try:
+            while running:
+                item = chunks.get()
+                if item is None:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            # Also reached when the caller stops iterating: release the threads blocked on the queue
+            stop.set()
+
+
+@contextmanager
+def locked_references(pg: PgAdmin, db_name: str, names: List[str]) -> Iterator[Set[str]]:
+    """
+    Yield which of *names* ``ir_attachment`` references now, keeping it locked until the block ends.
+
+    ``SHARE`` mode, as in Odoo's ``_gc_file_store``, waits for the transactions writing attachments and
+    blocks new ones, so a file found unreferenced can be moved before Odoo points an attachment at it.
+    """
+    with pg.transaction(db_name) as cr:
+        cr.execute("LOCK TABLE ir_attachment IN SHARE MODE")
+        cr.execute(RECHECK_QUERY, (names,))
+        yield {row[0] for row in cr.fetchall()}
+
+
+def find_orphans(
+    store_fnames: Iterable[str],
+    filestore_dir: str,
+    min_age: float = DEFAULT_MIN_AGE,
+    quarantine: Optional[str] = None,
+    report: Optional[str] = None,
+    workers: Optional[int] = None,
+    recheck: Optional[Callable[[List[str]], ContextManager[Set[str]]]] = None,
+) -> OrphanStats:
+    """
+    Find the files of *filestore_dir* that no ``ir_attachment.store_fname`` references.
+
+    *store_fnames* is consumed once into a :class:`ReferencedFiles` (stream it from a server-side cursor to
+    keep memory bounded), then the filestore is scanned. Orphans are streamed to *report* and *quarantine*
+    as they are found, never held in memory beyond a batch of :data:`RECHECK_BATCH`.
+
+    :param min_age: Files modified less than this many seconds ago are never orphans: their attachment may
+        be in a transaction that is not committed yet
+    :param quarantine: Move orphans to this directory, keeping their relative path (``os.replace``, so it
+        must be on the filesystem of the filestore). Move them back to undo.
+    :param report: Write one ``path<TAB>size`` line per orphan to this file
+    :param recheck: Called with each batch of orphans before they are reported or moved; returns a context
+        manager yielding the ones referenced since *store_fnames* was read, held while the batch is moved
+        (see :func:`locked_references`). Odoo reuses an existing blob for a new attachment with the same
+        content without touching its mtime, so an old orphan can come back to life during the scan.
+    """
+    stats = OrphanStats()
+    start = time.monotonic()
+    referenced = ReferencedFiles.from_names(store_fnames)
+    stats.referenced = len(referenced)
+    stats.load_time = time.monotonic() - start
+
+    start = time.monotonic()
+    deadline = time.time() - min_age
+    report_file = open(report, 'w') if report else None
+    batch: List[Tuple[str, int]] = []
+
+    def flush() -> None:
+        names = [rel for rel, _ in batch]
+        with recheck(names) if recheck else nullcontext(set()) as revived:
+            for rel, size in batch:
+                if rel in revived:
+                    stats.revived += 1
+                    continue
+                stats.orphans += 1
+                stats.orphan_bytes += size
+                if report_file:
+                    report_file.write(f"{rel}\t{size}\n")
+                if quarantine:
+                    target = os.path.join(quarantine, rel)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(os.path.join(filestore_dir, rel), target)
+                    stats.quarantined += 1
+        batch.clear()
+
+    try:
+        for rel, size, mtime in scan_filestore(filestore_dir, workers):
+            stats.files += 1
+            stats.bytes += size
+            if rel in referenced:
+                continue
+            if mtime > deadline:
+                stats.recent += 1
+                continue
+            batch.append((rel, size))
+            if len(batch) >= (RECHECK_BATCH if recheck else 1):
+                flush()
+        if batch:
+            flush()
+    finally:
+        if report_file:
+            report_file.close()
+    stats.scan_time = time.monotonic() - start
+    return stats
@@ -0,0 +1,250 @@
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import psycopg2
+from psycopg2 import sql
+
+
+# Odoo conf options and the libpq connection parameters they map to
+_CONNECTION_OPTIONS = {
+    'db_host': 'host',
+    'db_port': 'port',
+    'db_user': 'user',
+    'db_password': 'password',
+    'db_sslmode': 'sslmode',
+}
+
+# "source database is being accessed by other users"
+OBJECT_IN_USE = '55006'
+
+
+class PgAdminError(Exception):
+    """Raised when an administrative PostgreSQL command fails."""
+
+    def __init__(self, message: str, pgcode: Optional[str] = None):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+class CloneStats:
+    """Result of :meth:`PgAdmin.clone`."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.terminated = 0
+        self.drain_time = 0.0
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (
+            f"CloneStats(attempts={self.attempts}, terminated={self.terminated}, "
+            f"drain_time={self.drain_time:.2f}s, elapsed={self.elapsed:.2f}s)"
+        )
+
+
+class PgAdmin:
+    """
+    Administrative commands over one reusable autocommit connection to the maintenance database.
+
+    The connection is opened on first use with the settings of an Odoo conf file (see
+    :func:`~odootools.conf.read_conf`) and reopened if the server closed it. Failures raise
+    :class:`PgAdminError` carrying the PostgreSQL error code.
+    """
+
+    def __init__(self, options: Optional[Dict[str, str]] = None, maintenance_db: str = 'postgres'):
+        options = options or {}
+        self.params = {param: options[key] for key, param in _CONNECTION_OPTIONS.items() if options.get(key)}
+        self.maintenance_db = maintenance_db
+        self._conn = None
+
+    def _connect(self, db_name: str):
+        try:
+            conn = psycopg2.connect(dbname=db_name, **self.params)
+        except psycopg2.Error as e:
+            raise PgAdminError(str(e).strip(), e.pgcode) from e
+        conn.autocommit = True
+        return conn
+
+    @property
+    def connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect(self.maintenance_db)
+        return self._conn
+
+    def execute(self, query, params: Optional[Sequence[Any]] = None, db_name: Optional[str] = None) -> List[tuple]:
+        """
+        Run *query* and return its rows (an empty list for commands without a result).
+
+        :param db_name: Run on a short-lived connection to this database instead of the maintenance one
+        """
+        conn = self.connection if db_name is None else self._connect(db_name)
+        try:
+            with conn.cursor() as cr:
+                cr.execute(query, params)
+                return cr.fetchall() if cr.description else []
+        except psycopg2.Error as e:
+            raise PgAdminError(str(e).strip(), e.pgcode) from e
+        finally:
+            if db_name is not None:
+                conn.close()
+
+    def column(self, query, params: Optional[Sequence[Any]] = None, db_name: Optional[str] = None) -> list:
+        """Run *query* and return the first column of every row."""
+        return [row[0] for row in self.execute(query, params, db_name)]
+
+    def stream(
+        self, query, params: Optional[Sequence[Any]] = None, db_name: Optional[str] = None, itersize: int = 100000,
+    ) -> Iterator[tuple]:
+        """
+        Yield the rows of *query* through a server-side cursor, fetching *itersize* rows at a time, so that
+        large tables are read in bounded memory. Runs on its own connection, closed when the iteration ends.
+        """
+        conn = self._connect(db_name or self.maintenance_db)
+        conn.autocommit = False
+        try:
+            with conn.cursor(name='odootools_stream') as cr:
+                cr.itersize = itersize
+                cr.execute(query, params)
+                yield from cr
+        except psycopg2.Error as e:
+            raise PgAdminError(str(e).strip(), e.pgcode) from e
+        finally:
+            conn.close()
+
+    @contextmanager
+    def export_snapshot(self, db_name: str) -> Iterator[str]:
+        """
+        Yield the id of a snapshot of *db_name* (``pg_export_snapshot``), valid until the block ends, so that
+        several ``pg_dump --snapshot`` processes dump the same consistent state.
+        """
+        conn = self._connect(db_name)
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cr:
+                cr.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cr.execute("SELECT pg_export_snapshot()")
+                yield cr.fetchone()[0]
+        except psycopg2.Error as e:
+            raise PgAdminError(str(e).strip(), e.pgcode) from e
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self, db_name: str) -> Iterator[Any]:
+        """Yield a cursor on a new connection to *db_name* in a transaction, committed when the block ends."""
+        conn = self._connect(db_name)
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cr:
+                yield cr
+            conn.commit()
+        except psycopg2.Error as e:
+            raise PgAdminError(str(e).strip(), e.pgcode) from e
+        finally:
+            conn.close()
+
+    def list_dbs(self) -> List[str]:
+        """Same databases as odoo.service.db.list_dbs(force=True): the ones owned by the connecting user."""
+        return self.column(
+            "SELECT datname FROM pg_database "
+            "WHERE datdba = (SELECT usesysid FROM pg_user WHERE usename = current_user) "
+            "AND NOT datistemplate AND datallowconn AND datname <> 'postgres' ORDER BY datname"
+        )
+
+    def db_exists(self, db_name: str) -> bool:
+        return bool(self.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,)))
+
+    def login_roles(self) -> List[str]:
+        return self.column("SELECT rolname FROM pg_roles WHERE rolcanlogin ORDER BY rolname")
+
+    def terminate_backends(self, db_name: str) -> int:
+        """Close every other session connected to *db_name* and return how many were terminated."""
+        return len(self.execute(
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()",
+            (db_name,),
+        ))
+
+    def clone(
+        self, db_name: str, template: str, owner: Optional[str] = None, timeout: float = 30.0, interval: float = 0.2,
+    ) -> CloneStats:
+        """
+        Create *db_name* as a copy of *template*, even while workers or crons keep reconnecting to it.
+
+        New connections to *template* are refused (``ALLOW_CONNECTIONS false``) while its sessions are
+        terminated and ``CREATE DATABASE ... TEMPLATE`` is retried every *interval* seconds. The setting is
+        restored afterwards, whatever the outcome. Without the privilege to change it (owner or superuser),
+        sessions are only terminated between attempts.
+
+        :raise PgAdminError: if *template* is still in use after *timeout* seconds, or on any other error
+        """
+        stats = CloneStats()
+        start = time.monotonic()
+        allowed = self.execute("SELECT datallowconn FROM pg_database WHERE datname = %s", (template,))
+        if not allowed:
+            raise PgAdminError(f'database "{template}" does not exist')
+        locked = False
+        if allowed[0][0]:
+            try:
+                self._allow_connections(template, False)
+                locked = True
+            except PgAdminError:
+                pass
+        query = sql.SQL("CREATE DATABASE {} WITH TEMPLATE {}").format(sql.Identifier(db_name), sql.Identifier(template))
+        if owner:
+            query += sql.SQL(" OWNER {}").format(sql.Identifier(owner))
+        try:
+            while True:
+                stats.terminated += self.terminate_backends(template)
+                stats.attempts += 1
+                attempt = time.monotonic()
+                try:
+                    self.execute(query)
+                    break
+                except PgAdminError as e:
+                    if e.pgcode != OBJECT_IN_USE or time.monotonic() - start >= timeout:
+                        raise
+                # CREATE DATABASE waits up to 5s for the template to become free before failing
+                stats.drain_time += time.monotonic() - attempt
+                time.sleep(interval)
+                stats.drain_time += interval
+        finally:
+            if locked:
+                self._allow_connections(template, True)
+        stats.elapsed = time.monotonic() - start
+        return stats
+
+    def _allow_connections(self, db_name: str, allow: bool) -> None:
+        self.execute(sql.SQL("ALTER DATABASE {} WITH ALLOW_CONNECTIONS {}").format(
+            sql.Identifier(db_name), sql.SQL('true' if allow else 'false'),
+        ))
+
+    def reset_identity(self, db_name: str) -> None:
+        """Give the Odoo database *db_name* a new ``database.uuid`` and ``database.secret``, as Odoo does for copies."""
+        self.execute(
+            "UPDATE ir_config_parameter SET value = CASE key "
+            "WHEN 'database.uuid' THEN %s WHEN 'database.secret' THEN %s ELSE to_char(now() AT TIME ZONE 'UTC', "
+            "'YYYY-MM-DD HH24:MI:SS') END "
+            "WHERE key IN ('database.uuid', 'database.secret', 'database.create_date')",
+            (str(uuid.uuid1()), str(uuid.uuid4())), db_name=db_name,
+        )
+
+    def drop(self, db_name: str) -> None:
+        """``DROP DATABASE IF EXISTS``, after closing the sessions on *db_name*."""
+        self.terminate_backends(db_name)
+        self.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(db_name)))
+
+    def set_owner(self, db_name: str, role: str) -> None:
+        self.execute(sql.SQL("ALTER DATABASE {} OWNER TO {}").format(sql.Identifier(db_name), sql.Identifier(role)))
+
+    def close(self) -> None:
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
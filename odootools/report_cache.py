@@ -0,0 +1,164 @@
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from .cache import cache_dir
+from .reports import render_pdf
+
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+_T_CALL = re.compile(r'''t-call=["']([\w.]+)["']''')
+
+
+class ReportCache:
+    """
+    Size-bounded on-disk cache of rendered report PDFs.
+
+    Entries are files named after their key. Reading an entry refreshes its mtime, and once the cache grows
+    over ``max_size`` bytes the entries with the oldest mtime are removed first (least recently used).
+    Several processes may share the same directory: entries are written atomically.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = Path(directory) if directory else cache_dir() / 'reports'
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp, self._path(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self._evict()
+        except OSError:
+            pass
+
+    def _entries(self) -> List[os.DirEntry]:
+        return [e for e in os.scandir(self.directory) if e.name.endswith('.pdf')]
+
+    def _evict(self) -> None:
+        entries = [(e.stat(), e.path) for e in self._entries()]
+        total = sum(st.st_size for st, _ in entries)
+        for st, path in sorted(entries, key=lambda entry: entry[0].st_mtime_ns):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= st.st_size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters of this instance and the current size of the cache."""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 2) if lookups else 0.0,
+            'entries': len(entries),
+            'size': sum(e.stat().st_size for e in entries),
+        }
+
+
+def _template_views(env, xml_id: str):
+    """
+    Return the QWeb views rendering *xml_id*: the template itself, the views inheriting from it and,
+    recursively, the templates reached through static ``t-call`` references.
+    """
+    views = env['ir.ui.view']
+    pending = [xml_id]
+    seen = set()
+    while pending:
+        ref = pending.pop()
+        if ref in seen:
+            continue
+        seen.add(ref)
+        view = env.ref(ref, raise_if_not_found=False)
+        if not view or view._name != 'ir.ui.view':
+            continue
+        family = view
+        children = view.inherit_children_ids
+        while children:
+            family |= children
+            children = children.inherit_children_ids - family
+        views |= family
+        for arch in family.mapped('arch_db'):
+            pending += [r if '.' in r else f"{ref.split('.')[0]}.{r}" for r in _T_CALL.findall(arch or '')]
+    return views
+
+
+def report_cache_key(env, report, res_ids: List[int], odoo_version) -> str:
+    """
+    Return the cache key of *report* rendered for *res_ids*.
+
+    The key covers the report action, the ``write_date`` of the records, the arch of every template the
+    report renders, the Odoo version, the database, the user and the context language. Changes in related
+    records (e.g. the customer of an invoice) do not touch the record's ``write_date`` and are not detected.
+    """
+    digest = hashlib.sha1()
+    records = env[report.model].browse(res_ids)
+    write_dates = records.mapped('write_date') if 'write_date' in records._fields else []
+    parts = [
+        str(odoo_version), env.cr.dbname, str(env.uid), str(env.context.get('lang')),
+        str(report.id), str(report.write_date), repr(list(res_ids)), repr([str(d) for d in write_dates]),
+    ]
+    for view in _template_views(env, report.report_name).sorted('id'):
+        parts.append(f"{view.id}:{hashlib.sha1((view.arch_db or '').encode()).hexdigest()}")
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def cached_render_pdf(cache: Optional[ReportCache], env, report, res_ids: List[int], odoo_version) -> bytes:
+    """:func:`~odootools.reports.render_pdf` going through *cache* when one is given."""
+    if cache is None:
+        return render_pdf(env, report, res_ids, odoo_version)
+    key = report_cache_key(env, report, res_ids, odoo_version)
+    content = cache.get(key)
+    if content is None:
+        content = render_pdf(env, report, res_ids, odoo_version)
+        cache.put(key, content)
+    return content
@@ -0,0 +1,69 @@
+import os
+import atexit
+from typing import List, Optional, Union
+from packaging import version as pkg_version
+
+
+# Tools instance owned by each report worker process (see print_reports)
+_worker_tools = None
+
+
+def render_pdf(env, report, res_ids: List[int], odoo_version) -> bytes:
+    """
+    Render *report* for *res_ids* and return the PDF content.
+
+    Report rendering API changed across Odoo versions:
+    Odoo 12-13: render_qweb_pdf (public) on the report record
+    Odoo 14-16: _render_qweb_pdf on the report record
+    Odoo 17+:   _render_qweb_pdf as @api.model with explicit report_ref
+    """
+    if odoo_version >= pkg_version.parse('17.0'):
+        pdf_content, _ = env['ir.actions.report']._render_qweb_pdf(report, res_ids)
+    elif odoo_version >= pkg_version.parse('14.0'):
+        pdf_content, _ = report._render_qweb_pdf(res_ids)
+    else:
+        pdf_content, _ = report.render_qweb_pdf(res_ids)
+    return pdf_content
+
+
+def chunked(ids: List[int], size: int) -> List[List[int]]:
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def _init_worker(db_name: str, odoo_conf: str, uid: int, context: dict, report_cache: Optional[tuple] = None):
+    """
+    Process pool initializer: every worker loads its own registry and opens its own cursor.
+
+    *report_cache* is the ``(directory, max_size)`` of the parent's report cache, shared by the workers.
+    """
+    global _worker_tools
+    from .report_cache import ReportCache
+    from .utils import Tools
+    cache = ReportCache(*report_cache) if report_cache else None
+    _worker_tools = Tools(db_name, odoo_conf=odoo_conf, uid=uid, context=context, report_cache=cache)
+    atexit.register(_worker_tools.close)
+
+
+def render_chunk(
+    tools, report_xml_id: str, res_ids: List[int], output_dir: Optional[str], file_pattern: str,
+) -> Union[bytes, List[str]]:
+    """
+    Render one chunk of records with *tools*.
+
+    With *output_dir* every record is rendered and written to its own file and the file paths are
+    returned; otherwise the chunk is rendered as a single multi-record PDF and its content is returned.
+    """
+    report = tools.get_env().ref(report_xml_id)
+    if output_dir is None:
+        return tools.render_report(report, res_ids)
+    files = []
+    for res_id in res_ids:
+        path = os.path.join(output_dir, file_pattern.format(res_id=res_id))
+        with open(path, 'wb') as f:
+            f.write(tools.render_report(report, [res_id]))
+        files.append(path)
+    return files
+
+
+def _render_chunk_in_worker(args):
+    return render_chunk(_worker_tools, *args)
@@ -0,0 +1,346 @@
+import os
+import re
+import gzip
+import json
+import fcntl
+import shutil
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from .backup import COPY_BUFSIZE, BackupError, _manifest_slim, _run_pg, pg_restore_slim
+from .filestore import TRANSFER_MODES, CopyStats, _already_present, _copy_one, default_workers, iter_files
+
+if TYPE_CHECKING:
+    from .slim import SlimProfile
+
+
+BLOBS_DIR = 'blobs'
+BACKUPS_DIR = 'backups'
+FILE_LIST = 'filestore.lst.gz'
+MANIFEST = 'manifest.json'
+DUMP_DIR = 'dump'
+
+# Odoo stores attachments as <first 2 hex digits>/<sha1 of the content>
+_SHA1_PATH = re.compile(r'^([0-9a-f]{2})/(\1[0-9a-f]{38})$')
+_TMP_SUFFIX = '.tmp'
+
+
+def _backup_dir(path: str) -> str:
+    """Accept a backup directory or the path of its ``manifest.json``."""
+    return os.path.dirname(path) if os.path.basename(path) == MANIFEST else path
+
+
+def is_repository_backup(path: str) -> bool:
+    """Return ``True`` if *path* is a complete backup written by :func:`backup_to_repository`."""
+    path = _backup_dir(path)
+    return os.path.isfile(os.path.join(path, MANIFEST)) and os.path.isfile(os.path.join(path, FILE_LIST))
+
+
+def _repository_root(backup_dir: str) -> str:
+    # <repo>/backups/<db>/<timestamp>
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(backup_dir))))
+
+
+def _blob_path(repo: str, key: str) -> str:
+    return os.path.join(repo, BLOBS_DIR, key[:2], key)
+
+
+def blob_key(rel: str, path: str) -> str:
+    """
+    Return the content key of a filestore file: the sha1 Odoo already names it after, or the sha1 of its
+    content for files stored under another name.
+    """
+    match = _SHA1_PATH.match(rel.replace(os.sep, '/'))
+    if match:
+        return match.group(2)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_BUFSIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _locked(repo: str, exclusive: bool) -> Iterator[None]:
+    """Backups share the repository lock; :func:`prune_repository` takes it alone."""
+    os.makedirs(repo, exist_ok=True)
+    with open(os.path.join(repo, 'lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _store_blobs(
+    repo: str, filestore_dir: str, list_path: str, mode: str, workers: int, slim: Optional['SlimProfile'] = None,
+) -> CopyStats:
+    """Write the blobs of *filestore_dir* missing from *repo* and the ``key size path`` list of all of them."""
+    stats = CopyStats()
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(workers * 64)
+    errors = []
+    start = time.monotonic()
+
+    with gzip.open(list_path, 'wt') as listing:
+        def task(rel: str, path: str, size: int) -> None:
+            try:
+                key = blob_key(rel, path)
+                dst = _blob_path(repo, key)
+                stored = _already_present(dst, size)
+                if not stored:
+                    # Blobs appear under their final name only once complete
+                    tmp = f"{dst}.{os.getpid()}-{threading.get_ident()}{_TMP_SUFFIX}"
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    fallback = _copy_one(path, tmp, mode)
+                    os.replace(tmp, dst)
+                with lock:
+                    listing.write(f"{key}\t{size}\t{rel}\n")
+                    if stored:
+                        stats.skipped += 1
+                        stats.skipped_bytes += size
+                    else:
+                        stats.files += 1
+                        stats.bytes += size
+                        stats.fallbacks += fallback
+            except Exception as e:
+                errors.append(e)
+            finally:
+                slots.release()
+
+        if os.path.isdir(filestore_dir or ''):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for rel, path, size in iter_files(filestore_dir):
+                    if errors:
+                        break
+                    if slim and not slim.includes_file(rel, path):
+                        continue
+                    slots.acquire()
+                    pool.submit(task, rel, path, size)
+
+    stats.elapsed = time.monotonic() - start
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def backup_to_repository(
+    db_name: str,
+    repo: str,
+    filestore_dir: Optional[str],
+    manifest: Optional[dict] = None,
+    jobs: Optional[int] = None,
+    mode: str = 'copy',
+    workers: Optional[int] = None,
+    pg_dump: str = 'pg_dump',
+    env: Optional[Dict[str, str]] = None,
+    slim: Optional['SlimProfile'] = None,
+) -> Tuple[str, CopyStats]:
+    """
+    Back up *db_name* into the deduplicating repository *repo*.
+
+    The backup is a directory ``<repo>/backups/<db>/<timestamp>`` holding the SQL dump (``pg_dump -Fd -j``),
+    the list of the filestore files and their content keys, and ``manifest.json``, written last. Blobs are
+    stored once in ``<repo>/blobs`` for all backups and databases, so a backup only writes the blobs no
+    earlier backup stored. The dump runs while the blobs are stored.
+
+    :param manifest: Odoo backup manifest (see ``odoo.service.db.dump_db_manifest``)
+    :param jobs: Number of parallel ``pg_dump`` jobs (default: CPU count)
+    :param mode: How new blobs are stored: ``copy``, ``hardlink`` or ``reflink``. Hardlinks cost no space but
+        keep the blobs on the filesystem of the filestore.
+    :param slim: Leave out the data of its excluded tables and the files it does not include; recorded in the
+        manifest so that restores apply it too
+    :return: ``(backup_dir, blob_stats)``; skipped blobs were already in the repository
+    :raises BackupError: If ``pg_dump`` fails. The incomplete backup is removed.
+    """
+    if mode not in TRANSFER_MODES or mode == 'move':
+        raise ValueError(f"Invalid copy mode '{mode}'")
+    jobs = jobs or os.cpu_count() or 1
+    workers = workers or default_workers()
+    with _locked(repo, exclusive=False):
+        parent = os.path.join(repo, BACKUPS_DIR, db_name)
+        os.makedirs(parent, exist_ok=True)
+        name = datetime.now().strftime('%Y%m%dT%H%M%S')
+        backup_dir = os.path.join(parent, name)
+        suffix = 1
+        while os.path.exists(backup_dir):
+            backup_dir = os.path.join(parent, f"{name}-{suffix}")
+            suffix += 1
+        os.makedirs(backup_dir)
+        try:
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                dump = pool.submit(_run_pg, [
+                    pg_dump, '--no-owner', '--format=directory', f'--jobs={jobs}',
+                    f"--file={os.path.join(backup_dir, DUMP_DIR)}", *(slim.pg_dump_args() if slim else ()), db_name,
+                ], env)
+                stats = _store_blobs(repo, filestore_dir, os.path.join(backup_dir, FILE_LIST), mode, workers, slim)
+                dump.result()
+            with open(os.path.join(backup_dir, MANIFEST), 'w') as f:
+                json.dump({
+                    **(manifest or {}),
+                    'database': db_name,
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'filestore_files': stats.files + stats.skipped,
+                    'filestore_bytes': stats.bytes + stats.skipped_bytes,
+                    **({'slim': slim.manifest_entry()} if slim else {}),
+                }, f, indent=4)
+        except BaseException:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+            raise
+    return backup_dir, stats
+
+
+def _read_list(backup_dir: str) -> Iterator[Tuple[str, int, str]]:
+    with gzip.open(os.path.join(backup_dir, FILE_LIST), 'rt') as listing:
+        for line in listing:
+            key, size, rel = line.rstrip('\n').split('\t', 2)
+            yield key, int(size), rel
+
+
+def restore_from_repository(
+    backup_path: str,
+    db_name: str,
+    filestore_dest: Optional[str],
+    jobs: Optional[int] = None,
+    mode: str = 'copy',
+    pg_restore: str = 'pg_restore',
+    env: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None,
+    slim: Optional['SlimProfile'] = None,
+    psql: str = 'psql',
+) -> Tuple[Optional[CopyStats], float]:
+    """
+    Restore a backup of a repository into the existing empty database *db_name*.
+
+    ``pg_restore -j`` loads the dump while the filestore is rebuilt from the repository blobs.
+
+    :param backup_path: Backup directory, or its ``manifest.json``
+    :param mode: How blobs are placed in *filestore_dest*: ``copy``, ``hardlink`` or ``reflink``
+    :param slim: Leave the data of its excluded tables out (default: the profile of a slim backup)
+    :param psql: Path to the ``psql`` binary, used to create the foreign keys *slim* relaxes
+    :return: ``(filestore_stats, sql_seconds)`` like :func:`~odootools.backup.stream_zip_restore`
+    :raises BackupError: If ``pg_restore`` fails or blobs are missing from the repository. A filestore
+        directory created by the rebuild is removed.
+    """
+    backup_dir = _backup_dir(backup_path)
+    if not is_repository_backup(backup_dir):
+        raise BackupError(f"{backup_path} is not a complete repository backup")
+    repo = _repository_root(backup_dir)
+    jobs = jobs or os.cpu_count() or 1
+    workers = workers or default_workers()
+    slim = slim or _manifest_slim(os.path.join(backup_dir, MANIFEST))
+
+    def rebuild() -> CopyStats:
+        stats = CopyStats()
+        lock = threading.Lock()
+        missing = []
+        start = time.monotonic()
+
+        def task(key: str, size: int, rel: str) -> None:
+            dst = os.path.join(filestore_dest, rel)
+            if _already_present(dst, size):
+                with lock:
+                    stats.skipped += 1
+                    stats.skipped_bytes += size
+                return
+            src = _blob_path(repo, key)
+            if not os.path.isfile(src):
+                missing.append(key)
+                return
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            fallback = _copy_one(src, dst, mode)
+            with lock:
+                stats.files += 1
+                stats.bytes += size
+                stats.fallbacks += fallback
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() re-raises the first copy error
+            list(pool.map(lambda entry: task(*entry), _read_list(backup_dir)))
+        stats.elapsed = time.monotonic() - start
+        if missing:
+            raise BackupError(f"{len(missing)} blob(s) missing from the repository, e.g. {missing[0]}")
+        return stats
+
+    fresh_filestore = bool(filestore_dest) and not os.path.exists(filestore_dest)
+    with _locked(repo, exclusive=False), ThreadPoolExecutor(max_workers=1) as pool:
+        rebuilding = pool.submit(rebuild) if filestore_dest else None
+        start = time.monotonic()
+        try:
+            pg_restore_slim(os.path.join(backup_dir, DUMP_DIR), db_name, jobs, slim, pg_restore, psql, env)
+            sql_seconds = time.monotonic() - start
+            stats = rebuilding.result() if rebuilding else None
+        except BaseException as e:
+            # Wait for the rebuild: its error is reported and nothing writes to the filestore any more
+            rebuild_error = rebuilding.exception() if rebuilding else None
+            if fresh_filestore:
+                shutil.rmtree(filestore_dest, ignore_errors=True)
+            if isinstance(e, BackupError) and rebuild_error is not None and rebuild_error is not e:
+                raise BackupError(f"{e}; the filestore rebuild failed too: {rebuild_error}") from e
+            raise
+    return stats, sql_seconds
+
+
+def list_backups(repo: str, db_name: Optional[str] = None) -> List[str]:
+    """Return the complete backups of *repo* (of *db_name* only when given), oldest first per database."""
+    root = os.path.join(repo, BACKUPS_DIR)
+    if not os.path.isdir(root):
+        return []
+    databases = [db_name] if db_name else sorted(os.listdir(root))
+    backups = []
+    for db in databases:
+        parent = os.path.join(root, db)
+        if os.path.isdir(parent):
+            backups += [
+                os.path.join(parent, name) for name in sorted(os.listdir(parent))
+                if is_repository_backup(os.path.join(parent, name))
+            ]
+    return backups
+
+
+def prune_repository(repo: str, keep_last: Optional[int] = None) -> dict:
+    """
+    Remove the blobs no backup references any more.
+
+    With *keep_last*, only the newest *keep_last* backups of each database are kept first. Leftovers of
+    interrupted backups are removed too. Backups and restores wait while the repository is pruned.
+
+    :return: Counters of removed backups and blobs, bytes freed and blobs kept
+    """
+    result = {'backups_removed': 0, 'blobs_removed': 0, 'bytes_freed': 0, 'blobs_kept': 0}
+    if not os.path.isdir(repo):
+        raise BackupError(f"Backup repository not found: {repo}")
+    with _locked(repo, exclusive=True):
+        root = os.path.join(repo, BACKUPS_DIR)
+        for db in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            parent = os.path.join(root, db)
+            complete = list_backups(repo, db)
+            removed = [
+                os.path.join(parent, name) for name in os.listdir(parent)
+                if os.path.join(parent, name) not in complete
+            ]
+            if keep_last is not None:
+                removed += complete[:max(len(complete) - keep_last, 0)]
+            for backup_dir in removed:
+                shutil.rmtree(backup_dir, ignore_errors=True)
+                result['backups_removed'] += 1
+
+        referenced = set()
+        for backup_dir in list_backups(repo):
+            referenced.update(key for key, _, _ in _read_list(backup_dir))
+
+        blobs = os.path.join(repo, BLOBS_DIR)
+        if os.path.isdir(blobs):
+            for _, path, size in iter_files(blobs):
+                if os.path.basename(path) in referenced:
+                    result['blobs_kept'] += 1
+                    continue
+                os.unlink(path)
+                result['blobs_removed'] += 1
+                result['bytes_freed'] += size
+    return result
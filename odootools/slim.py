@@ -0,0 +1,378 @@
+import io
+import os
+import re
+import subprocess
+from fnmatch import fnmatchcase
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .backup import BackupError
+from .filestore import format_size
+from .orphans import ReferencedFiles, scan_filestore
+
+
+# Table data nobody needs on a staging or development copy. The message tables are listed together
+# because they reference each other; foreign keys from kept tables to them are created NOT VALID.
+DEFAULT_EXCLUDED_TABLES = (
+    'mail_message',
+    'mail_message_res_partner_*',
+    'mail_message_reaction',
+    'mail_message_schedule',
+    'mail_tracking_value',
+    'mail_notification',
+    'mail_mail',
+    'mail_mail_res_partner_rel',
+    'message_attachment_rel',
+    'bus_bus',
+    'ir_logging',
+)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Size of the data of every table, to report what a slim dump leaves out
+TABLE_SIZES_QUERY = (
+    "SELECT c.relname, pg_table_size(c.oid) FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE c.relkind = 'r' AND n.nspname = 'public'"
+)
+
+# store_fname of the attachments a slim dump keeps: those of records in excluded tables go with them
+KEPT_STORE_FNAME_QUERY = (
+    "SELECT store_fname FROM ir_attachment WHERE store_fname IS NOT NULL "
+    "AND (res_model IS NULL OR NOT replace(res_model, '.', '_') ~ ANY(%s))"
+)
+
+_COPY = re.compile(rb'^COPY (?:"?[\w$]+"?\.)?"?([\w$]+)"? ')
+_ALTER_TABLE = re.compile(rb'^ALTER TABLE ONLY (?:"?[\w$]+"?\.)?"?([\w$]+)"?\s*$')
+_FOREIGN_KEY = re.compile(
+    rb'^\s+ADD CONSTRAINT "?([\w$]+)"? FOREIGN KEY .* REFERENCES (?:"?[\w$]+"?\.)?"?([\w$]+)"?\('
+)
+# pg_restore -l: "3456; 0 16385 TABLE DATA public mail_message odoo"
+_TOC_ENTRY = re.compile(r'^(\d+); \d+ \d+ (TABLE DATA|FK CONSTRAINT) (\S+) (\S+)(?: (\S+))?')
+_FK_STATEMENT = re.compile(
+    r'ALTER TABLE ONLY (?:"?[\w$]+"?\.)?"?([\w$]+)"?\s+ADD CONSTRAINT "?([\w$]+)"? FOREIGN KEY [^;]*? '
+    r'REFERENCES (?:"?[\w$]+"?\.)?"?([\w$]+)"?\([^;]*;',
+)
+
+
+class SlimProfile:
+    """
+    Leave heavy log tables out of a dump or a restore.
+
+    The data of the tables matching ``exclude_tables`` (``fnmatch`` patterns, without schema) is skipped, their
+    structure is kept. Foreign keys from kept tables to excluded ones are created ``NOT VALID``: existing rows
+    are not checked, new ones are. With ``referenced_filestore``, the attachments of records in excluded tables
+    (``res_model`` ``mail.message`` for ``mail_message``...) are left out too, and only the filestore files
+    referenced by the remaining ``ir_attachment`` rows are kept.
+
+    The profile collects what was left out; see :meth:`summary`. Restores also set ``sql_seconds``, the time
+    the SQL took to load.
+    """
+
+    def __init__(self, exclude_tables: Iterable[str] = DEFAULT_EXCLUDED_TABLES, referenced_filestore: bool = False):
+        self.exclude_tables = list(exclude_tables)
+        self.referenced_filestore = referenced_filestore
+        self.referenced: Optional[ReferencedFiles] = None
+        self.skipped_tables: Dict[str, int] = {}
+        self.relaxed_foreign_keys: List[str] = []
+        self.sql_bytes = 0
+        self.sql_seconds: Optional[float] = None
+        self.files_skipped = 0
+        self.bytes_skipped = 0
+
+    @classmethod
+    def from_manifest(cls, manifest: Optional[dict]) -> Optional['SlimProfile']:
+        """Return the profile a slim dump was made with, from its manifest, or ``None`` for a full dump."""
+        entry = (manifest or {}).get('slim')
+        return cls(entry['exclude_tables'], entry.get('referenced_filestore', False)) if entry else None
+
+    def manifest_entry(self) -> dict:
+        return {'exclude_tables': self.exclude_tables, 'referenced_filestore': self.referenced_filestore}
+
+    def excludes(self, table: str) -> bool:
+        return any(fnmatchcase(table, pattern) for pattern in self.exclude_tables)
+
+    def pg_dump_args(self) -> List[str]:
+        return [f'--exclude-table-data={pattern}' for pattern in self.exclude_tables]
+
+    def table_regexps(self) -> List[str]:
+        """The ``exclude_tables`` patterns as PostgreSQL regular expressions."""
+        return [_regexp(pattern) for pattern in self.exclude_tables]
+
+    def kept_store_fnames_query(self) -> Tuple[str, Tuple[List[str]]]:
+        """``(query, params)`` selecting the ``store_fname`` of the attachments the profile keeps."""
+        return KEPT_STORE_FNAME_QUERY, (self.table_regexps(),)
+
+    def attachment_cleanup_sql(self) -> str:
+        """
+        SQL deleting the attachments of records in excluded tables, run at the end of a restore with
+        ``referenced_filestore``: their rows are still in the dump, their files are not.
+        """
+        if not self.referenced_filestore:
+            return ''
+        patterns = ', '.join("'" + regexp.replace("'", "''") + "'" for regexp in self.table_regexps())
+        # Plain pg_dump output empties search_path
+        return (
+            "RESET search_path;\n"
+            f"DELETE FROM ir_attachment WHERE replace(res_model, '.', '_') ~ ANY(ARRAY[{patterns}]::text[]);\n"
+        )
+
+    def load_referenced(self, store_fnames: Iterable[str]) -> None:
+        """
+        Load the ``store_fname`` values of the source database, for :meth:`includes_file` on dumps. Pass the
+        rows of :meth:`kept_store_fnames_query`, so that the files of dropped attachments are left out.
+        """
+        self.referenced = ReferencedFiles.from_names(store_fnames)
+
+    def load_table_sizes(self, rows: Iterable[Tuple[str, int]]) -> None:
+        """Count the ``(table, size)`` rows of :data:`TABLE_SIZES_QUERY` run on the source of a dump."""
+        for table, size in rows:
+            self.sql_bytes += size
+            if self.excludes(table):
+                self.skipped_tables[table] = size
+
+    def includes_file(self, rel: str, path: str) -> bool:
+        """Whether a filestore file goes into a dump; needs :meth:`load_referenced` first to filter anything."""
+        if not self.referenced_filestore or self.referenced is None or rel in self.referenced:
+            return True
+        self.files_skipped += 1
+        self.bytes_skipped += os.path.getsize(path)
+        return False
+
+    def filter_sql(self, source: BinaryIO) -> BinaryIO:
+        """Wrap a plain SQL dump (``pg_dump`` text format) so that excluded table data never reaches ``psql``."""
+        return io.BufferedReader(_ChunkReader(self._filter(source)), CHUNK_SIZE)
+
+    def _statement(self, line: bytes, table: Optional[bytes]) -> bytes:
+        match = _FOREIGN_KEY.match(line)
+        if match and table and not self.excludes(table.decode()) and self.excludes(match.group(2).decode()):
+            self.relaxed_foreign_keys.append(f"{table.decode()}.{match.group(1).decode()}")
+            return line.rstrip().rstrip(b';') + b' NOT VALID;\n'
+        return line
+
+    def _filter(self, source: BinaryIO) -> Iterator[bytes]:
+        buf = b''
+        pos = 0
+        eof = False
+        copying = None  # table name while inside COPY data
+        keep = True
+        alter_table = None
+
+        while True:
+            if copying is None:
+                newline = buf.find(b'\n', pos)
+                if newline < 0:
+                    if eof:
+                        cleanup = self.attachment_cleanup_sql().encode()
+                        if pos < len(buf):
+                            yield buf[pos:] + (b'\n' if cleanup else b'')
+                        if cleanup:
+                            yield cleanup
+                        return
+                    chunk = source.read(CHUNK_SIZE)
+                    eof = not chunk
+                    buf, pos = buf[pos:] + chunk, 0
+                    continue
+                line, pos = buf[pos:newline + 1], newline + 1
+                self.sql_bytes += len(line)
+                match = _COPY.match(line)
+                if match:
+                    copying = match.group(1).decode()
+                    keep = not self.excludes(copying)
+                    if keep:
+                        yield line
+                    else:
+                        self.skipped_tables[copying] = self.skipped_tables.get(copying, 0) + len(line)
+                    continue
+                match = _ALTER_TABLE.match(line)
+                if match:
+                    alter_table = match.group(1)
+                elif not line.startswith(b'    '):
+                    alter_table = None
+                yield self._statement(line, alter_table)
+                continue
+
+            # COPY data ends with a "\." line; data lines cannot be "\." since backslashes are escaped
+            if buf.startswith(b'\\.\n', pos):
+                end = pos + 3
+            else:
+                end = buf.find(b'\n\\.\n', pos)
+                end = end + 4 if end >= 0 else -1
+            if end >= 0:
+                data, pos = buf[pos:end], end
+            elif eof:
+                raise BackupError(f"Unterminated COPY data for table {copying}")
+            else:
+                # Only pass whole lines, so that the buffer always starts at the beginning of a line
+                cut = buf.rfind(b'\n', pos) + 1 or pos
+                data = buf[pos:cut]
+                chunk = source.read(CHUNK_SIZE)
+                eof = not chunk
+                buf, pos = buf[cut:] + chunk, 0
+            self.sql_bytes += len(data)
+            if keep:
+                if data:
+                    yield data
+            else:
+                self.skipped_tables[copying] += len(data)
+            if end >= 0:
+                copying = None
+
+    def restore_list(
+        self, dump_path: str, list_path: str, pg_restore: str = 'pg_restore', env: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Write the ``pg_restore -L`` list of a custom or directory format dump without the excluded table data
+        and the foreign keys to them, and return the SQL creating those foreign keys ``NOT VALID``.
+        """
+        toc = _pg_output([pg_restore, '--list', dump_path], env)
+        if os.path.isdir(dump_path):
+            self.sql_bytes += sum(
+                os.path.getsize(os.path.join(dump_path, name)) for name in os.listdir(dump_path) if name != 'toc.dat'
+            )
+        else:
+            self.sql_bytes += os.path.getsize(dump_path)
+        lines = toc.splitlines()
+        data_entries, foreign_keys = {}, {}
+        for i, line in enumerate(lines):
+            match = _TOC_ENTRY.match(line)
+            if not match:
+                continue
+            dump_id, kind, _, table, name = match.groups()
+            if kind == 'TABLE DATA' and self.excludes(table):
+                data_entries[i] = (dump_id, table)
+            elif kind == 'FK CONSTRAINT' and not self.excludes(table):
+                foreign_keys[(table, name)] = i
+
+        for i, (dump_id, table) in data_entries.items():
+            lines[i] = ';' + lines[i]
+            size = 0
+            for suffix in ('.dat.gz', '.dat'):
+                path = os.path.join(dump_path, f"{dump_id}{suffix}")
+                if os.path.isfile(path):
+                    size = os.path.getsize(path)
+            self.skipped_tables[table] = self.skipped_tables.get(table, 0) + size
+
+        statements = []
+        if foreign_keys:
+            with open(list_path, 'w') as f:
+                f.write('\n'.join(lines[i] for i in foreign_keys.values()) + '\n')
+            fk_sql = _pg_output([pg_restore, '--file=-', f'--use-list={list_path}', dump_path], env)
+            for match in _FK_STATEMENT.finditer(fk_sql):
+                table, name, referenced = match.groups()
+                if self.excludes(referenced) and (table, name) in foreign_keys:
+                    lines[foreign_keys[(table, name)]] = ';' + lines[foreign_keys[(table, name)]]
+                    statements.append(match.group(0).rstrip(';') + ' NOT VALID;')
+                    self.relaxed_foreign_keys.append(f"{table}.{name}")
+
+        with open(list_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return '\n'.join(statements)
+
+    def prune_filestore(self, filestore_dir: str, store_fnames: Iterable[str]) -> None:
+        """
+        Delete the files of a restored filestore that the restored ``ir_attachment`` does not reference, once
+        :meth:`attachment_cleanup_sql` ran (the restore functions of :mod:`odootools.backup` run it).
+        """
+        if not os.path.isdir(filestore_dir):
+            return
+        referenced = ReferencedFiles.from_names(store_fnames)
+        for rel, size, _ in scan_filestore(filestore_dir):
+            if rel not in referenced:
+                os.unlink(os.path.join(filestore_dir, rel))
+                self.files_skipped += 1
+                self.bytes_skipped += size
+
+    def summary(self) -> dict:
+        skipped = sum(self.skipped_tables.values())
+        return {
+            'excluded_tables': sorted(self.skipped_tables),
+            'skipped_data_bytes': skipped,
+            'sql_bytes': self.sql_bytes,
+            'sql_seconds': None if self.sql_seconds is None else round(self.sql_seconds, 3),
+            'relaxed_foreign_keys': len(self.relaxed_foreign_keys),
+            'filestore_files_skipped': self.files_skipped,
+            'filestore_bytes_skipped': self.bytes_skipped,
+        }
+
+
+class _ChunkReader(io.RawIOBase):
+    """Raw binary stream reading from an iterator of ``bytes`` chunks."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def _regexp(pattern: str) -> str:
+    """Translate an ``fnmatch`` pattern into an anchored PostgreSQL regular expression."""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            out.append('.*')
+        elif c == '?':
+            out.append('.')
+        elif c == '[':
+            j = i + (pattern[i:i + 1] == '!')
+            j += pattern[j:j + 1] == ']'
+            end = pattern.find(']', j)
+            if end < 0:
+                out.append(r'\[')
+                continue
+            body = pattern[i:end].replace('\\', '\\\\')
+            out.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+            i = end + 1
+        else:
+            out.append(re.escape(c))
+    return '^' + ''.join(out) + '$'
+
+
+def _pg_output(cmd: List[str], env: Optional[Dict[str, str]]) -> str:
+    r = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if r.returncode != 0:
+        raise BackupError(f"{os.path.basename(cmd[0])} exited with code {r.returncode}: {r.stderr.strip()}")
+    return r.stdout
+
+
+def apply_sql(sql: str, db_name: str, psql: str = 'psql', env: Optional[Dict[str, str]] = None) -> None:
+    """Run *sql* on *db_name* with ``psql``, stopping at the first error."""
+    if not sql:
+        return
+    r = subprocess.run(
+        [psql, f'--dbname={db_name}', '-q', '-v', 'ON_ERROR_STOP=1'],
+        input=sql, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    if r.returncode != 0:
+        raise BackupError(f"psql exited with code {r.returncode}: {r.stderr.strip()}")
+
+
+def summary_line(profile: SlimProfile) -> str:
+    """One-line report of what a slim dump or restore left out, with the share of the data it represents."""
+    summary = profile.summary()
+    skipped = summary['skipped_data_bytes']
+    share = f" ({skipped / summary['sql_bytes']:.0%} of the data)" if summary['sql_bytes'] else ''
+    parts = [f"{len(summary['excluded_tables'])} table(s) without data, {format_size(skipped)}{share} left out"]
+    if summary['sql_seconds'] is not None:
+        parts.append(f"SQL loaded in {summary['sql_seconds']:.1f}s")
+    if summary['relaxed_foreign_keys']:
+        parts.append(f"{summary['relaxed_foreign_keys']} foreign key(s) created NOT VALID")
+    if profile.referenced_filestore:
+        parts.append(
+            f"{summary['filestore_files_skipped']} filestore file(s) of dropped or unreferenced attachments "
+            f"({format_size(summary['filestore_bytes_skipped'])}) left out"
+        )
+    return f"Slim: {', '.join(parts)}."
@@ -0,0 +1,236 @@
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from .cache import cache_dir, dump_json, load_json
+from .conf import filestore_path
+from .filestore import CopyStats, copy_filestore
+from .pgadmin import CloneStats, PgAdmin
+
+
+TEMPLATE_PREFIX = 'otools_tpl_'
+DEFAULT_MAX_COUNT = 3
+DEFAULT_MAX_SIZE = 50 * 1024 ** 3
+
+_HASHES_FILE = 'backup_hashes.json'
+_HASH_BUFSIZE = 1024 * 1024
+
+
+def _stamp(path: str) -> Tuple[List[Tuple[str, str]], list]:
+    """Return the files of a backup (``(relpath, abspath)``, sorted) and a stamp that changes with any of them."""
+    if os.path.isdir(path):
+        files = sorted(
+            (os.path.relpath(os.path.join(root, name), path), os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        files = [(os.path.basename(path), path)]
+    stats = [os.stat(abspath) for _, abspath in files]
+    return files, [len(files), sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0)]
+
+
+def backup_hash(path: str) -> str:
+    """
+    Return the sha1 of the content of a backup file or directory.
+
+    The hash is remembered in the odootools cache with the size and mtime of the backup, so a backup is
+    only read again once it changed.
+    """
+    path = os.path.realpath(path)
+    files, stamp = _stamp(path)
+    hashes = load_json(_HASHES_FILE, {})
+    known = hashes.get(path)
+    if known and known['stamp'] == stamp:
+        return known['sha1']
+    digest = hashlib.sha1()
+    for rel, abspath in files:
+        digest.update(rel.encode())
+        digest.update(b'\0')
+        with open(abspath, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_BUFSIZE), b''):
+                digest.update(chunk)
+    hashes[path] = {'stamp': stamp, 'sha1': digest.hexdigest()}
+    dump_json(_HASHES_FILE, hashes)
+    return hashes[path]['sha1']
+
+
+def _tree_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class TemplateCache:
+    """
+    Restore-once cache of template databases, for the throwaway copies of a backup restored over and over.
+
+    The first restore of a backup goes into a template database ``otools_tpl_<key>`` and its filestore;
+    later restores clone them with ``CREATE DATABASE ... TEMPLATE`` and a hardlinked filestore. Odoo never
+    rewrites a filestore blob in place, so the links are safe to share.
+
+    Templates live in the cluster, marked ``IS_TEMPLATE`` and closed to connections so that they stay
+    untouched. Their metadata (backup, creation and last use, filestore size) is stored as the comment
+    of the database. Once there are more than ``max_count`` templates or they take more than ``max_size``
+    bytes (database plus filestore), the least recently used ones are dropped.
+    """
+
+    def __init__(
+        self,
+        pg: PgAdmin,
+        options: Dict[str, str],
+        max_count: int = DEFAULT_MAX_COUNT,
+        max_size: Optional[int] = DEFAULT_MAX_SIZE,
+        directory: Optional[str] = None,
+    ):
+        self.pg = pg
+        self.options = options
+        self.max_count = max_count
+        self.max_size = max_size
+        self.directory = Path(directory) if directory else cache_dir() / 'templates'
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(backup_path: str, **variant) -> str:
+        """Key of the template of *backup_path*; *variant* holds the restore options that change its content."""
+        digest = hashlib.sha1(backup_hash(backup_path).encode())
+        digest.update(json.dumps(variant, sort_keys=True).encode())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def template_name(key: str) -> str:
+        return f"{TEMPLATE_PREFIX}{key}"
+
+    @contextmanager
+    def lock(self, key: str, blocking: bool = True) -> Iterator[bool]:
+        """
+        Serialize the restores of the same template, so that only the first one creates it.
+
+        Without *blocking*, yield ``False`` at once when another process holds the lock, ``True`` otherwise.
+        """
+        with open(self.directory / f"{key}.lock", 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def entries(self) -> List[dict]:
+        """Return the templates of the cluster, least recently used first."""
+        rows = self.pg.execute(
+            "SELECT datname, shobj_description(oid, 'pg_database'), pg_database_size(oid) FROM pg_database "
+            "WHERE datname LIKE %s ORDER BY datname",
+            (TEMPLATE_PREFIX.replace('_', r'\_') + '%',),
+        )
+        entries = []
+        for name, comment, db_size in rows:
+            try:
+                meta = json.loads(comment or '')
+            except ValueError:
+                # Restore in progress or interrupted: not a usable template
+                continue
+            entries.append({**meta, 'template': name, 'size': db_size + meta.get('filestore_size', 0)})
+        return sorted(entries, key=lambda entry: entry['used'])
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the template database of *key*, or ``None`` if it is not cached."""
+        name = self.template_name(key)
+        return name if any(entry['template'] == name for entry in self.entries()) else None
+
+    def add(self, key: str, backup_path: str) -> str:
+        """Turn the database restored as :meth:`template_name` of *key* into a cached template and return it."""
+        name = self.template_name(key)
+        filestore = filestore_path(self.options, name)
+        now = datetime.now().isoformat(timespec='seconds')
+        meta = {
+            'backup': os.path.realpath(backup_path),
+            'created': now,
+            'used': now,
+            'filestore_size': _tree_size(filestore) if os.path.isdir(filestore) else 0,
+        }
+        self.pg.terminate_backends(name)
+        self.pg.execute(sql.SQL("ALTER DATABASE {} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false").format(
+            sql.Identifier(name),
+        ))
+        self._comment(name, meta)
+        return name
+
+    def _comment(self, name: str, meta: dict) -> None:
+        self.pg.execute(sql.SQL("COMMENT ON DATABASE {} IS {}").format(
+            sql.Identifier(name), sql.Literal(json.dumps(meta)),
+        ))
+
+    def clone(
+        self, template: str, db_name: str, copy_mode: str = 'hardlink', timeout: float = 30.0,
+    ) -> Tuple[CloneStats, Optional[CopyStats]]:
+        """
+        Create *db_name* from *template* with a new UUID and secret, and its filestore from the template's.
+
+        :param copy_mode: How the filestore is copied; ``hardlink`` falls back to a copy across filesystems
+        :return: ``(clone_stats, filestore_stats)``; ``filestore_stats`` is ``None`` without filestore
+        """
+        stats = self.pg.clone(db_name, template, timeout=timeout)
+        self.pg.reset_identity(db_name)
+        filestore = filestore_path(self.options, template)
+        fs_stats = None
+        if os.path.isdir(filestore):
+            fs_stats = copy_filestore(filestore, filestore_path(self.options, db_name), mode=copy_mode)
+        self.touch(template)
+        return stats, fs_stats
+
+    def touch(self, template: str) -> None:
+        for entry in self.entries():
+            if entry['template'] == template:
+                meta = {k: v for k, v in entry.items() if k not in ('template', 'size')}
+                self._comment(template, {**meta, 'used': datetime.now().isoformat(timespec='seconds')})
+
+    def drop(self, template: str) -> None:
+        """Drop a template database and its filestore."""
+        if self.pg.db_exists(template):
+            self.pg.execute(sql.SQL("ALTER DATABASE {} WITH IS_TEMPLATE false").format(sql.Identifier(template)))
+            self.pg.drop(template)
+        # Clones hold their own links to the blobs: removing the template's leaves them intact
+        shutil.rmtree(filestore_path(self.options, template), ignore_errors=True)
+
+    def evict(self, keep: Tuple[str, ...] = ()) -> List[str]:
+        """
+        Drop the least recently used templates over ``max_count`` or ``max_size``, except *keep*.
+
+        Templates another process is creating or cloning (holding their :meth:`lock`) are skipped.
+        """
+        entries = self.entries()
+        total = sum(entry['size'] for entry in entries)
+        count = len(entries)
+        evicted = []
+        for entry in entries:
+            if count <= self.max_count and (self.max_size is None or total <= self.max_size):
+                break
+            if entry['template'] in keep:
+                continue
+            with self.lock(entry['template'][len(TEMPLATE_PREFIX):], blocking=False) as locked:
+                if not locked:
+                    continue
+                self.drop(entry['template'])
+            evicted.append(entry['template'])
+            count -= 1
+            total -= entry['size']
+        return evicted
+
+    def clear(self) -> List[str]:
+        """Drop every template, including the leftovers of interrupted restores."""
+        names = self.pg.column(
+            "SELECT datname FROM pg_database WHERE datname LIKE %s", (TEMPLATE_PREFIX.replace('_', r'\_') + '%',),
+        )
+        for name in names:
+            self.drop(name)
+        return names
+
@@ -0,0 +1,174 @@
+import os
+import heapq
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from .backup import BackupError, _run_pg
+from .filestore import CopyStats
+from .pgadmin import PgAdmin, PgAdminError
+
+
+# Tables and sequences whose data is copied, with the size of the tables to spread them over the streams
+RELATIONS_QUERY = (
+    "SELECT quote_ident(n.nspname) || '.' || quote_ident(c.relname), pg_table_size(c.oid) "
+    "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE c.relkind IN ('r', 'S') AND n.nspname <> 'information_schema' AND n.nspname NOT LIKE 'pg\\_%' "
+    "AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.objid = c.oid AND d.deptype = 'e')"
+)
+
+
+class TransferStats:
+    """Result of :func:`send_database`."""
+
+    def __init__(self):
+        self.relations = 0
+        self.bytes = 0
+        self.streams = 0
+        self.schema_time = 0.0
+        self.data_time = 0.0
+        self.index_time = 0.0
+        self.elapsed = 0.0
+        self.filestore: Optional[CopyStats] = None
+
+    def __repr__(self):
+        return (
+            f"TransferStats(relations={self.relations}, bytes={self.bytes}, streams={self.streams}, "
+            f"schema_time={self.schema_time:.2f}s, data_time={self.data_time:.2f}s, "
+            f"index_time={self.index_time:.2f}s, elapsed={self.elapsed:.2f}s)"
+        )
+
+
+def balance(relations: List[Tuple[str, int]], streams: int) -> List[List[str]]:
+    """Spread *relations* (``(name, size)``) over *streams* lists of similar total size, largest first."""
+    heap = [(0, i, []) for i in range(streams)]
+    for name, size in sorted(relations, key=lambda relation: -relation[1]):
+        total, i, names = heapq.heappop(heap)
+        names.append(name)
+        heapq.heappush(heap, (total + size, i, names))
+    return [names for _, _, names in sorted(heap, key=lambda entry: entry[1]) if names]
+
+
+def pipe_pg(
+    dump_cmd: List[str], restore_cmd: List[str],
+    dump_env: Optional[Dict[str, str]] = None, restore_env: Optional[Dict[str, str]] = None,
+) -> None:
+    """Run ``dump_cmd | restore_cmd`` without intermediate file; raise :class:`BackupError` if either fails."""
+    with tempfile.TemporaryFile() as dump_err:
+        dump = subprocess.Popen(dump_cmd, stdout=subprocess.PIPE, stderr=dump_err, env=dump_env)
+        restore = subprocess.Popen(
+            restore_cmd, stdin=dump.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=restore_env,
+        )
+        # Only pg_restore holds the read end now: pg_dump gets SIGPIPE if it exits early
+        dump.stdout.close()
+        _, restore_err = restore.communicate()
+        if restore.returncode != 0:
+            dump.kill()
+        dump.wait()
+        dump_err.seek(0)
+        if dump.returncode != 0 and restore.returncode == 0:
+            raise BackupError(
+                f"{os.path.basename(dump_cmd[0])} exited with code {dump.returncode}: "
+                f"{dump_err.read().decode(errors='replace').strip()}"
+            )
+    if restore.returncode != 0:
+        raise BackupError(
+            f"{os.path.basename(restore_cmd[0])} exited with code {restore.returncode}: "
+            f"{restore_err.decode(errors='replace').strip()}"
+        )
+
+
+def send_database(
+    source: PgAdmin,
+    destination: PgAdmin,
+    db_name: str,
+    new_db_name: str,
+    owner: Optional[str] = None,
+    jobs: Optional[int] = None,
+    pg_dump: str = 'pg_dump',
+    pg_restore: str = 'pg_restore',
+    source_env: Optional[Dict[str, str]] = None,
+    destination_env: Optional[Dict[str, str]] = None,
+    filestore_copy: Optional[Callable[[], CopyStats]] = None,
+) -> TransferStats:
+    """
+    Copy *db_name* to *new_db_name* on another PostgreSQL cluster, streaming ``pg_dump -Fc`` into ``pg_restore``.
+
+    ``pg_restore -j`` cannot read an archive from a pipe, so the parallelism comes from the dump instead:
+
+    1. the schema (``--section=pre-data``) is piped into ``pg_restore``;
+    2. the tables and sequences are spread over *jobs* streams of similar size, each a
+       ``pg_dump -Fc --data-only -t ... | pg_restore --data-only`` pipe;
+    3. indexes and constraints (``--section=post-data``) are built by ``pg_restore -j``, from a temporary
+       archive holding their definitions only.
+
+    No table data touches the disk. Every ``pg_dump`` reads the same snapshot of the source, exported by a
+    transaction held open meanwhile, so the copy is consistent even while Odoo keeps writing to it.
+
+    :param source: Administrative connection to the cluster of *db_name*
+    :param destination: Administrative connection to the destination cluster
+    :param owner: Owner of the new database (default: the user of *destination*); objects belong to the
+        user ``pg_restore`` connects as, and grants are not copied
+    :param jobs: Number of data streams and ``pg_restore`` jobs (default: CPU count)
+    :param filestore_copy: Called in a thread while the database is copied, e.g. to ship the filestore
+    :raises BackupError: If a ``pg_dump`` or ``pg_restore`` fails; the new database is dropped.
+    :raises PgAdminError: If *db_name* does not exist or *new_db_name* cannot be created
+    """
+    jobs = jobs or os.cpu_count() or 1
+    stats = TransferStats()
+    start = time.monotonic()
+
+    settings = source.execute(
+        "SELECT pg_encoding_to_char(encoding), datcollate, datctype FROM pg_database WHERE datname = %s", (db_name,),
+    )
+    if not settings:
+        raise PgAdminError(f'database "{db_name}" does not exist')
+    encoding, collate, ctype = settings[0]
+    query = sql.SQL("CREATE DATABASE {} WITH TEMPLATE template0 ENCODING {} LC_COLLATE {} LC_CTYPE {}").format(
+        sql.Identifier(new_db_name), sql.Literal(encoding), sql.Literal(collate), sql.Literal(ctype),
+    )
+    if owner:
+        query += sql.SQL(" OWNER {}").format(sql.Identifier(owner))
+    destination.execute(query)
+
+    restore = [pg_restore, '--no-owner', '--no-privileges', f'--dbname={new_db_name}']
+    try:
+        with ThreadPoolExecutor(max_workers=1) as filestore_pool, source.export_snapshot(db_name) as snapshot:
+            shipping = filestore_pool.submit(filestore_copy) if filestore_copy else None
+            dump = [pg_dump, '--format=custom', f'--snapshot={snapshot}']
+
+            pipe_pg(dump + ['--section=pre-data', db_name], restore, source_env, destination_env)
+            stats.schema_time = time.monotonic() - start
+
+            relations = source.execute(RELATIONS_QUERY, db_name=db_name)
+            stats.relations = len(relations)
+            stats.bytes = sum(size for _, size in relations)
+            streams = balance(relations, jobs)
+            stats.streams = len(streams)
+            data_start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                # list() re-raises the first failure
+                list(pool.map(lambda names: pipe_pg(
+                    dump + ['--data-only'] + [f'--table={name}' for name in names] + [db_name],
+                    restore + ['--data-only'], source_env, destination_env,
+                ), streams))
+            stats.data_time = time.monotonic() - data_start
+
+            index_start = time.monotonic()
+            with tempfile.TemporaryDirectory(prefix='odootools-send-') as tmp:
+                post_data = os.path.join(tmp, 'post-data.dump')
+                _run_pg(dump + ['--section=post-data', f'--file={post_data}', db_name], source_env)
+                _run_pg(restore + [f'--jobs={jobs}', post_data], destination_env)
+            stats.index_time = time.monotonic() - index_start
+
+            if shipping:
+                stats.filestore = shipping.result()
+    except BaseException:
+        destination.drop(new_db_name)
+        raise
+    stats.elapsed = time.monotonic() - start
+    return stats
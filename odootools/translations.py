@@ -0,0 +1,164 @@
+import copy
+import io
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+
+DEFAULT_FILE_PATTERN = os.path.join('{module}', 'i18n', '{lang}.po')
+
+
+class ExportStats:
+    """Result of :func:`export_translations`."""
+
+    def __init__(self):
+        self.files: List[str] = []
+        self.extract_time = 0.0
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return f"ExportStats(files={len(self.files)}, extract_time={self.extract_time:.2f}s, elapsed={self.elapsed:.2f}s)"
+
+
+def _code_values(terms: list, lang: str) -> list:
+    """
+    Return the code *terms* of Odoo 16+ with their translation in *lang*, as the reader sets it.
+
+    The terms of ``.js`` and ``.xml`` files are marked with the web comment and translated from the web
+    translations of their module, the others from its Python translations.
+    """
+    from odoo.tools import translate
+    web_comment = getattr(translate, 'JAVASCRIPT_TRANSLATION_COMMENT', 'openerp-web')
+    translations = {}
+
+    def lookup(module: str, web: bool) -> Dict[str, str]:
+        if (module, web) not in translations:
+            if web:
+                messages = translate.code_translations.get_web_translations(module, lang)['messages']
+                translations[module, web] = {message['id']: message['string'] for message in messages}
+            else:
+                translations[module, web] = translate.code_translations.get_python_translations(module, lang)
+        return translations[module, web]
+
+    return [
+        (module, source, name, res_id, ttype, comments, record_id,
+         lookup(module, web_comment in comments).get(source, ''))
+        for module, source, name, res_id, ttype, comments, record_id, _value in terms
+    ]
+
+
+def _term_readers(env, modules: List[str], langs: List[str]):
+    """
+    Yield ``(lang, reader)`` for each of *langs*, walking the code of *modules* once for all of them.
+
+    Odoo 13+ ``TranslationModuleReader`` collects the terms of all *modules* in a single pass. Up to Odoo 15
+    it only keeps their sources and locations and looks the translations up while iterating, so the terms of
+    the first language are reused as they are. From Odoo 16 the translations are read along with the terms:
+    the records are read again for each language, while the code terms of the first language are reused with
+    their translations looked up again in ``code_translations`` (see :func:`_code_values`).
+    """
+    from odoo.tools.translate import TranslationModuleReader
+    code_terms = None
+
+    class Reader(TranslationModuleReader):
+        def _export_translatable_code(self):
+            nonlocal code_terms
+            if code_terms is not None:
+                self._to_translate += _code_values(code_terms, self._lang)
+                return
+            start = len(self._to_translate)
+            super()._export_translatable_code()
+            code_terms = self._to_translate[start:]
+
+    first = None
+    for lang in langs:
+        if first is not None and all(len(term) < 8 for term in first._to_translate):
+            reader = copy.copy(first)
+            reader._lang = lang
+        else:
+            reader = Reader(env.cr, modules=modules, lang=lang)
+            first = first or reader
+        yield lang, reader
+
+
+def _rows_by_module(reader) -> Dict[str, list]:
+    """Group the rows of a ``TranslationModuleReader`` by module."""
+    rows = defaultdict(list)
+    for row in reader:
+        rows[row[0]].append(row)
+    return rows
+
+
+def _write_po(path: str, rows: list, lang: str) -> str:
+    from odoo.tools.translate import TranslationFileWriter
+    buffer = io.BytesIO()
+    TranslationFileWriter(buffer, fileformat='po', lang=lang).write_rows(rows)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
+    return path
+
+
+def _export_one_by_one(env, modules: List[str], langs: List[str], path_for) -> List[str]:
+    """Odoo 12 has no reusable reader: fall back to one ``trans_export`` per (module, lang)."""
+    from odoo.tools.translate import trans_export
+    files = []
+    for lang in langs:
+        for module in modules:
+            path = path_for(module, lang)
+            buffer = io.BytesIO()
+            trans_export(lang, [module], buffer, 'po', env.cr)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(buffer.getvalue())
+            files.append(path)
+    return files
+
+
+def export_translations(
+    env, modules: List[str], langs: List[str], output_dir: str = '.',
+    file_pattern: str = DEFAULT_FILE_PATTERN, workers: Optional[int] = None,
+) -> ExportStats:
+    """
+    Export one ``.po`` file per (module, language) in a single run.
+
+    The code of all *modules* is walked once for all *langs* (see :func:`_term_readers`), then the terms of
+    each language are split by module. The files of a language are written by a thread pool while the
+    translations of the next language are looked up.
+
+    :param modules: Names of installed modules
+    :param langs: Codes of active languages, e.g. ``['es_ES', 'fr_FR']``
+    :param output_dir: Base directory of the generated files
+    :param file_pattern: Path of each file relative to *output_dir*, formatted with ``module`` and ``lang``
+    :param workers: Threads writing files (default: Python's ThreadPoolExecutor default)
+    """
+    import odoo.tools.translate
+    start = time.monotonic()
+    stats = ExportStats()
+
+    active = set(env['res.lang'].search([('code', 'in', langs)]).mapped('code'))
+    missing = [lang for lang in langs if lang not in active]
+    if missing:
+        raise ValueError(f"Language(s) not installed: {', '.join(missing)}")
+
+    def path_for(module, lang):
+        return os.path.join(output_dir, file_pattern.format(module=module, lang=lang))
+
+    if not hasattr(odoo.tools.translate, 'TranslationModuleReader'):
+        stats.files = _export_one_by_one(env, modules, langs, path_for)
+        stats.extract_time = stats.elapsed = time.monotonic() - start
+        return stats
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        extract_start = time.monotonic()
+        for lang, reader in _term_readers(env, modules, langs):
+            rows = _rows_by_module(reader)
+            stats.extract_time += time.monotonic() - extract_start
+            futures += [pool.submit(_write_po, path_for(module, lang), rows.get(module, []), lang) for module in modules]
+            extract_start = time.monotonic()
+        stats.files = [f.result() for f in futures]
+    stats.elapsed = time.monotonic() - start
+    return stats
@@ -1,37 +1,111 @@
 import sys
 import os
+import time
+import shutil
+import zipfile
 import logging
 import traceback
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 from typing import List, Optional, Union
 from packaging import version as pkg_version
+from .backup import (
+    ARCHIVE_CODECS, BACKUP_FORMATS, DIRECTORY_SUFFIX, archive_codec, dump_archive, dump_directory,
+    is_directory_backup, pg_restore_slim, restore_directory, stream_archive_restore, stream_zip_restore,
+)
+from .cache import cache_enabled
 from .discovery import discover_odoo, find_conf_file
+from .filestore import copy_filestore
+from .modules import run_module_action
+from .orphans import DEFAULT_MIN_AGE, STORE_FNAME_QUERY, OrphanStats, find_orphans, locked_references
+from .pgadmin import PgAdmin
+from .repository import backup_to_repository, is_repository_backup, restore_from_repository
+from .report_cache import ReportCache, cached_render_pdf
+from .slim import TABLE_SIZES_QUERY, SlimProfile, summary_line
+from .reports import _init_worker, _render_chunk_in_worker, chunked, render_chunk
+from .translations import DEFAULT_FILE_PATTERN, export_translations
+from .watch import watch_report
 
 
 _logger = logging.getLogger(__name__)
 
 
-_odoo_path, _odoo_conf = discover_odoo()
-
 sys.path.append(str(Path(__file__).resolve().parent))  # Resolves Jupyter error
-if _odoo_path:
-    sys.path.append(_odoo_path)
-
-import odoo
-from odoo import api, SUPERUSER_ID
 
-# Module-level defaults used by Tools.__init__ when the caller does not specify them
-odoo_conf = _odoo_conf or ""
+# Odoo is discovered and imported on first use (Tools() or accessing ``odootools.utils.odoo``),
+# so importing this module stays cheap.
+_odoo_path = None
+_odoo_conf = None
+_ODOO_ATTRS = ('odoo', 'api', 'SUPERUSER_ID', 'odoo_conf')
+
+
+def _load_odoo():
+    """Discover and import Odoo once, publishing ``odoo``, ``api``, ``SUPERUSER_ID`` and ``odoo_conf``."""
+    global _odoo_path, _odoo_conf, odoo, api, SUPERUSER_ID, odoo_conf
+    if 'odoo' in globals():
+        return
+    _odoo_path, _odoo_conf = discover_odoo()
+    if _odoo_path:
+        sys.path.append(_odoo_path)
+
+    import odoo
+    # Odoo 19 is a namespace package, so submodules are not auto-imported
+    import odoo.tools
+    import odoo.release
+    import odoo.modules.registry
+    import odoo.service.db
+    from odoo import api, SUPERUSER_ID
+
+    # Module-level defaults used by Tools.__init__ when the caller does not specify them
+    odoo_conf = _odoo_conf or ""
+
+
+def __getattr__(name):
+    if name in _ODOO_ATTRS:
+        _load_odoo()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _pg_subprocess():
+    """Return ``(env, find_pg_tool)`` to run PostgreSQL client tools with the connection settings of the config."""
+    try:
+        from odoo.tools.misc import exec_pg_environ, find_pg_tool
+        return exec_pg_environ(), find_pg_tool
+    except ImportError:
+        env = {**os.environ}
+        for key, var in (('db_password', 'PGPASSWORD'), ('db_host', 'PGHOST'), ('db_port', 'PGPORT'), ('db_user', 'PGUSER')):
+            if odoo.tools.config.get(key):
+                env[var] = str(odoo.tools.config[key])
+        return env, lambda tool: tool
 
 
 class Tools:
 
-    def __init__(self, db_name, odoo_conf=odoo_conf, uid=SUPERUSER_ID, context=None):
+    def __init__(self, db_name, odoo_conf=None, uid=None, context=None, registry=None, report_cache=None):
+        _load_odoo()
+        if odoo_conf is None:
+            odoo_conf = globals()['odoo_conf']
+        if uid is None:
+            uid = SUPERUSER_ID
         if context is None:
             context = {'lang': 'es_ES'}
-        odoo.tools.config.parse_config(['-c', odoo_conf])
+        # A registry handed over by ToolsPool comes with the config already parsed
+        if registry is None:
+            odoo.tools.config.parse_config(['-c', odoo_conf])
+            registry = odoo.modules.registry.Registry(db_name)
+        self._odoo_conf = odoo_conf
+        self._uid = uid
+        self._context = context
         self._odoo_version = pkg_version.parse(odoo.release.version)
-        registry = odoo.modules.registry.Registry(db_name)
+        # True for the default cache directory, or a ReportCache instance
+        if report_cache is True:
+            report_cache = ReportCache() if cache_enabled() else None
+        self.report_cache = report_cache or None
         cursor = registry.cursor()
 
         # Odoo 12-14 stores active environments in a werkzeug LocalStack.
@@ -63,13 +137,199 @@ class Tools:
     def get_env(self):
         return self.env
 
-    def dump_db(self, path):
-        """Creates a backup of the current database in ZIP format."""
+    def render_report(self, report, res_ids: List[int]) -> bytes:
+        """Renders a report to PDF, reusing the report cache when it is enabled."""
+        return cached_render_pdf(self.report_cache, self.env, report, res_ids, self._odoo_version)
+
+    def report_cache_stats(self) -> dict:
+        """
+        Returns the report cache counters (hits, misses, evictions, hit_ratio, entries, size).
+
+        Renders done by ``print_reports`` worker processes are counted in the workers, not here.
+        """
+        return self.report_cache.stats() if self.report_cache else {}
+
+    def dump_db(
+        self, path, backup_format: str = 'zip', jobs: Optional[int] = None, level: Optional[int] = None,
+        slim: Optional[SlimProfile] = None, copy_mode: str = 'copy',
+    ):
+        """
+        Creates a backup of the current database.
+
+        :param path: Directory where the backup is written (the repository for the ``repository`` format)
+        :param backup_format: ``zip`` (Odoo backup zip), ``directory``
+            (``pg_dump -Fd -j`` plus a filestore archive, restored with ``pg_restore -j``), a tar file
+            compressed with ``zstd`` (multi-threaded) or ``lz4``, or not compressed (``tar``), or ``repository``
+            (SQL dump plus the filestore blobs not stored yet in a repository shared by all backups)
+        :param jobs: Number of parallel ``pg_dump`` jobs for the ``directory`` and ``repository`` formats, or of
+            zstd threads (default: CPU count)
+        :param level: Compression level for ``zstd`` and ``lz4``
+        :param slim: Leave out the data of log tables (see :class:`~odootools.slim.SlimProfile`); not available
+            for the ``zip`` format
+        :param copy_mode: How new blobs are stored in the repository: ``copy``, ``hardlink`` or ``reflink``
+        :return: The backup directory created in the repository for the ``repository`` format
+        """
+        if backup_format not in BACKUP_FORMATS:
+            raise ValueError(f"backup_format must be one of: {', '.join(BACKUP_FORMATS)}")
+        db_name = self.env.cr.dbname
+        if slim:
+            if backup_format == 'zip':
+                raise ValueError("Slim dumps use the directory, tar (zstd, lz4, tar) or repository format")
+            self.env.cr.execute(TABLE_SIZES_QUERY)
+            slim.load_table_sizes(self.env.cr.fetchall())
+            if slim.referenced_filestore:
+                slim.load_referenced(self._store_fnames(*slim.kept_store_fnames_query()))
         path = Path(path)
         path.mkdir(parents=True, exist_ok=True)
-        backup_file = path / f"{self.env.cr.dbname}.zip"
+        if backup_format == 'directory':
+            env, find_pg_tool = _pg_subprocess()
+            dump_directory(
+                db_name, str(path / f"{db_name}{DIRECTORY_SUFFIX}"), odoo.tools.config.filestore(db_name),
+                odoo.service.db.dump_db_manifest(self.env.cr), jobs=jobs,
+                pg_dump=find_pg_tool('pg_dump'), env=env, slim=slim,
+            )
+            return
+        if backup_format == 'repository':
+            env, find_pg_tool = _pg_subprocess()
+            backup_dir, _ = backup_to_repository(
+                db_name, str(path), odoo.tools.config.filestore(db_name), odoo.service.db.dump_db_manifest(self.env.cr),
+                jobs=jobs, mode=copy_mode, pg_dump=find_pg_tool('pg_dump'), env=env, slim=slim,
+            )
+            return backup_dir
+        if backup_format in ARCHIVE_CODECS:
+            env, find_pg_tool = _pg_subprocess()
+            dump_archive(
+                db_name, str(path / f"{db_name}{ARCHIVE_CODECS[backup_format]}"), odoo.tools.config.filestore(db_name),
+                odoo.service.db.dump_db_manifest(self.env.cr), codec=backup_format, level=level, threads=jobs,
+                pg_dump=find_pg_tool('pg_dump'), env=env, slim=slim,
+            )
+            return
+        backup_file = path / f"{db_name}.zip"
         with open(backup_file, "wb") as destiny:
-            odoo.service.db.dump_db(self.env.cr.dbname, destiny, "zip")
+            odoo.service.db.dump_db(db_name, destiny, "zip")
+
+    def restore_db(
+        self, backup_path: str, db_name: str, jobs: Optional[int] = None, slim: Optional[SlimProfile] = None,
+        copy_mode: str = 'copy',
+    ):
+        """
+        Restores a backup into a new database, filestore included.
+
+        :param backup_path: Backup zip, tar backup, directory backup or repository backup created by :meth:`dump_db`,
+            or a ``pg_dump`` archive (restored without filestore)
+        :param db_name: Name of the database to create
+        :param jobs: Number of parallel ``pg_restore`` jobs for directory backups (default: CPU count)
+        :param slim: Leave out the data of log tables (see :class:`~odootools.slim.SlimProfile`); slim dumps
+            are restored with the profile they were made with
+        :param copy_mode: How the filestore is rebuilt from a repository backup: ``copy``, ``hardlink`` or
+            ``reflink``
+        :raises BackupError: If the restore fails; the new database and a filestore directory it created are
+            removed.
+        """
+        env, find_pg_tool = _pg_subprocess()
+        odoo.service.db._create_empty_database(db_name)
+        filestore_dest = odoo.tools.config.filestore(db_name)
+        fresh_filestore = not os.path.exists(filestore_dest)
+        psql, pg_restore = find_pg_tool('psql'), find_pg_tool('pg_restore')
+        try:
+            if is_repository_backup(backup_path):
+                _, sql_seconds = restore_from_repository(
+                    backup_path, db_name, filestore_dest, jobs=jobs, mode=copy_mode, pg_restore=pg_restore, env=env,
+                    slim=slim, psql=psql,
+                )
+            elif is_directory_backup(backup_path):
+                _, sql_seconds = restore_directory(
+                    backup_path, db_name, filestore_dest, jobs=jobs, pg_restore=pg_restore, env=env, slim=slim,
+                    psql=psql,
+                )
+            elif archive_codec(backup_path):
+                _, sql_seconds = stream_archive_restore(
+                    backup_path, db_name, filestore_dest, psql=psql, env=env, slim=slim,
+                )
+            elif zipfile.is_zipfile(backup_path):
+                _, sql_seconds = stream_zip_restore(
+                    backup_path, db_name, filestore_dest, psql=psql, env=env, slim=slim,
+                )
+            else:
+                start = time.monotonic()
+                pg_restore_slim(backup_path, db_name, jobs or os.cpu_count() or 1, slim, pg_restore, psql, env)
+                sql_seconds = time.monotonic() - start
+            if slim:
+                slim.sql_seconds = sql_seconds
+            if slim and slim.referenced_filestore:
+                with PgAdmin(odoo.tools.config) as pg:
+                    slim.prune_filestore(
+                        filestore_dest, (row[0] for row in pg.stream(STORE_FNAME_QUERY, db_name=db_name)),
+                    )
+        except BaseException:
+            with PgAdmin(odoo.tools.config) as pg:
+                pg.drop(db_name)
+            if fresh_filestore:
+                shutil.rmtree(filestore_dest, ignore_errors=True)
+            raise
+        if slim:
+            print(summary_line(slim))
+        print(f"Database {db_name} restored from {backup_path}.")
+
+    def clone_db(self, new_db_name: str, timeout: float = 30.0, copy_mode: str = 'copy'):
+        """
+        Copies the current database with ``CREATE DATABASE ... TEMPLATE``, a fast alternative to
+        ``exp_duplicate_database`` that copes with workers and crons reconnecting to the source.
+
+        Connections to the source are refused and closed while the copy is made (see
+        :meth:`~odootools.pgadmin.PgAdmin.clone`). The copy gets a new UUID and secret and its own filestore.
+        The cursor of this instance is closed meanwhile and replaced: uncommitted changes are rolled back.
+
+        :param new_db_name: Name of the database to create
+        :param timeout: Seconds to keep retrying while the source is still in use
+        :param copy_mode: How the filestore is copied: ``copy``, ``hardlink`` or ``reflink``
+        :return: :class:`~odootools.pgadmin.CloneStats`
+        """
+        db_name = self.env.cr.dbname
+        registry = self.env.registry
+        self.env.cr.rollback()
+        self.env.cr.close()
+        odoo.sql_db.close_db(db_name)
+        try:
+            with PgAdmin(odoo.tools.config) as pg:
+                stats = pg.clone(new_db_name, db_name, timeout=timeout)
+                pg.reset_identity(new_db_name)
+        finally:
+            self.env = api.Environment(registry.cursor(), self._uid, self._context)
+        filestore = odoo.tools.config.filestore(db_name)
+        if os.path.isdir(filestore):
+            copy_filestore(filestore, odoo.tools.config.filestore(new_db_name), mode=copy_mode)
+        print(f"Database {db_name} cloned to {new_db_name} in {stats.elapsed:.1f}s ({stats.attempts} attempt(s)).")
+        return stats
+
+    def find_orphaned_attachments(
+        self, quarantine: Optional[str] = None, report: Optional[str] = None, min_age: float = DEFAULT_MIN_AGE,
+    ) -> OrphanStats:
+        """
+        Finds the filestore files that no ``ir_attachment.store_fname`` references.
+
+        ``store_fname`` values are streamed through a server-side cursor into a compact set (8 bytes per
+        attachment), then the filestore is scanned with ``os.scandir`` threads.
+
+        :param quarantine: Move the orphans to this directory, keeping their relative paths. Each batch is
+            checked again under ``LOCK ir_attachment IN SHARE MODE`` right before it is moved.
+        :param report: Write one ``path<TAB>size`` line per orphan to this file
+        :param min_age: Seconds; younger files are never orphans, their attachment may not be committed yet
+        """
+        with PgAdmin(odoo.tools.config) as pg:
+            return find_orphans(
+                self._store_fnames(), odoo.tools.config.filestore(self.env.cr.dbname),
+                min_age=min_age, quarantine=quarantine, report=report,
+                recheck=partial(locked_references, pg, self.env.cr.dbname) if quarantine else None,
+            )
+
+    def _store_fnames(self, query: str = STORE_FNAME_QUERY, params: Optional[tuple] = None):
+        """Yield the ``store_fname`` of every attachment (or those of *query*) through a server-side cursor."""
+        with self.env.cr._cnx.cursor('odootools_store_fnames') as cr:
+            cr.itersize = 100000
+            cr.execute(query, params)
+            for row in cr:
+                yield row[0]
 
     def print_report(self, report_xml_id: str, res_id: int, report_file: str = "report.pdf"):
         """
@@ -84,23 +344,102 @@ class Tools:
             raise ValueError('The report_file must end with .pdf')
 
         report = self.env.ref(report_xml_id)
-
-        # Report rendering API changed across Odoo versions:
-        # Odoo 12-13: render_qweb_pdf (public) on the report record
-        # Odoo 14-16: _render_qweb_pdf on the report record
-        # Odoo 17+:   _render_qweb_pdf as @api.model with explicit report_ref
-        if self._odoo_version >= pkg_version.parse('17.0'):
-            pdf_content, _ = self.env['ir.actions.report']._render_qweb_pdf(report, [res_id])
-        elif self._odoo_version >= pkg_version.parse('14.0'):
-            pdf_content, _ = report._render_qweb_pdf([res_id])
-        else:
-            pdf_content, _ = report.render_qweb_pdf([res_id])
+        pdf_content = self.render_report(report, [res_id])
 
         with open(report_file, "wb") as f:
             f.write(pdf_content)
 
         print(f"PDF generated and saved in: {report_file}")
 
+    def print_reports(
+        self,
+        report_xml_id: str,
+        res_ids: List[int],
+        output: str,
+        merge: bool = False,
+        chunk_size: int = 50,
+        processes: Optional[int] = None,
+        file_pattern: str = '{res_id}.pdf',
+    ) -> List[str]:
+        """
+        Generates a report for many records, spreading the work over a pool of processes.
+
+        Each worker process loads its own registry and cursor, so only committed data is rendered.
+
+        :param report_xml_id: Full XML ID of the report action (e.g. 'account.account_invoices')
+        :param res_ids: IDs of the records to render
+        :param output: Destination directory (one PDF per record) or, with ``merge``, the merged PDF path
+        :param merge: Render chunks of ``chunk_size`` records at once and merge them into a single PDF
+        :param chunk_size: Number of records handed to a worker at a time
+        :param processes: Number of worker processes (default: CPU count). ``1`` renders in this process.
+        :param file_pattern: File name of each per-record PDF, formatted with ``res_id``
+        :return: Paths of the generated files
+        """
+        if merge and not output.endswith('.pdf'):
+            raise ValueError('The output must end with .pdf when merge is set')
+        if not res_ids:
+            return []
+        output_dir = None
+        if not merge:
+            output_dir = output
+            os.makedirs(output_dir, exist_ok=True)
+
+        start = time.monotonic()
+        chunks = chunked(list(res_ids), chunk_size)
+        processes = min(processes or os.cpu_count() or 1, len(chunks))
+        jobs = [(report_xml_id, chunk, output_dir, file_pattern) for chunk in chunks]
+        if processes <= 1:
+            results = [render_chunk(self, *job) for job in jobs]
+        else:
+            cache_args = (str(self.report_cache.directory), self.report_cache.max_size) if self.report_cache else None
+            # spawn: forked children would share this process' database connections
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.env.cr.dbname, self._odoo_conf, self._uid, self._context, cache_args),
+            ) as pool:
+                results = list(pool.map(_render_chunk_in_worker, jobs))
+
+        if merge:
+            from odoo.tools.pdf import merge_pdf
+            with open(output, 'wb') as f:
+                f.write(merge_pdf(results) if len(results) > 1 else results[0])
+            files = [output]
+        else:
+            files = [path for chunk_files in results for path in chunk_files]
+
+        print(f"{len(res_ids)} record(s) rendered to {output} in {time.monotonic() - start:.1f}s")
+        return files
+
+    def export_translations(
+        self,
+        modules: Union[str, List[str]],
+        langs: Union[str, List[str]],
+        output_dir: str = '.',
+        file_pattern: str = DEFAULT_FILE_PATTERN,
+        workers: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Exports one .po file per module and language.
+
+        Terms are extracted once per language for all the modules, and files are written in parallel.
+
+        :param modules: Module name or list of module names
+        :param langs: Language code or list of language codes (e.g. ['es_ES', 'fr_FR'])
+        :param output_dir: Base directory of the generated files
+        :param file_pattern: Path of each file relative to ``output_dir``, formatted with ``module`` and ``lang``
+        :param workers: Number of threads writing files
+        :return: Paths of the generated files
+        """
+        if isinstance(modules, str):
+            modules = [modules]
+        if isinstance(langs, str):
+            langs = [langs]
+        stats = export_translations(self.env, modules, langs, output_dir, file_pattern, workers)
+        print(f"{len(stats.files)} translation file(s) exported to {output_dir} in {stats.elapsed:.1f}s")
+        return stats.files
+
     def update_records_from_xml(self, module_name: str, file_name: str):
         """
         Reloads records from an XML file within a module.
@@ -114,16 +453,34 @@ class Tools:
         else:
             odoo.tools.convert_file(self.env.cr, module_name, file_name, {})
 
-    def report_editor(self, module_name: str, report_file: str, action_xml_id: str, res_id: int, file_name: str):
+    def report_editor(
+        self,
+        module_name: str,
+        report_file: str,
+        action_xml_id: str,
+        res_id: int,
+        file_name: str,
+        watch: bool = False,
+        debounce: float = 0.3,
+    ):
         """
         Interactive loop that reloads XML records and regenerates a PDF report on each iteration.
 
+        With ``watch``, the report is regenerated whenever the XML file or a template it calls is saved
+        (inotify, or mtime polling without ``inotify_simple``) instead of on each keypress. Only the edited
+        records are reloaded and the render time of every iteration is printed. Stop it with Ctrl+C.
+
         :param module_name: Module containing the report template
         :param report_file: XML file path within the module
         :param action_xml_id: XML ID of the report action (without module prefix)
         :param res_id: ID of the record to render
         :param file_name: Destination PDF file path (must end with .pdf)
+        :param watch: Regenerate on file changes instead of waiting for a keypress
+        :param debounce: Seconds without further changes to wait before regenerating (watch mode)
         """
+        if watch:
+            watch_report(self, module_name, report_file, f'{module_name}.{action_xml_id}', res_id, file_name, debounce)
+            return
         while True:
             try:
                 self.update_records_from_xml(module_name, report_file)
@@ -155,20 +512,114 @@ class Tools:
         """Generates a picking packages PDF report."""
         self.print_report('stock.action_report_picking_packages', res_id, report_file='packages.pdf')
 
-    def uninstall_module(self, module: Union[str, List[str]]):
+    def uninstall_module(self, module: Union[str, List[str]], batch: bool = True):
         """
         Uninstalls one or more Odoo modules.
 
+        All modules are uninstalled with a single registry rebuild; if that fails they are retried one by one.
+
         :param module: Module name or list of module names to uninstall
+        :param batch: Set to False to rebuild the registry after each module
+        :return: ``{name: {'ok': bool, 'elapsed': seconds}}`` for the modules that were uninstalled
         """
         if isinstance(module, str):
             module = [module]
+        module_ids = self.env['ir.module.module'].search([('name', 'in', module)])
+        found = set(module_ids.mapped('name'))
         for mod in module:
-            module_id = self.env['ir.module.module'].search([('name', '=', mod)])
-            if module_id and module_id.state in ('installed', 'to upgrade'):
-                print(f"Uninstalling {module_id.name}.")
-                module_id.sudo().button_immediate_uninstall()
-            elif not module_id:
+            if mod not in found:
                 print(f"Module {mod} not found.")
-            else:
-                print(f"Module {mod} is not installed.")
+        installed = module_ids.filtered(lambda m: m.state in ('installed', 'to upgrade'))
+        for module_id in module_ids - installed:
+            print(f"Module {module_id.name} is not installed.")
+        if not installed:
+            return {}
+        print(f"Uninstalling {', '.join(installed.mapped('name'))}.")
+        return run_module_action(installed.sudo(), 'uninstall', batch=batch)
+
+
+class ToolsPool:
+    """
+    Keeps warm registries for many databases, for scripts that iterate over tenants.
+
+    The config is parsed once and each database's registry is loaded on first use, then reused until
+    it is evicted (least recently used first) to keep at most ``max_registries`` databases loaded.
+
+    .. code-block:: python
+
+        with ToolsPool(max_registries=10) as pool:
+            for db_name in tenants:
+                with pool.tools(db_name) as tool:
+                    tool.uninstall_module('my_module')
+            print(pool.stats())
+    """
+
+    def __init__(self, odoo_conf=None, max_registries: int = 8, uid=None, context=None):
+        _load_odoo()
+        if max_registries < 1:
+            raise ValueError('max_registries must be at least 1')
+        self._odoo_conf = globals()['odoo_conf'] if odoo_conf is None else odoo_conf
+        self._uid = uid
+        self._context = context
+        self.max_registries = max_registries
+        self._registries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+        odoo.tools.config.parse_config(['-c', self._odoo_conf])
+
+    def registry(self, db_name: str):
+        """Return the registry of *db_name*, loading it (and evicting the least recently used one) if needed."""
+        registry = self._registries.get(db_name)
+        if registry is not None:
+            self.hits += 1
+            self._registries.move_to_end(db_name)
+            return registry
+
+        self.misses += 1
+        start = time.monotonic()
+        registry = odoo.modules.registry.Registry(db_name)
+        self.load_time += time.monotonic() - start
+        self._registries[db_name] = registry
+        while len(self._registries) > self.max_registries:
+            evicted, _ = self._registries.popitem(last=False)
+            odoo.modules.registry.Registry.delete(evicted)
+            self.evictions += 1
+        return registry
+
+    @contextmanager
+    def cursor(self, db_name: str):
+        """Yield a new cursor on *db_name*; it is committed on success, rolled back on error and closed."""
+        with self.registry(db_name).cursor() as cr:
+            yield cr
+
+    def tools(self, db_name: str) -> Tools:
+        """Return a :class:`Tools` on *db_name* backed by the pooled registry. Close it when done."""
+        return Tools(
+            db_name, odoo_conf=self._odoo_conf, uid=self._uid, context=self._context,
+            registry=self.registry(db_name),
+        )
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the total registry load time in seconds."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 2) if lookups else 0.0,
+            'load_time': round(self.load_time, 3),
+            'databases': list(self._registries),
+        }
+
+    def close(self):
+        for db_name in list(self._registries):
+            odoo.modules.registry.Registry.delete(db_name)
+        self._registries.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,268 @@
+import os
+import re
+import io
+import time
+import hashlib
+import traceback
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import inotify_simple
+except ImportError:  # optional dependency: pip install odootools[watch]
+    inotify_simple = None
+
+
+# Static template references only: t-call="module.template" or t-call="template" (same module)
+_TEMPLATE_REF = re.compile(r'^[\w.]+$')
+
+
+def content_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    """
+    Block until one of a set of files changes, using inotify when available and mtime polling otherwise.
+
+    The parent directories are watched rather than the files themselves, so editors that save by writing a
+    temporary file and renaming it over the original are noticed too.
+    """
+
+    def __init__(self, paths: Iterable[str], debounce: float = 0.3, poll_interval: float = 0.5):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.paths: Set[str] = set()
+        self._mtimes: Dict[str, Tuple[int, int]] = {}
+        self._inotify = inotify_simple.INotify() if inotify_simple else None
+        self._dirs: Dict[int, str] = {}
+        self.set_paths(paths)
+
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self._inotify else 'polling'
+
+    def _stat(self, path: str) -> Tuple[int, int]:
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return 0, -1
+
+    def set_paths(self, paths: Iterable[str]) -> None:
+        self.paths = {os.path.abspath(p) for p in paths}
+        self._mtimes = {p: self._stat(p) for p in self.paths}
+        if self._inotify:
+            watched = set(self._dirs.values())
+            flags = inotify_simple.flags
+            for directory in {os.path.dirname(p) for p in self.paths} - watched:
+                wd = self._inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+                self._dirs[wd] = directory
+
+    def _read(self, timeout: Optional[float]) -> Set[str]:
+        """Return the watched files changed within *timeout* seconds (``None`` waits forever)."""
+        if self._inotify:
+            events = self._inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+            changed = {os.path.join(self._dirs.get(e.wd, ''), e.name) for e in events}
+            return changed & self.paths
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self.paths:
+                current = self._stat(path)
+                if current != self._mtimes[path]:
+                    self._mtimes[path] = current
+                    changed.add(path)
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(self.poll_interval)
+
+    def wait(self) -> Set[str]:
+        """Wait for a change, then for ``debounce`` seconds without changes, and return every file changed meanwhile."""
+        changed = set()
+        while not changed:
+            changed = self._read(None)
+        while True:
+            more = self._read(self.debounce)
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self) -> None:
+        if self._inotify:
+            self._inotify.close()
+
+
+class XmlSource:
+    """
+    A module data file whose records are reloaded when their XML changes.
+
+    Every top-level record (``<template>``, ``<record>``, …) is hashed, so only the records that were edited
+    are reloaded. Elements without an id (``<function>``, ``<delete>``) cannot be tracked one by one: if one of
+    them changes, the whole file is reloaded.
+    """
+
+    def __init__(self, module: str, file_name: str, path: str):
+        self.module = module
+        self.file_name = file_name
+        self.path = path
+        self.hash = None
+        self.records: Dict[str, str] = {}
+        self.others: List[str] = []
+
+    def _parse(self):
+        from lxml import etree
+        root = etree.parse(self.path).getroot()
+        records, others, elements = {}, [], {}
+        for parent in [root] + root.findall('data'):
+            for element in parent:
+                if not isinstance(element.tag, str) or element.tag == 'data':
+                    continue
+                digest = hashlib.sha1(etree.tostring(element, with_tail=False)).hexdigest()
+                if element.get('id'):
+                    records[element.get('id')] = digest
+                    elements[element.get('id')] = element
+                else:
+                    others.append(digest)
+        return root, records, others, elements
+
+    def changed_records(self) -> Optional[List]:
+        """
+        Parse the file again and return the elements that differ from the last call.
+
+        Returns ``None`` when the whole file must be reloaded (first call, changed id-less elements).
+        """
+        self.hash = content_hash(self.path)
+        root, records, others, elements = self._parse()
+        first = not self.records and not self.others
+        full = first or others != self.others
+        changed = [elements[xml_id] for xml_id, digest in records.items() if self.records.get(xml_id) != digest]
+        self.records, self.others = records, others
+        return None if full else changed
+
+    def reset(self) -> None:
+        """Forget the loaded state, so that the next change reloads the whole file."""
+        self.records, self.others = {}, []
+
+    def template_refs(self) -> Set[str]:
+        """Return the xml ids of the templates called with a static ``t-call`` in this file."""
+        root, _, _, _ = self._parse()
+        refs = set()
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            ref = element.get('t-call')
+            if ref and _TEMPLATE_REF.match(ref):
+                refs.add(ref if '.' in ref else f"{self.module}.{ref}")
+        return refs
+
+
+def _subset_document(elements: List) -> io.BytesIO:
+    """Build an ``<odoo>`` document holding *elements*, keeping the attributes of their ``<data>`` wrapper."""
+    from lxml import etree
+    root = etree.Element('odoo')
+    for element in elements:
+        parent = element.getparent()
+        target = root
+        if parent is not None and parent.tag == 'data':
+            target = etree.SubElement(root, 'data', dict(parent.attrib))
+        target.append(etree.fromstring(etree.tostring(element, with_tail=False)))
+    return io.BytesIO(etree.tostring(root))
+
+
+def reload_source(tools, source: XmlSource, elements: Optional[List]) -> None:
+    """Load *elements* of *source* (or the whole file when ``None``) into the database of *tools*."""
+    if elements is None:
+        tools.update_records_from_xml(source.module, source.file_name)
+        return
+    if not elements:
+        return
+    import odoo.tools.convert
+    from packaging import version as pkg_version
+    xmlfile = _subset_document(elements)
+    # convert_xml_import reads the file name for its messages and the arch_fs of the views
+    xmlfile.name = source.path
+    target = tools.env if tools._odoo_version >= pkg_version.parse('17.0') else tools.env.cr
+    odoo.tools.convert.convert_xml_import(target, source.module, xmlfile, {})
+
+
+def resolve_template(env, xml_id: str) -> Optional[Tuple[str, str, str]]:
+    """Return ``(module, file_name, path)`` of the file defining the view *xml_id*, or None if unknown."""
+    from odoo.modules import get_module_path
+    view = env.ref(xml_id, raise_if_not_found=False)
+    arch_fs = view and view._name == 'ir.ui.view' and view.arch_fs
+    if not arch_fs:
+        return None
+    module, _, file_name = arch_fs.replace('\\', '/').partition('/')
+    module_path = get_module_path(module)
+    if not module_path:
+        return None
+    return module, file_name, os.path.abspath(os.path.join(module_path, file_name))
+
+
+def collect_sources(env, sources: Dict[str, XmlSource]) -> Dict[str, XmlSource]:
+    """Add to *sources* every file defining a template reachable through ``t-call`` from the files in it."""
+    pending = list(sources.values())
+    while pending:
+        source = pending.pop()
+        try:
+            refs = source.template_refs()
+        except Exception:
+            continue
+        for xml_id in refs:
+            found = resolve_template(env, xml_id)
+            if found and found[2] not in sources:
+                sources[found[2]] = XmlSource(*found)
+                # Templates are already loaded: only record their current state
+                sources[found[2]].changed_records()
+                pending.append(sources[found[2]])
+    return sources
+
+
+def watch_report(
+    tools, module_name: str, report_file: str, report_xml_id: str, res_id: int, file_name: str,
+    debounce: float = 0.3,
+) -> None:
+    """
+    Re-render a report every time its XML file or a template it calls is saved, until interrupted (Ctrl+C).
+
+    Saves that do not change the content of a file are ignored, and only the records that were edited are
+    reloaded. Each iteration runs in a savepoint, so a broken template does not abort the transaction.
+    """
+    from odoo.modules import get_module_path
+    root_path = os.path.abspath(os.path.join(get_module_path(module_name), report_file))
+    sources = collect_sources(tools.env, {root_path: XmlSource(module_name, report_file, root_path)})
+    watcher = FileWatcher(sources, debounce=debounce)
+    print(f"Watching {len(sources)} file(s) with {watcher.backend}, press Ctrl+C to stop.")
+
+    changed = {root_path}
+    try:
+        while True:
+            start = time.monotonic()
+            try:
+                with tools.env.cr.savepoint():
+                    for path in changed:
+                        # The first call returns None: the report file is fully loaded on the first iteration
+                        reload_source(tools, sources[path], sources[path].changed_records())
+                reloaded = time.monotonic()
+                tools.print_report(report_xml_id, res_id, file_name)
+                done = time.monotonic()
+                print(f"Rendered in {done - start:.2f}s (reload {reloaded - start:.2f}s, render {done - reloaded:.2f}s)")
+                collect_sources(tools.env, sources)
+                watcher.set_paths(sources)
+            except Exception:
+                print(traceback.format_exc())
+                for path in changed:
+                    sources[path].reset()
+
+            while True:
+                changed = {p for p in watcher.wait() if sources[p].hash != content_hash(p)}
+                if changed:
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -5,6 +5,11 @@ setup(
     version="1.1.6",
     packages=find_packages(),
     install_requires=["packaging", "bullet", "tqdm"],
+    extras_require={
+        "watch": ["inotify_simple"],
+        "zstd": ["zstandard"],
+        "lz4": ["lz4"],
+    },
     entry_points={
         "console_scripts": [
             "otools = odootools.main:main"
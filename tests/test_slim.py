@@ -0,0 +1,204 @@
+import io
+import re
+from fnmatch import fnmatchcase
+
+import pytest
+
+from odootools import slim as slim_module
+from odootools.backup import BackupError
+from odootools.slim import SlimProfile, _regexp, summary_line
+
+
+DUMP = b"""\
+SET standard_conforming_strings = on;
+SELECT pg_catalog.set_config('search_path', '', false);
+
+CREATE TABLE public.mail_message (
+    id integer NOT NULL,
+    body text
+);
+
+COPY public.mail_message (id, body) FROM stdin;
+1\thello
+2\tline with \\\\. inside
+3\t\\.not the end
+\\.
+
+COPY public.res_partner (id, name) FROM stdin;
+1\tAzure
+2\tDeco
+\\.
+
+COPY "public"."mail_tracking_value" (id) FROM stdin;
+\\.
+
+COPY public.sms_sms (id, mail_message_id) FROM stdin;
+1\t2
+\\.
+
+ALTER TABLE ONLY public.sms_sms
+    ADD CONSTRAINT sms_sms_mail_message_id_fkey FOREIGN KEY (mail_message_id) REFERENCES public.mail_message(id) ON DELETE SET NULL;
+
+ALTER TABLE ONLY public.sms_sms
+    ADD CONSTRAINT sms_sms_partner_id_fkey FOREIGN KEY (partner_id) REFERENCES public.res_partner(id);
+
+ALTER TABLE ONLY public.mail_message
+    ADD CONSTRAINT mail_message_author_id_fkey FOREIGN KEY (author_id) REFERENCES public.res_partner(id);
+"""
+
+
+def _filter(profile, dump=DUMP):
+    return profile.filter_sql(io.BytesIO(dump)).read()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1024 * 1024])
+def test_filter_sql_skips_excluded_copy_blocks(monkeypatch, chunk_size):
+    monkeypatch.setattr(slim_module, 'CHUNK_SIZE', chunk_size)
+    profile = SlimProfile()
+    out = _filter(profile)
+
+    assert b'hello' not in out and b'not the end' not in out and b'inside' not in out
+    assert b'COPY public.mail_message' not in out
+    assert b'COPY "public"."mail_tracking_value"' not in out
+    assert b'COPY public.res_partner (id, name) FROM stdin;\n1\tAzure\n2\tDeco\n\\.\n' in out
+    assert b'COPY public.sms_sms (id, mail_message_id) FROM stdin;\n1\t2\n\\.\n' in out
+    # The structure of excluded tables is kept
+    assert b'CREATE TABLE public.mail_message' in out
+    assert sorted(profile.skipped_tables) == ['mail_message', 'mail_tracking_value']
+    assert profile.sql_bytes == len(DUMP)
+
+
+def test_filter_sql_relaxes_foreign_keys_to_excluded_tables_only():
+    profile = SlimProfile()
+    out = _filter(profile)
+
+    assert b'REFERENCES public.mail_message(id) ON DELETE SET NULL NOT VALID;\n' in out
+    assert b'REFERENCES public.res_partner(id);\n' in out
+    # Excluded tables keep their own foreign keys as they are
+    assert b'mail_message_author_id_fkey FOREIGN KEY (author_id) REFERENCES public.res_partner(id);\n' in out
+    assert profile.relaxed_foreign_keys == ['sms_sms.sms_sms_mail_message_id_fkey']
+
+
+def test_filter_sql_keeps_everything_without_exclusions():
+    assert _filter(SlimProfile(exclude_tables=())) == DUMP
+
+
+def test_filter_sql_custom_patterns():
+    profile = SlimProfile(exclude_tables=['res_*'])
+    out = _filter(profile)
+    assert b'Azure' not in out and b'hello' in out
+    assert b'REFERENCES public.res_partner(id) NOT VALID;' in out
+
+
+def test_filter_sql_unterminated_copy():
+    with pytest.raises(BackupError, match='mail_message'):
+        _filter(SlimProfile(), b'COPY public.mail_message (id) FROM stdin;\n1\n2\n')
+
+
+def test_filter_sql_appends_attachment_cleanup():
+    out = _filter(SlimProfile(referenced_filestore=True), b'SELECT 1;')
+    assert out.startswith(b'SELECT 1;\nRESET search_path;\nDELETE FROM ir_attachment ')
+    assert b"'^mail_message$'" in out and b"'^mail_message_res_partner_.*$'" in out
+
+
+@pytest.mark.parametrize('pattern, names', [
+    ('mail_message', ['mail_message', 'mail_message_x', 'mailxmessage']),
+    ('mail_message_res_partner_*', ['mail_message_res_partner_rel', 'mail_message']),
+    ('ir_log?ing', ['ir_logging', 'ir_loging']),
+    ('a[!b]c', ['abc', 'axc']),
+    ('a[bc]d', ['abd', 'acd', 'aed']),
+    ('a[]]b', ['a]b', 'ab']),
+    ('x[', ['x[', 'x']),
+    ('odd$.name', ['odd$.name', 'oddXxname']),
+])
+def test_regexp_matches_like_fnmatch(pattern, names):
+    regexp = _regexp(pattern)
+    for name in names:
+        assert bool(re.match(regexp, name)) == fnmatchcase(name, pattern), (pattern, name, regexp)
+
+
+TOC = """\
+;
+; Archive created at 2026-10-18 12:00:00 UTC
+;
+215; 1259 16390 TABLE public mail_message odoo
+216; 1259 16400 TABLE public sms_sms odoo
+3401; 0 16390 TABLE DATA public mail_message odoo
+3402; 0 16400 TABLE DATA public sms_sms odoo
+3403; 0 16410 TABLE DATA public mail_message_res_partner_needaction_rel odoo
+3404; 0 16420 TABLE DATA public res_partner odoo
+3250; 2606 16500 FK CONSTRAINT public sms_sms sms_sms_mail_message_id_fkey odoo
+3251; 2606 16510 FK CONSTRAINT public sms_sms sms_sms_partner_id_fkey odoo
+3252; 2606 16520 FK CONSTRAINT public mail_message mail_message_author_id_fkey odoo
+"""
+
+FK_SQL = """\
+ALTER TABLE ONLY public.sms_sms
+    ADD CONSTRAINT sms_sms_mail_message_id_fkey FOREIGN KEY (mail_message_id) REFERENCES public.mail_message(id) ON DELETE SET NULL;
+
+ALTER TABLE ONLY public.sms_sms
+    ADD CONSTRAINT sms_sms_partner_id_fkey FOREIGN KEY (partner_id) REFERENCES public.res_partner(id);
+"""
+
+
+def test_restore_list(monkeypatch, tmp_path):
+    calls = []
+
+    def pg_output(cmd, env):
+        calls.append(cmd)
+        if '--list' in cmd:
+            return TOC
+        # Only the foreign keys of kept tables are extracted
+        with open(cmd[2].split('=', 1)[1]) as f:
+            assert f.read().splitlines() == TOC.splitlines()[-3:-1]
+        return FK_SQL
+
+    monkeypatch.setattr(slim_module, '_pg_output', pg_output)
+    dump_dir = tmp_path / 'dump'
+    dump_dir.mkdir()
+    (dump_dir / '3401.dat.gz').write_bytes(b'x' * 100)
+    list_path = tmp_path / 'restore.list'
+
+    profile = SlimProfile()
+    statements = profile.restore_list(str(dump_dir), str(list_path), 'pg_restore')
+
+    lines = list_path.read_text().splitlines()
+    commented = [line for line in lines if line.startswith(';3')]
+    assert commented == [
+        ';3401; 0 16390 TABLE DATA public mail_message odoo',
+        ';3403; 0 16410 TABLE DATA public mail_message_res_partner_needaction_rel odoo',
+        ';3250; 2606 16500 FK CONSTRAINT public sms_sms sms_sms_mail_message_id_fkey odoo',
+    ]
+    assert '3402; 0 16400 TABLE DATA public sms_sms odoo' in lines
+    assert '3251; 2606 16510 FK CONSTRAINT public sms_sms sms_sms_partner_id_fkey odoo' in lines
+    assert statements == (
+        'ALTER TABLE ONLY public.sms_sms\n    ADD CONSTRAINT sms_sms_mail_message_id_fkey FOREIGN KEY '
+        '(mail_message_id) REFERENCES public.mail_message(id) ON DELETE SET NULL NOT VALID;'
+    )
+    assert profile.relaxed_foreign_keys == ['sms_sms.sms_sms_mail_message_id_fkey']
+    assert profile.skipped_tables == {'mail_message': 100, 'mail_message_res_partner_needaction_rel': 0}
+    assert profile.sql_bytes == 100
+    assert len(calls) == 2
+
+
+def test_restore_list_without_foreign_keys(monkeypatch, tmp_path):
+    monkeypatch.setattr(slim_module, '_pg_output', lambda cmd, env: TOC.replace('FK CONSTRAINT', 'CONSTRAINT'))
+    list_path = tmp_path / 'restore.list'
+    assert SlimProfile().restore_list(str(tmp_path), str(list_path)) == ''
+    assert ';3401; 0 16390 TABLE DATA public mail_message odoo' in list_path.read_text().splitlines()
+
+
+def test_manifest_round_trip():
+    profile = SlimProfile(['bus_bus'], referenced_filestore=True)
+    restored = SlimProfile.from_manifest({'slim': profile.manifest_entry()})
+    assert restored.exclude_tables == ['bus_bus'] and restored.referenced_filestore
+    assert SlimProfile.from_manifest({}) is None
+
+
+
+def test_summary_line_reports_sql_time():
+    profile = SlimProfile()
+    profile.load_table_sizes([('mail_message', 300), ('res_partner', 100)])
+    assert summary_line(profile) == 'Slim: 1 table(s) without data, 300 B (75% of the data) left out.'
+    profile.sql_seconds = 2.0
+    assert summary_line(profile) == 'Slim: 1 table(s) without data, 300 B (75% of the data) left out, SQL loaded in 2.0s.'
@@ -0,0 +1,106 @@
+import sys
+import types
+
+import pytest
+
+from odootools.translations import _rows_by_module, _term_readers
+
+
+PYTHON_TRANSLATIONS = {
+    ('sale', 'fr_FR'): {'Quotation': 'Devis'},
+}
+WEB_TRANSLATIONS = {
+    ('sale', 'fr_FR'): {'Send': 'Envoyer'},
+}
+RECORD_TRANSLATIONS = {'es_ES': 'Ventas', 'fr_FR': 'Ventes'}
+
+
+class CodeTranslations:
+    def get_python_translations(self, module, lang):
+        return PYTHON_TRANSLATIONS.get((module, lang), {})
+
+    def get_web_translations(self, module, lang):
+        translations = WEB_TRANSLATIONS.get((module, lang), {})
+        return {'messages': tuple({'id': src, 'string': value} for src, value in translations.items())}
+
+
+def _reader_class(walks, values_in_terms):
+    """Stand-in for ``TranslationModuleReader``: Odoo 16+ if *values_in_terms*, Odoo 13-15 otherwise."""
+    code_translations = CodeTranslations()
+
+    class TranslationModuleReader:
+        def __init__(self, cr, modules=None, lang=None):
+            self._lang = lang
+            self._to_translate = []
+            self._export_translatable_records()
+            self._export_translatable_code()
+
+        def _push(self, module, source, name, res_id, ttype, comments, record_id, value):
+            term = (module, source, name, res_id, ttype, comments, record_id)
+            self._to_translate.append(term + (value,) if values_in_terms else term)
+
+        def _export_translatable_records(self):
+            self._push('sale', 'Sales', 'ir.ui.menu,name', 'sale.menu', 'model', (), 7,
+                       RECORD_TRANSLATIONS.get(self._lang, ''))
+
+        def _export_translatable_code(self):
+            walks.append(self._lang)
+            python = code_translations.get_python_translations('sale', self._lang)
+            web = {m['id']: m['string'] for m in code_translations.get_web_translations('sale', self._lang)['messages']}
+            self._push('sale', 'Quotation', 'addons/sale/models/sale.py', 12, 'code', ('openerp-python',), None,
+                       python.get('Quotation', ''))
+            self._push('sale', 'Send', 'addons/sale/static/src/send.js', 3, 'code', ('openerp-web',), None,
+                       web.get('Send', ''))
+
+        def __iter__(self):
+            for module, source, name, res_id, ttype, comments, record_id, *value in self._to_translate:
+                if not values_in_terms:
+                    value = [PYTHON_TRANSLATIONS.get((module, self._lang), {}).get(source)
+                             or WEB_TRANSLATIONS.get((module, self._lang), {}).get(source)
+                             or (RECORD_TRANSLATIONS.get(self._lang, '') if record_id else '')]
+                yield (module, ttype, name, res_id, source, value[0], comments)
+
+    return TranslationModuleReader, code_translations
+
+
+@pytest.fixture
+def fake_odoo(monkeypatch):
+    def install(values_in_terms):
+        walks = []
+        translate = types.ModuleType('odoo.tools.translate')
+        translate.TranslationModuleReader, translate.code_translations = _reader_class(walks, values_in_terms)
+        translate.JAVASCRIPT_TRANSLATION_COMMENT = 'openerp-web'
+        monkeypatch.setitem(sys.modules, 'odoo', types.ModuleType('odoo'))
+        monkeypatch.setitem(sys.modules, 'odoo.tools', types.ModuleType('odoo.tools'))
+        monkeypatch.setitem(sys.modules, 'odoo.tools.translate', translate)
+        return walks
+    return install
+
+
+def _export(langs):
+    env = types.SimpleNamespace(cr=None)
+    return {
+        lang: {row[4]: row[5] for row in _rows_by_module(reader)['sale']}
+        for lang, reader in _term_readers(env, ['sale'], langs)
+    }
+
+
+@pytest.mark.parametrize('values_in_terms', [False, True], ids=['odoo15', 'odoo16'])
+def test_code_translations_of_later_languages(fake_odoo, values_in_terms):
+    walks = fake_odoo(values_in_terms)
+    # The first language has no code translations, the second one does
+    assert _export(['es_ES', 'fr_FR', 'de_DE']) == {
+        'es_ES': {'Sales': 'Ventas', 'Quotation': '', 'Send': ''},
+        'fr_FR': {'Sales': 'Ventes', 'Quotation': 'Devis', 'Send': 'Envoyer'},
+        'de_DE': {'Sales': '', 'Quotation': '', 'Send': ''},
+    }
+    assert walks == ['es_ES']
+
+
+def test_code_translations_of_first_language_are_not_reused(fake_odoo):
+    walks = fake_odoo(True)
+    assert _export(['fr_FR', 'es_ES']) == {
+        'fr_FR': {'Sales': 'Ventes', 'Quotation': 'Devis', 'Send': 'Envoyer'},
+        'es_ES': {'Sales': 'Ventas', 'Quotation': '', 'Send': ''},
+    }
+    assert walks == ['fr_FR']